@@ -14,6 +14,7 @@ from fastapi import (
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 import uuid
@@ -29,15 +30,21 @@ from utils.utils import (
     get_verified_user,
     get_admin_user,
 )
-from utils.misc import calculate_sha256
+from utils.misc import calculate_sha256, save_upload_file, FileTooLargeError
+
+from apps.audio.utils import WhisperModelPool, SpeechCache, get_speech_cache_key
 
 from config import (
     SRC_LOG_LEVELS,
     CACHE_DIR,
     UPLOAD_DIR,
+    UPLOAD_MAX_FILE_SIZE,
     WHISPER_MODEL,
     WHISPER_MODEL_DIR,
     WHISPER_MODEL_AUTO_UPDATE,
+    WHISPER_WORKERS,
+    WHISPER_QUEUE_SIZE,
+    WHISPER_CPU_THREADS,
     DEVICE_TYPE,
     AUDIO_STT_OPENAI_API_BASE_URL,
     AUDIO_STT_OPENAI_API_KEY,
@@ -48,6 +55,8 @@ from config import (
     AUDIO_TTS_ENGINE,
     AUDIO_TTS_MODEL,
     AUDIO_TTS_VOICE,
+    SPEECH_CACHE_MAX_SIZE,
+    SPEECH_CACHE_TTL,
     AppConfig,
 )
 
@@ -80,9 +89,26 @@ app.state.config.TTS_VOICE = AUDIO_TTS_VOICE
 whisper_device_type = DEVICE_TYPE if DEVICE_TYPE and DEVICE_TYPE == "cuda" else "cpu"
 log.info(f"whisper_device_type: {whisper_device_type}")
 
+app.state.WHISPER = WhisperModelPool(
+    {
+        "model_size_or_path": WHISPER_MODEL,
+        "device": whisper_device_type,
+        "compute_type": "int8",
+        "download_root": WHISPER_MODEL_DIR,
+        "local_files_only": not WHISPER_MODEL_AUTO_UPDATE,
+    },
+    workers=WHISPER_WORKERS,
+    queue_size=WHISPER_QUEUE_SIZE,
+    cpu_threads=WHISPER_CPU_THREADS,
+)
+
 SPEECH_CACHE_DIR = Path(CACHE_DIR).joinpath("./audio/speech/")
 SPEECH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+app.state.SPEECH_CACHE = SpeechCache(
+    SPEECH_CACHE_DIR, max_size=SPEECH_CACHE_MAX_SIZE, ttl=SPEECH_CACHE_TTL
+)
+
 
 class TTSConfigForm(BaseModel):
     OPENAI_API_BASE_URL: str
@@ -184,52 +210,47 @@ async def update_audio_config(
 
 @app.post("/speech")
 async def speech(request: Request, user=Depends(get_verified_user)):
-    body = await request.body()
-    name = hashlib.sha256(body).hexdigest()
+    try:
+        body = json.loads(await request.body())
+        body["model"] = app.state.config.TTS_MODEL
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
 
-    file_path = SPEECH_CACHE_DIR.joinpath(f"{name}.mp3")
-    file_body_path = SPEECH_CACHE_DIR.joinpath(f"{name}.json")
+    key = get_speech_cache_key(body)
 
     # Check if the file already exists in the cache
-    if file_path.is_file():
-        return FileResponse(file_path)
+    file_path = app.state.SPEECH_CACHE.get(key)
+    if file_path is not None:
+        return FileResponse(file_path, media_type="audio/mpeg")
 
     headers = {}
     headers["Authorization"] = f"Bearer {app.state.config.TTS_OPENAI_API_KEY}"
     headers["Content-Type"] = "application/json"
 
-    try:
-        body = body.decode("utf-8")
-        body = json.loads(body)
-        body["model"] = app.state.config.TTS_MODEL
-        body = json.dumps(body).encode("utf-8")
-    except Exception as e:
-        pass
+    url = f"{app.state.config.TTS_OPENAI_API_BASE_URL}/audio/speech"
 
-    r = None
-    try:
+    def open_stream():
         r = requests.post(
-            url=f"{app.state.config.TTS_OPENAI_API_BASE_URL}/audio/speech",
-            data=body,
+            url=url,
+            data=json.dumps(body).encode("utf-8"),
             headers=headers,
             stream=True,
         )
-
         r.raise_for_status()
+        return r.iter_content(chunk_size=SpeechCache.CHUNK_SIZE)
 
-        # Save the streaming content to a file
-        with open(file_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        with open(file_body_path, "w") as f:
-            json.dump(json.loads(body.decode("utf-8")), f)
-
-        # Return the saved file
-        return FileResponse(file_path)
+    try:
+        # Streamed while it is written to the cache, identical requests in
+        # flight share the same upstream response
+        chunks = await app.state.SPEECH_CACHE.fetch(key, body, open_stream)
+        return StreamingResponse(chunks, media_type="audio/mpeg")
 
     except Exception as e:
         log.exception(e)
+        r = getattr(e, "response", None)
         error_detail = "Open WebUI: Server Connection Error"
         if r is not None:
             try:
@@ -246,8 +267,9 @@ async def speech(request: Request, user=Depends(get_verified_user)):
 
 
 @app.post("/transcriptions")
-def transcribe(
+async def transcribe(
     file: UploadFile = File(...),
+    stream: bool = Form(False),
     user=Depends(get_current_user),
 ):
     log.info(f"file.content_type: {file.content_type}")
@@ -258,6 +280,12 @@ def transcribe(
             detail=ERROR_MESSAGES.FILE_NOT_SUPPORTED,
         )
 
+    if app.state.config.STT_ENGINE == "" and app.state.WHISPER.is_full():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ERROR_MESSAGES.SERVER_BUSY,
+        )
+
     try:
         ext = file.filename.split(".")[-1]
 
@@ -270,47 +298,48 @@ def transcribe(
 
         print(filename)
 
-        contents = file.file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
-            f.close()
+        await save_upload_file(file, file_path, UPLOAD_MAX_FILE_SIZE)
 
         if app.state.config.STT_ENGINE == "":
-            from faster_whisper import WhisperModel
+            segments = app.state.WHISPER.transcribe(file_path, beam_size=5)
 
-            whisper_kwargs = {
-                "model_size_or_path": WHISPER_MODEL,
-                "device": whisper_device_type,
-                "compute_type": "int8",
-                "download_root": WHISPER_MODEL_DIR,
-                "local_files_only": not WHISPER_MODEL_AUTO_UPDATE,
-            }
-
-            log.debug(f"whisper_kwargs: {whisper_kwargs}")
+            def save_transcript(data):
+                # save the transcript to a json file
+                transcript_file = f"{file_dir}/{id}.json"
+                with open(transcript_file, "w") as f:
+                    json.dump(data, f)
 
-            try:
-                model = WhisperModel(**whisper_kwargs)
-            except:
-                log.warning(
-                    "WhisperModel initialization failed, attempting download with local_files_only=False"
+            if stream:
+                # One JSON line per decoded segment, then the full transcript
+                async def stream_segments():
+                    texts = []
+                    try:
+                        async for segment in segments:
+                            texts.append(segment.text)
+                            yield json.dumps(
+                                {
+                                    "start": segment.start,
+                                    "end": segment.end,
+                                    "text": segment.text,
+                                }
+                            ) + "\n"
+                    except Exception as e:
+                        log.exception(e)
+                        yield json.dumps({"error": ERROR_MESSAGES.DEFAULT(e)}) + "\n"
+                        return
+
+                    data = {"text": "".join(texts).strip()}
+                    save_transcript(data)
+                    yield json.dumps({**data, "done": True}) + "\n"
+
+                return StreamingResponse(
+                    stream_segments(), media_type="application/x-ndjson"
                 )
-                whisper_kwargs["local_files_only"] = False
-                model = WhisperModel(**whisper_kwargs)
 
-            segments, info = model.transcribe(file_path, beam_size=5)
-            log.info(
-                "Detected language '%s' with probability %f"
-                % (info.language, info.language_probability)
-            )
-
-            transcript = "".join([segment.text for segment in list(segments)])
+            transcript = "".join([segment.text async for segment in segments])
 
             data = {"text": transcript.strip()}
-
-            # save the transcript to a json file
-            transcript_file = f"{file_dir}/{id}.json"
-            with open(transcript_file, "w") as f:
-                json.dump(data, f)
+            save_transcript(data)
 
             print(data)
 
@@ -332,7 +361,8 @@ def transcribe(
 
             r = None
             try:
-                r = requests.post(
+                r = await run_in_threadpool(
+                    requests.post,
                     url=f"{app.state.config.STT_OPENAI_API_BASE_URL}/audio/transcriptions",
                     headers=headers,
                     files=files,
@@ -366,6 +396,11 @@ def transcribe(
                     detail=error_detail,
                 )
 
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=ERROR_MESSAGES.FILE_TOO_LARGE(e.max_size),
+        )
     except Exception as e:
         log.exception(e)
 
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["AUDIO"])
+
+
+class WhisperModelPool:
+    """
+    Process-wide faster-whisper model shared by all transcription requests.
+
+    The model is loaded once, on first use or by `preload`. At most `workers`
+    transcriptions decode at the same time, each on its share of the CPU cores,
+    and up to `queue_size` more wait for a free worker; `is_full` tells the
+    caller to turn further requests away.
+    """
+
+    def __init__(self, model_kwargs, workers=1, queue_size=8, cpu_threads=0):
+        self.model_kwargs = model_kwargs
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.workers)
+
+        self.model = None
+        self.lock = threading.Lock()
+        self.semaphore = asyncio.Semaphore(self.workers)
+        self.running = 0
+        self.waiting = 0
+
+    def load(self):
+        from faster_whisper import WhisperModel
+
+        whisper_kwargs = {
+            **self.model_kwargs,
+            "num_workers": self.workers,
+            "cpu_threads": self.cpu_threads,
+        }
+        log.debug(f"whisper_kwargs: {whisper_kwargs}")
+
+        start_time = time.perf_counter()
+        try:
+            model = WhisperModel(**whisper_kwargs)
+        except:
+            log.warning(
+                "WhisperModel initialization failed, attempting download with local_files_only=False"
+            )
+            whisper_kwargs["local_files_only"] = False
+            model = WhisperModel(**whisper_kwargs)
+
+        log.info(
+            f"Loaded whisper model {self.model_kwargs.get('model_size_or_path')} "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+        return model
+
+    def get_model(self):
+        with self.lock:
+            if self.model is None:
+                self.model = self.load()
+            return self.model
+
+    def preload(self):
+        try:
+            self.get_model()
+        except Exception as e:
+            log.error(f"Error preloading whisper model: {e}")
+
+    def is_full(self) -> bool:
+        return self.running >= self.workers and self.waiting >= self.queue_size
+
+    async def transcribe(self, file_path, **kwargs):
+        """
+        Transcribe an audio file, yielding segments as they are decoded. The
+        worker is held until the generator is exhausted or closed.
+        """
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            model = await run_in_threadpool(self.get_model)
+            segments, info = await run_in_threadpool(
+                model.transcribe, file_path, **kwargs
+            )
+            log.info(
+                "Detected language '%s' with probability %f"
+                % (info.language, info.language_probability)
+            )
+
+            # Segments are decoded lazily, one per next() call
+            while True:
+                segment = await run_in_threadpool(next, segments, None)
+                if segment is None:
+                    break
+                yield segment
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    def get_stats(self) -> dict:
+        return {
+            "loaded": self.model is not None,
+            "workers": self.workers,
+            "cpu_threads": self.cpu_threads,
+            "running": self.running,
+            "waiting": self.waiting,
+        }
+
+
+def get_speech_cache_key(body: dict) -> str:
+    """
+    Cache key of a speech request: the SHA-256 of its parameters with sorted
+    keys and the input text NFC-normalized and whitespace-collapsed, so that
+    formatting differences in the request body map to the same audio.
+    """
+    text = unicodedata.normalize("NFC", str(body.get("input", "")))
+    body = {**body, "input": " ".join(text.split())}
+    return hashlib.sha256(
+        json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+class SpeechFlight:
+    """
+    An upstream speech request in progress. Chunks are kept as they arrive so
+    that every request waiting on the same key streams the same audio.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.started = asyncio.Event()
+        self.condition = asyncio.Condition()
+        self.done = False
+        self.error = None
+
+    async def append(self, chunk: bytes):
+        async with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    async def finish(self, error: Optional[Exception] = None):
+        async with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+        self.started.set()
+
+    async def stream(self):
+        index = 0
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(
+                    lambda: index < len(self.chunks) or self.done
+                )
+                chunks = self.chunks[index:]
+                done = self.done
+            index += len(chunks)
+            for chunk in chunks:
+                yield chunk
+            if done and index >= len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SpeechCache:
+    """
+    Synthesized speech files in `cache_dir`, keyed by `get_speech_cache_key`.
+
+    An in-memory index of the files, rebuilt from the directory at startup,
+    keeps them in least recently used order; entries older than `ttl` seconds
+    are dropped and the least recently used ones are evicted once the cache
+    grows over `max_size` bytes. Files are written to a temporary name and
+    renamed into place, and concurrent requests for the same key share a
+    single upstream request.
+    """
+
+    CHUNK_SIZE = 8192
+
+    def __init__(
+        self,
+        cache_dir,
+        max_size: Optional[int] = None,
+        ttl: Optional[int] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.lock = threading.Lock()
+        # key -> (size, created_at), least recently used first
+        self.entries = OrderedDict()
+        self.size = 0
+        self.flights = {}
+
+        self.load()
+
+    def get_file_path(self, key: str) -> Path:
+        return self.cache_dir.joinpath(f"{key}.mp3")
+
+    def load(self):
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.name.endswith(".tmp"):
+                # Left behind by an interrupted write
+                path.unlink(missing_ok=True)
+            elif path.suffix == ".mp3":
+                stat = path.stat()
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+
+        with self.lock:
+            for mtime, key, size in sorted(files):
+                self.entries[key] = (size, mtime)
+                self.size += size
+            self.evict()
+
+        log.info(f"Loaded {len(self.entries)} cached speech files ({self.size} bytes)")
+
+    def remove(self, key: str):
+        # Caller holds the lock
+        size, _ = self.entries.pop(key)
+        self.size -= size
+        self.get_file_path(key).unlink(missing_ok=True)
+        self.cache_dir.joinpath(f"{key}.json").unlink(missing_ok=True)
+
+    def evict(self):
+        # Caller holds the lock
+        if self.ttl is not None:
+            expired_at = time.time() - self.ttl
+            for key in [
+                key
+                for key, (_, created_at) in self.entries.items()
+                if created_at < expired_at
+            ]:
+                self.remove(key)
+
+        if self.max_size is not None:
+            while self.size > self.max_size and self.entries:
+                self.remove(next(iter(self.entries)))
+
+    def get(self, key: str) -> Optional[Path]:
+        with self.lock:
+            if key not in self.entries:
+                return None
+
+            _, created_at = self.entries[key]
+            file_path = self.get_file_path(key)
+            if (
+                self.ttl is not None and created_at < time.time() - self.ttl
+            ) or not file_path.is_file():
+                self.remove(key)
+                return None
+
+            self.entries.move_to_end(key)
+            return file_path
+
+    def put(self, key: str, tmp_path: Path, body: dict):
+        file_path = self.get_file_path(key)
+        os.replace(tmp_path, file_path)
+        with open(self.cache_dir.joinpath(f"{key}.json"), "w") as f:
+            json.dump(body, f)
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[0]
+            size = file_path.stat().st_size
+            self.entries[key] = (size, time.time())
+            self.size += size
+            self.evict()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "files": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "in_flight": len(self.flights),
+            }
+
+    async def fetch(self, key: str, body: dict, open_stream: Callable[[], Iterator]):
+        """
+        Stream the audio of a cache miss. The first request for a key calls
+        `open_stream` in the threadpool and copies the chunks of the iterator
+        it returns to the cache, later requests for the same key attach to it.
+        Errors raised by `open_stream` are raised here, in every request.
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = SpeechFlight()
+            self.flights[key] = flight
+            # Not tied to the request, the file is cached even if it goes away
+            asyncio.create_task(self.run(key, body, open_stream, flight))
+
+        await flight.started.wait()
+        if flight.done and flight.error is not None and not flight.chunks:
+            raise flight.error
+        return flight.stream()
+
+    def copy_chunk(self, chunks: Iterator, f) -> Optional[bytes]:
+        chunk = next(chunks, None)
+        if chunk:
+            f.write(chunk)
+        return chunk
+
+    async def run(self, key, body, open_stream, flight: SpeechFlight):
+        tmp_path = self.cache_dir.joinpath(f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            chunks = await run_in_threadpool(open_stream)
+            flight.started.set()
+
+            with open(tmp_path, "wb") as f:
+                while True:
+                    chunk = await run_in_threadpool(self.copy_chunk, chunks, f)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await flight.append(chunk)
+
+            await run_in_threadpool(self.put, key, tmp_path, body)
+            await flight.finish()
+        except Exception as e:
+            log.exception(f"Error synthesizing speech: {e}")
+            tmp_path.unlink(missing_ok=True)
+            await flight.finish(e)
+        finally:
+            self.flights.pop(key, None)
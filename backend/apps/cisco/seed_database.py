@@ -15,7 +15,8 @@ Prerequisites:
 
 Notes:
     1. Starting the backend server runs migrations automatically.
-    2. This script utilizes API endpoints to insert data so its paramount that the backend server is running.
+    2. Series are inserted through the API endpoints so its paramount that the backend server is running.
+       Articles are bulk inserted directly into the database.
     3. As of now, anybody can use the API endpoint to upload Series/Articles. This will be restricted in the future. e.g., depends(is_admin_user)
 
 Usage:
@@ -152,19 +153,25 @@ async def get_all_series():
 # If you want to manually insert articles, you can use the following function
 # Note: The `insert_series` function should be run before this function
 async def insert_articles_for_series():
-    series = await get_all_series()
-    if not series or (isinstance(series, list) and len(series) == 0):
+    # Articles are written straight to the database with one bulk insert,
+    # instead of one POST to /articles/add per article
+    from apps.webui.models.articles import Article_Table
+    from apps.webui.models.series import Series_Table
+
+    series = Series_Table.get_all_series(limit=None)
+    if not series:
         logger.error(
             "The database contains no series (Product Families). Running insert_series()..."
         )
         await insert_series()
-        series = await get_all_series()
+        series = Series_Table.get_all_series(limit=None)
 
-    series_map: dict[str, str] = {s["name"]: s["id"] for s in series}
+    series_map: dict[str, str] = {s.name: s.id for s in series}
     articles_data = json.loads(
         open(f"{JSON_DIR}/articles.json", encoding="utf-8").read()
     )
 
+    articles = []
     for article in articles_data:
         series_name = article.get("series", None)
         if not series_name:
@@ -174,55 +181,51 @@ async def insert_articles_for_series():
             continue
         series_id = series_map.get(series_name, None)
         if series_id:
-            try:
-                article_schema = {
-                    "series_id": series_id,
-                    "title": article.get("title"),
-                    "document_id": article.get("document_id"),
-                    "url": article.get("url"),
-                    "category": article.get("category"),
-                    "objective": article.get("objective"),
-                    "introduction": article.get("introduction"),
-                    "applicable_devices": article.get("applicable_devices", []),
-                    "steps": article.get("steps", []),
-                    "revision_history": article.get("revision_history", []),
-                    "published": True,
-                }
-                article_schema["steps"] = list(
-                    map(
-                        lambda x: {
-                            **x,
-                            "qna_pairs": [
-                                {
-                                    "id": "static_1",
-                                    "question": "I don't understand this step",
-                                    "answer": None,
-                                },
-                                {
-                                    "id": "static_2",
-                                    "question": "I need help troubleshooting",
-                                    "answer": None,
-                                },
-                                {
-                                    "id": "static_3",
-                                    "question": "Show best practices",
-                                    "answer": None,
-                                },
-                            ],
-                        },
-                        article_schema["steps"],
-                    )
+            article_schema = {
+                "series_id": series_id,
+                "title": article.get("title"),
+                "document_id": article.get("document_id"),
+                "url": article.get("url"),
+                "category": article.get("category"),
+                "objective": article.get("objective"),
+                "introduction": article.get("introduction"),
+                "applicable_devices": article.get("applicable_devices", []),
+                "steps": article.get("steps", []),
+                "revision_history": article.get("revision_history", []),
+                "published": True,
+            }
+            article_schema["steps"] = list(
+                map(
+                    lambda x: {
+                        **x,
+                        "qna_pairs": [
+                            {
+                                "id": "static_1",
+                                "question": "I don't understand this step",
+                                "answer": None,
+                            },
+                            {
+                                "id": "static_2",
+                                "question": "I need help troubleshooting",
+                                "answer": None,
+                            },
+                            {
+                                "id": "static_3",
+                                "question": "Show best practices",
+                                "answer": None,
+                            },
+                        ],
+                    },
+                    article_schema["steps"] or [],
                 )
+            )
+            articles.append(article_schema)
 
-                res = requests.post(f"{ARTICLES_API_URL}/add", json=article_schema)
-                print(f"Article POST returned status: {res.status_code}")
-                res.raise_for_status()  # Raise an exception for bad responses
-                article = res.json()
-                print(f"Article JSON Response: {json.dumps(article, indent=2)}")
-
-            except Exception as e:
-                print(f"Error processing article: {e}")
-                continue
+    try:
+        inserted = Article_Table.insert_new_articles(articles)
+        logger.info(f"Seeded {len(inserted)} articles")
+    except Exception as e:
+        logger.error(f"Error inserting articles: {e}")
 
 
 async def add_article(article: dict):
@@ -1,4 +1,5 @@
 import re
+import asyncio
 import requests
 import base64
 from fastapi import (
@@ -12,6 +13,8 @@ from fastapi import (
     Form,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 
 from constants import ERROR_MESSAGES
 from utils.utils import (
@@ -20,6 +23,8 @@ from utils.utils import (
 )
 
 from apps.images.utils.comfyui import ImageGenerationPayload, comfyui_generate_image
+from apps.images.utils.engines import ImageEngineClient
+from apps.images.utils.store import ImageStore
 from utils.misc import calculate_sha256
 from typing import Optional
 from pydantic import BaseModel
@@ -45,6 +50,10 @@ from config import (
     IMAGES_OPENAI_API_BASE_URL,
     IMAGES_OPENAI_API_KEY,
     IMAGE_GENERATION_MODEL,
+    IMAGE_GENERATION_CONCURRENCY,
+    IMAGE_CACHE_MAX_SIZE,
+    IMAGE_THUMBNAIL_SIZE,
+    AIOHTTP_CLIENT_TIMEOUT,
     IMAGE_SIZE,
     IMAGE_STEPS,
     AppConfig,
@@ -86,6 +95,13 @@ app.state.config.COMFYUI_SAMPLER = COMFYUI_SAMPLER
 app.state.config.COMFYUI_SCHEDULER = COMFYUI_SCHEDULER
 app.state.config.COMFYUI_SD3 = COMFYUI_SD3
 
+app.state.CLIENT = ImageEngineClient(timeout=AIOHTTP_CLIENT_TIMEOUT)
+app.state.IMAGES = ImageStore(
+    IMAGE_CACHE_DIR,
+    max_size=IMAGE_CACHE_MAX_SIZE,
+    thumbnail_size=IMAGE_THUMBNAIL_SIZE,
+)
+
 
 def get_automatic1111_api_auth():
     if app.state.config.AUTOMATIC1111_API_AUTH == None:
@@ -257,7 +273,7 @@ async def update_image_size(
 
 
 @app.get("/models")
-def get_models(user=Depends(get_verified_user)):
+async def get_models(user=Depends(get_verified_user)):
     try:
         if app.state.config.ENGINE == "openai":
             return [
@@ -266,8 +282,9 @@ def get_models(user=Depends(get_verified_user)):
             ]
         elif app.state.config.ENGINE == "comfyui":
 
-            r = requests.get(url=f"{app.state.config.COMFYUI_BASE_URL}/object_info")
-            info = r.json()
+            info = await app.state.CLIENT.get_json(
+                f"{app.state.config.COMFYUI_BASE_URL}/object_info"
+            )
 
             return list(
                 map(
@@ -277,11 +294,10 @@ def get_models(user=Depends(get_verified_user)):
             )
 
         else:
-            r = requests.get(
-                url=f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/sd-models",
+            models = await app.state.CLIENT.get_json(
+                f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/sd-models",
                 headers={"authorization": get_automatic1111_api_auth()},
             )
-            models = r.json()
             return list(
                 map(
                     lambda model: {"id": model["title"], "name": model["model_name"]},
@@ -305,11 +321,10 @@ async def get_default_model(user=Depends(get_admin_user)):
         elif app.state.config.ENGINE == "comfyui":
             return {"model": (app.state.config.MODEL if app.state.config.MODEL else "")}
         else:
-            r = requests.get(
-                url=f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
+            options = await app.state.CLIENT.get_json(
+                f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
                 headers={"authorization": get_automatic1111_api_auth()},
             )
-            options = r.json()
             return {"model": options["sd_model_checkpoint"]}
     except Exception as e:
         app.state.config.ENABLED = False
@@ -320,22 +335,21 @@ class UpdateModelForm(BaseModel):
     model: str
 
 
-def set_model_handler(model: str):
+async def set_model_handler(model: str):
     if app.state.config.ENGINE in ["openai", "comfyui"]:
         app.state.config.MODEL = model
         return app.state.config.MODEL
     else:
         api_auth = get_automatic1111_api_auth()
-        r = requests.get(
-            url=f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
+        options = await app.state.CLIENT.get_json(
+            f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
             headers={"authorization": api_auth},
         )
-        options = r.json()
 
         if model != options["sd_model_checkpoint"]:
             options["sd_model_checkpoint"] = model
-            r = requests.post(
-                url=f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
+            await app.state.CLIENT.post_json(
+                f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/options",
                 json=options,
                 headers={"authorization": api_auth},
             )
@@ -344,11 +358,11 @@ def set_model_handler(model: str):
 
 
 @app.post("/models/default/update")
-def update_default_model(
+async def update_default_model(
     form_data: UpdateModelForm,
     user=Depends(get_verified_user),
 ):
-    return set_model_handler(form_data.model)
+    return await set_model_handler(form_data.model)
 
 
 class GenerateImageForm(BaseModel):
@@ -359,58 +373,31 @@ class GenerateImageForm(BaseModel):
     negative_prompt: Optional[str] = None
 
 
-def save_b64_image(b64_str):
+def save_b64_image(b64_str, data):
     try:
-        image_id = str(uuid.uuid4())
-
         if "," in b64_str:
             header, encoded = b64_str.split(",", 1)
             mime_type = header.split(";")[0]
+            if mime_type.startswith("data:"):
+                mime_type = mime_type[len("data:") :]
 
-            img_data = base64.b64decode(encoded)
-            image_format = mimetypes.guess_extension(mime_type)
-
-            image_filename = f"{image_id}{image_format}"
-            file_path = IMAGE_CACHE_DIR / f"{image_filename}"
-            with open(file_path, "wb") as f:
-                f.write(img_data)
-            return image_filename
+            return app.state.IMAGES.save(base64.b64decode(encoded), mime_type, data)
         else:
-            image_filename = f"{image_id}.png"
-            file_path = IMAGE_CACHE_DIR.joinpath(image_filename)
-
-            img_data = base64.b64decode(b64_str)
-
-            # Write the image data to a file
-            with open(file_path, "wb") as f:
-                f.write(img_data)
-            return image_filename
+            return app.state.IMAGES.save(base64.b64decode(b64_str), "image/png", data)
 
     except Exception as e:
         log.exception(f"Error saving image: {e}")
         return None
 
 
-def save_url_image(url):
-    image_id = str(uuid.uuid4())
+async def save_url_image(url, data):
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-        if r.headers["content-type"].split("/")[0] == "image":
-
-            mime_type = r.headers["content-type"]
-            image_format = mimetypes.guess_extension(mime_type)
-
-            if not image_format:
-                raise ValueError("Could not determine image type from MIME type")
-
-            image_filename = f"{image_id}{image_format}"
-
-            file_path = IMAGE_CACHE_DIR.joinpath(f"{image_filename}")
-            with open(file_path, "wb") as image_file:
-                for chunk in r.iter_content(chunk_size=8192):
-                    image_file.write(chunk)
-            return image_filename
+        content_type, img_data = await app.state.CLIENT.read(url)
+        if content_type.split("/")[0] == "image":
+            mime_type = content_type.split(";")[0]
+            return await run_in_threadpool(
+                app.state.IMAGES.save, img_data, mime_type, data
+            )
         else:
             log.error(f"Url does not point to an image.")
             return None
@@ -420,6 +407,58 @@ def save_url_image(url):
         return None
 
 
+def get_image_urls(image_filenames):
+    return [
+        {
+            "url": f"/images/api/v1/generations/{image_filename}",
+            "thumbnail_url": f"/images/api/v1/generations/{image_filename}/thumbnail",
+        }
+        for image_filename in image_filenames
+        if image_filename is not None
+    ]
+
+
+async def save_b64_images(b64_images, data):
+    """
+    Decode and store generated images in the threadpool, concurrently.
+    """
+    image_filenames = await asyncio.gather(
+        *[run_in_threadpool(save_b64_image, b64_str, data) for b64_str in b64_images]
+    )
+    return get_image_urls(image_filenames)
+
+
+# Generated images are named by their content, they never change
+IMAGE_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+def get_image_response(request: Request, file_path: Path, etag: str):
+    headers = {**IMAGE_CACHE_HEADERS, "ETag": f'"{etag}"'}
+    if request.headers.get("if-none-match") in [f'"{etag}"', f'W/"{etag}"']:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(file_path, headers=headers)
+
+
+@app.get("/generations/{filename}")
+async def get_image(filename: str, request: Request):
+    file_path = app.state.IMAGES.get(filename)
+    if file_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+    return get_image_response(request, file_path, Path(filename).stem)
+
+
+@app.get("/generations/{filename}/thumbnail")
+async def get_image_thumbnail(filename: str, request: Request):
+    file_path = await run_in_threadpool(app.state.IMAGES.get_thumbnail, filename)
+    if file_path is None:
+        # Not an image Pillow can read, fall back to the image itself
+        return await get_image(filename, request)
+    return get_image_response(request, file_path, f"{Path(filename).stem}-thumbnail")
+
+
 @app.post("/generations")
 async def image_generations(
     form_data: GenerateImageForm,
@@ -427,7 +466,6 @@ async def image_generations(
 ):
     width, height = tuple(map(int, app.state.config.IMAGE_SIZE.split("x")))
 
-    r = None
     try:
         if app.state.config.ENGINE == "openai":
 
@@ -449,26 +487,25 @@ async def image_generations(
                 "response_format": "b64_json",
             }
 
-            r = requests.post(
-                url=f"{app.state.config.OPENAI_API_BASE_URL}/images/generations",
-                json=data,
-                headers=headers,
-            )
-
-            r.raise_for_status()
-            res = r.json()
-
-            images = []
-
-            for image in res["data"]:
-                image_filename = save_b64_image(image["b64_json"])
-                images.append({"url": f"/cache/image/generations/{image_filename}"})
-                file_body_path = IMAGE_CACHE_DIR.joinpath(f"{image_filename}.json")
-
-                with open(file_body_path, "w") as f:
-                    json.dump(data, f)
+            # One image per request, requests run in parallel: dall-e-3 only
+            # generates a single image at a time
+            semaphore = asyncio.Semaphore(max(1, IMAGE_GENERATION_CONCURRENCY))
+
+            async def generate_image():
+                async with semaphore:
+                    res = await app.state.CLIENT.post_json(
+                        f"{app.state.config.OPENAI_API_BASE_URL}/images/generations",
+                        json={**data, "n": 1},
+                        headers=headers,
+                    )
+                return await save_b64_images(
+                    [image["b64_json"] for image in res["data"]], data
+                )
 
-            return images
+            results = await asyncio.gather(
+                *[generate_image() for _ in range(max(1, form_data.n))]
+            )
+            return [image for images in results for image in images]
 
         elif app.state.config.ENGINE == "comfyui":
 
@@ -499,29 +536,30 @@ async def image_generations(
 
             data = ImageGenerationPayload(**data)
 
-            res = comfyui_generate_image(
+            # ComfyUI sends progress to the last websocket of a client id, each
+            # generation needs its own
+            res = await comfyui_generate_image(
                 app.state.config.MODEL,
                 data,
-                user.id,
+                f"{user.id}-{uuid.uuid4()}",
                 app.state.config.COMFYUI_BASE_URL,
+                app.state.CLIENT,
             )
             log.debug(f"res: {res}")
 
-            images = []
-
-            for image in res["data"]:
-                image_filename = save_url_image(image["url"])
-                images.append({"url": f"/cache/image/generations/{image_filename}"})
-                file_body_path = IMAGE_CACHE_DIR.joinpath(f"{image_filename}.json")
-
-                with open(file_body_path, "w") as f:
-                    json.dump(data.model_dump(exclude_none=True), f)
+            image_filenames = await asyncio.gather(
+                *[
+                    save_url_image(image["url"], data.model_dump(exclude_none=True))
+                    for image in res["data"]
+                ]
+            )
+            images = get_image_urls(image_filenames)
 
             log.debug(f"images: {images}")
             return images
         else:
             if form_data.model:
-                set_model_handler(form_data.model)
+                await set_model_handler(form_data.model)
 
             data = {
                 "prompt": form_data.prompt,
@@ -536,33 +574,15 @@ async def image_generations(
             if form_data.negative_prompt is not None:
                 data["negative_prompt"] = form_data.negative_prompt
 
-            r = requests.post(
-                url=f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/txt2img",
+            res = await app.state.CLIENT.post_json(
+                f"{app.state.config.AUTOMATIC1111_BASE_URL}/sdapi/v1/txt2img",
                 json=data,
                 headers={"authorization": get_automatic1111_api_auth()},
             )
 
-            res = r.json()
-
             log.debug(f"res: {res}")
 
-            images = []
-
-            for image in res["images"]:
-                image_filename = save_b64_image(image)
-                images.append({"url": f"/cache/image/generations/{image_filename}"})
-                file_body_path = IMAGE_CACHE_DIR.joinpath(f"{image_filename}.json")
-
-                with open(file_body_path, "w") as f:
-                    json.dump({**data, "info": res["info"]}, f)
-
-            return images
+            return await save_b64_images(res["images"], {**data, "info": res["info"]})
 
     except Exception as e:
-        error = e
-
-        if r != None:
-            data = r.json()
-            if "error" in data:
-                error = data["error"]["message"]
-        raise HTTPException(status_code=400, detail=ERROR_MESSAGES.DEFAULT(error))
+        raise HTTPException(status_code=400, detail=ERROR_MESSAGES.DEFAULT(e))
@@ -1,11 +1,12 @@
-import websocket  # NOTE: websocket-client (https://github.com/websocket-client/websocket-client)
+import aiohttp
 import uuid
 import json
-import urllib.request
 import urllib.parse
 import random
 import logging
 
+from apps.images.utils.engines import ImageEngineClient, ImageEngineError
+
 from config import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
@@ -126,20 +127,20 @@ COMFYUI_DEFAULT_PROMPT = """
 """
 
 
-def queue_prompt(prompt, client_id, base_url):
+async def queue_prompt(client: ImageEngineClient, prompt, client_id, base_url):
     log.info("queue_prompt")
     p = {"prompt": prompt, "client_id": client_id}
-    data = json.dumps(p).encode("utf-8")
-    req = urllib.request.Request(f"{base_url}/prompt", data=data)
-    return json.loads(urllib.request.urlopen(req).read())
+    return await client.post_json(f"{base_url}/prompt", json=p)
 
 
-def get_image(filename, subfolder, folder_type, base_url):
+async def get_image(
+    client: ImageEngineClient, filename, subfolder, folder_type, base_url
+):
     log.info("get_image")
-    data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-    url_values = urllib.parse.urlencode(data)
-    with urllib.request.urlopen(f"{base_url}/view?{url_values}") as response:
-        return response.read()
+    _, data = await client.read(
+        get_image_url(filename, subfolder, folder_type, base_url)
+    )
+    return data
 
 
 def get_image_url(filename, subfolder, folder_type, base_url):
@@ -149,36 +150,36 @@ def get_image_url(filename, subfolder, folder_type, base_url):
     return f"{base_url}/view?{url_values}"
 
 
-def get_history(prompt_id, base_url):
+async def get_history(client: ImageEngineClient, prompt_id, base_url):
     log.info("get_history")
-    with urllib.request.urlopen(f"{base_url}/history/{prompt_id}") as response:
-        return json.loads(response.read())
+    return await client.get_json(f"{base_url}/history/{prompt_id}")
 
 
-def get_images(ws, prompt, client_id, base_url):
-    prompt_id = queue_prompt(prompt, client_id, base_url)["prompt_id"]
+async def get_images(ws, client: ImageEngineClient, prompt, client_id, base_url):
+    prompt_id = (await queue_prompt(client, prompt, client_id, base_url))["prompt_id"]
     output_images = []
-    while True:
-        out = ws.recv()
-        if isinstance(out, str):
-            message = json.loads(out)
+    async for out in ws:
+        if out.type == aiohttp.WSMsgType.TEXT:
+            message = json.loads(out.data)
             if message["type"] == "executing":
                 data = message["data"]
                 if data["node"] is None and data["prompt_id"] == prompt_id:
                     break  # Execution is done
-        else:
-            continue  # previews are binary data
-
-    history = get_history(prompt_id, base_url)[prompt_id]
-    for o in history["outputs"]:
-        for node_id in history["outputs"]:
-            node_output = history["outputs"][node_id]
-            if "images" in node_output:
-                for image in node_output["images"]:
-                    url = get_image_url(
-                        image["filename"], image["subfolder"], image["type"], base_url
-                    )
-                    output_images.append({"url": url})
+        elif out.type == aiohttp.WSMsgType.ERROR:
+            raise ImageEngineError(f"WebSocket error: {ws.exception()}")
+        # previews are binary data
+    else:
+        raise ImageEngineError("WebSocket connection closed before completion")
+
+    history = (await get_history(client, prompt_id, base_url))[prompt_id]
+    for node_id in history["outputs"]:
+        node_output = history["outputs"][node_id]
+        if "images" in node_output:
+            for image in node_output["images"]:
+                url = get_image_url(
+                    image["filename"], image["subfolder"], image["type"], base_url
+                )
+                output_images.append({"url": url})
     return {"data": output_images}
 
 
@@ -196,8 +197,12 @@ class ImageGenerationPayload(BaseModel):
     sd3: Optional[bool] = None
 
 
-def comfyui_generate_image(
-    model: str, payload: ImageGenerationPayload, client_id, base_url
+async def comfyui_generate_image(
+    model: str,
+    payload: ImageGenerationPayload,
+    client_id,
+    base_url,
+    client: ImageEngineClient,
 ):
     ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://")
 
@@ -232,19 +237,9 @@ def comfyui_generate_image(
     )
 
     try:
-        ws = websocket.WebSocket()
-        ws.connect(f"{ws_url}/ws?clientId={client_id}")
-        log.info("WebSocket connection established.")
-    except Exception as e:
-        log.exception(f"Failed to connect to WebSocket server: {e}")
-        return None
-
-    try:
-        images = get_images(ws, comfyui_prompt, client_id, base_url)
+        async with client.ws_connect(f"{ws_url}/ws?clientId={client_id}") as ws:
+            log.info("WebSocket connection established.")
+            return await get_images(ws, client, comfyui_prompt, client_id, base_url)
     except Exception as e:
         log.exception(f"Error while receiving images: {e}")
-        images = None
-
-    ws.close()
-
-    return images
+        return None
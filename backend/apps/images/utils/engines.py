@@ -0,0 +1,80 @@
+import logging
+from typing import Optional, Tuple
+
+import aiohttp
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["IMAGES"])
+
+
+class ImageEngineError(Exception):
+    pass
+
+
+def get_error_message(res) -> Optional[str]:
+    """
+    Error message of an engine response: {"error": {"message": ...}} for
+    OpenAI, {"error": ..., "detail": ...} for Automatic1111.
+    """
+    if not isinstance(res, dict):
+        return None
+    error = res.get("error")
+    if isinstance(error, dict):
+        return error.get("message")
+    return res.get("detail") or error
+
+
+class ImageEngineClient:
+    """
+    HTTP and websocket client shared by the image generation engines. A single
+    aiohttp session, created on first use, keeps connections to the engines
+    alive between generations instead of opening new ones for every request.
+    """
+
+    def __init__(self, timeout: Optional[int] = None):
+        self.timeout = timeout
+        self.session = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                trust_env=True, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    async def request_json(self, method: str, url: str, **kwargs):
+        async with self.get_session().request(method, url, **kwargs) as r:
+            try:
+                res = await r.json(content_type=None)
+            except Exception:
+                res = None
+
+            if not r.ok:
+                raise ImageEngineError(
+                    get_error_message(res) or f"{r.status} {r.reason}"
+                )
+            return res
+
+    async def get_json(self, url: str, **kwargs):
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url: str, **kwargs):
+        return await self.request_json("POST", url, **kwargs)
+
+    async def read(self, url: str, **kwargs) -> Tuple[str, bytes]:
+        """
+        Download a file, returning its content type and content.
+        """
+        async with self.get_session().get(url, **kwargs) as r:
+            r.raise_for_status()
+            return r.headers.get("content-type", ""), await r.read()
+
+    def ws_connect(self, url: str, **kwargs):
+        return self.get_session().ws_connect(url, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["IMAGES"])
+
+# SHA-256 of the content, or the UUID images were named by before
+IMAGE_FILENAME_PATTERN = re.compile(
+    r"^(?:[0-9a-f]{64}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"\.\w+$"
+)
+
+
+class ImageStore:
+    """
+    Generated images in `image_dir`, named by the SHA-256 of their content so
+    that the same image is only stored once and its URL never changes content.
+
+    Every image has a `<filename>.json` sidecar with the generation parameters
+    and a WebP thumbnail, at most `thumbnail_size` pixels wide or high, in the
+    `thumbnails` subdirectory. An in-memory index of the images, rebuilt from
+    the directory at startup, evicts the least recently used ones once the
+    store grows over `max_size` bytes. Images stored by other workers are
+    added to the index when they are first requested.
+    """
+
+    def __init__(
+        self,
+        image_dir,
+        max_size: Optional[int] = None,
+        thumbnail_size: int = 256,
+    ):
+        self.image_dir = Path(image_dir)
+        self.thumbnail_dir = self.image_dir.joinpath("thumbnails")
+        self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.thumbnail_size = thumbnail_size
+
+        self.lock = threading.Lock()
+        # filename -> size of the image, its sidecar and thumbnail, least
+        # recently used first
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.load()
+
+    def get_thumbnail_path(self, filename: str) -> Path:
+        return self.thumbnail_dir.joinpath(f"{Path(filename).stem}.webp")
+
+    def get_metadata_path(self, filename: str) -> Path:
+        return self.image_dir.joinpath(f"{filename}.json")
+
+    def get_entry_size(self, filename: str) -> int:
+        return sum(
+            path.stat().st_size
+            for path in [
+                self.image_dir.joinpath(filename),
+                self.get_metadata_path(filename),
+                self.get_thumbnail_path(filename),
+            ]
+            if path.is_file()
+        )
+
+    def load(self):
+        files = []
+        for path in self.image_dir.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.endswith(".tmp"):
+                # Left behind by an interrupted write
+                path.unlink(missing_ok=True)
+            elif path.suffix != ".json":
+                files.append((path.stat().st_mtime, path.name))
+
+        with self.lock:
+            for _, filename in sorted(files):
+                size = self.get_entry_size(filename)
+                self.entries[filename] = size
+                self.size += size
+            self.evict()
+
+        log.info(f"Loaded {len(self.entries)} generated images ({self.size} bytes)")
+
+    def remove(self, filename: str):
+        # Caller holds the lock
+        self.size -= self.entries.pop(filename)
+        for path in [
+            self.image_dir.joinpath(filename),
+            self.get_metadata_path(filename),
+            self.get_thumbnail_path(filename),
+        ]:
+            path.unlink(missing_ok=True)
+
+    def evict(self):
+        # Caller holds the lock
+        if self.max_size is not None:
+            while self.size > self.max_size and self.entries:
+                self.remove(next(iter(self.entries)))
+
+    def write(self, path: Path, data: bytes):
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def make_thumbnail(self, filename: str) -> Optional[Path]:
+        from PIL import Image
+
+        thumbnail_path = self.get_thumbnail_path(filename)
+        tmp_path = thumbnail_path.with_name(
+            f"{thumbnail_path.name}.{uuid.uuid4().hex}.tmp"
+        )
+        try:
+            with Image.open(self.image_dir.joinpath(filename)) as image:
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                if image.mode not in ["RGB", "RGBA"]:
+                    image = image.convert("RGBA")
+                image.save(tmp_path, format="WEBP")
+            os.replace(tmp_path, thumbnail_path)
+            return thumbnail_path
+        except Exception as e:
+            log.warning(f"Could not create a thumbnail of {filename}: {e}")
+            return None
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def save(self, data: bytes, mime_type: str, metadata: dict) -> str:
+        """
+        Store an image and its generation parameters, returning its filename.
+        Storing an image that is already there only refreshes its sidecar.
+        """
+        image_format = mimetypes.guess_extension(mime_type)
+        if not image_format:
+            raise ValueError("Could not determine image type from MIME type")
+
+        filename = f"{hashlib.sha256(data).hexdigest()}{image_format}"
+        file_path = self.image_dir.joinpath(filename)
+
+        if file_path.is_file():
+            os.utime(file_path)
+        else:
+            self.write(file_path, data)
+            self.make_thumbnail(filename)
+
+        self.write(
+            self.get_metadata_path(filename), json.dumps(metadata).encode("utf-8")
+        )
+
+        with self.lock:
+            if filename in self.entries:
+                self.size -= self.entries.pop(filename)
+            size = self.get_entry_size(filename)
+            self.entries[filename] = size
+            self.size += size
+            self.evict()
+
+        return filename
+
+    def get(self, filename: str) -> Optional[Path]:
+        if not IMAGE_FILENAME_PATTERN.fullmatch(filename):
+            return None
+
+        # Another worker may have stored or evicted it
+        file_path = self.image_dir.joinpath(filename)
+        is_file = file_path.is_file()
+        with self.lock:
+            if not is_file:
+                if filename in self.entries:
+                    self.size -= self.entries.pop(filename)
+                return None
+
+            if filename in self.entries:
+                self.entries.move_to_end(filename)
+            else:
+                size = self.get_entry_size(filename)
+                self.entries[filename] = size
+                self.size += size
+                self.evict()
+                if filename not in self.entries:
+                    return None
+        return file_path
+
+    def get_thumbnail(self, filename: str) -> Optional[Path]:
+        """
+        Thumbnail of a stored image, created on first access for images stored
+        before thumbnails existed. None if the image cannot be thumbnailed.
+        """
+        if self.get(filename) is None:
+            return None
+
+        thumbnail_path = self.get_thumbnail_path(filename)
+        if thumbnail_path.is_file():
+            return thumbnail_path
+
+        thumbnail_path = self.make_thumbnail(filename)
+        if thumbnail_path is not None:
+            with self.lock:
+                if filename in self.entries:
+                    size = self.get_entry_size(filename)
+                    self.size += size - self.entries[filename]
+                    self.entries[filename] = size
+        return thumbnail_path
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "images": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_size,
+            }
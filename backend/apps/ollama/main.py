@@ -53,7 +53,11 @@ from config import (
     UPLOAD_DIR,
     AppConfig,
 )
-from utils.misc import calculate_sha256, add_or_update_system_message
+from utils.misc import (
+    calculate_sha256,
+    add_or_update_system_message,
+    save_upload_file,
+)
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
@@ -730,7 +734,7 @@ async def generate_chat_completion_questions(
         del payload["metadata"]
 
     model_id = form_data.model
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -946,7 +950,7 @@ async def generate_chat_completion(
         del payload["metadata"]
 
     model_id = form_data.model
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -1173,7 +1177,7 @@ async def generate_openai_chat_completion(
         del payload["metadata"]
 
     model_id = form_data.model
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -1431,7 +1435,7 @@ async def download_model(
 
 @app.post("/models/upload")
 @app.post("/models/upload/{url_idx}")
-def upload_model(
+async def upload_model(
     file: UploadFile = File(...),
     url_idx: Optional[int] = None,
     user=Depends(get_admin_user),
@@ -1442,14 +1446,11 @@ def upload_model(
 
     file_path = f"{UPLOAD_DIR}/{file.filename}"
 
-    # Save file in chunks
-    with open(file_path, "wb+") as f:
-        for chunk in file.file:
-            f.write(chunk)
+    # Save file in chunks, hashing it on the way
+    total_size, hashed = await save_upload_file(file, file_path)
 
     def file_process_stream():
         nonlocal ollama_url
-        total_size = os.path.getsize(file_path)
         chunk_size = 1024 * 1024
         try:
             with open(file_path, "rb") as f:
@@ -1474,8 +1475,6 @@ def upload_model(
 
                 if done:
                     f.seek(0)
-                    hashed = calculate_sha256(f)
-                    f.seek(0)
 
                     url = f"{ollama_url}/api/blobs/sha256:{hashed}"
                     response = requests.post(url, data=f)
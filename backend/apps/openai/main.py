@@ -78,7 +78,7 @@ async def get_body_and_model_and_user(request):
         raise Exception("Model not found")
     model = app.state.MODELS[model_id]
 
-    user = get_current_user(
+    user = await get_current_user(
         request,
         get_http_authorization_cred(request.headers.get("Authorization")),
     )
@@ -121,7 +121,7 @@ class ModelEmbeddingMiddleware(BaseHTTPMiddleware):
                         status_code=status.HTTP_404_NOT_FOUND,
                         detail="Model not found",
                     )
-                model_info = Models.get_model_by_id(model_id)
+                model_info = await Models.get_model_by_id_async(model_id)
 
                 if model_info:
                     if model_info.base_model_id:
@@ -455,7 +455,7 @@ async def generate_questions_chat_completion(
     idx = 0
     payload = {**form_data}
     model_id = form_data.get("model")
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -546,7 +546,7 @@ async def generate_answers_chat_completions(
     idx = 0
     payload = {**form_data}
     model_id = form_data.get("model")
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -642,7 +642,7 @@ async def generate_chat_completion(
         del payload["metadata"]
 
     model_id = form_data.get("model")
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     if model_info:
         if model_info.base_model_id:
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Below SQLite's default limit of host parameters per statement
+BATCH_SIZE = 500
+
+
+def get_chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """
+    Embeddings of chunk texts by (model, SHA-256 of the text), shared by all
+    vector collections, in a SQLite database at `path`. Documents ingested
+    into several collections are embedded once per model.
+
+    Collections reference the chunks they hold; a chunk's `refcount` is the
+    number of times it is held across collections. Releasing a collection
+    drops its references, and `collect_garbage` deletes the chunks no
+    collection holds anymore.
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            # Readers don't block the writer of another worker process
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk (
+                    model TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (model, hash)
+                )
+                """
+            )
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_chunk (
+                    collection_name TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (collection_name, model, hash)
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS chunk_refcount_idx ON chunk (refcount)"
+            )
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Stored embeddings of the given chunk hashes, by hash."""
+        hashes = list(set(hashes))
+        embeddings = {}
+        with self.lock:
+            for i in range(0, len(hashes), BATCH_SIZE):
+                batch = hashes[i : i + BATCH_SIZE]
+                rows = self.connection.execute(
+                    f"SELECT hash, embedding FROM chunk WHERE model = ? "
+                    f"AND hash IN ({', '.join('?' * len(batch))})",
+                    [model, *batch],
+                )
+                for hash, embedding in rows:
+                    embeddings[hash] = np.frombuffer(
+                        embedding, dtype=np.float32
+                    ).tolist()
+        return embeddings
+
+    def add(
+        self,
+        collection_name: str,
+        model: str,
+        hashes: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ):
+        """
+        Record that a collection holds chunks, once per occurrence, storing
+        the embeddings of those not stored yet.
+        """
+        counts = Counter(hashes)
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO chunk (model, hash, embedding) VALUES (?, ?, ?)",
+                [
+                    (model, hash, np.asarray(embedding, dtype=np.float32).tobytes())
+                    for hash, embedding in dict(zip(hashes, embeddings)).items()
+                ],
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO collection_chunk (collection_name, model, hash, count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (collection_name, model, hash)
+                DO UPDATE SET count = count + excluded.count
+                """,
+                [(collection_name, model, hash, c) for hash, c in counts.items()],
+            )
+            self.connection.executemany(
+                "UPDATE chunk SET refcount = refcount + ? WHERE model = ? AND hash = ?",
+                [(c, model, hash) for hash, c in counts.items()],
+            )
+
+    def release(self, collection_name: str) -> int:
+        """Drop the references of a collection, returning how many it held."""
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                "SELECT model, hash, count FROM collection_chunk "
+                "WHERE collection_name = ?",
+                [collection_name],
+            ).fetchall()
+            self.connection.executemany(
+                "UPDATE chunk SET refcount = refcount - ? WHERE model = ? AND hash = ?",
+                [(count, model, hash) for model, hash, count in rows],
+            )
+            self.connection.execute(
+                "DELETE FROM collection_chunk WHERE collection_name = ?",
+                [collection_name],
+            )
+        return sum(count for _, _, count in rows)
+
+    def rename(self, collection_name: str, new_name: str):
+        """Move the references of a collection to its new name."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE collection_chunk SET collection_name = ? "
+                "WHERE collection_name = ?",
+                [new_name, collection_name],
+            )
+
+    def collect_garbage(self) -> int:
+        """Delete the chunks no collection holds, returning how many."""
+        with self.lock, self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM chunk WHERE refcount <= 0"
+            ).rowcount
+        if deleted > 0:
+            log.info(f"Deleted {deleted} unreferenced chunk embeddings")
+        return deleted
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM collection_chunk")
+            self.connection.execute("DELETE FROM chunk")
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            chunks, referenced = self.connection.execute(
+                "SELECT COUNT(*), COUNT(CASE WHEN refcount > 0 THEN 1 END) FROM chunk"
+            ).fetchone()
+            collections, references = self.connection.execute(
+                "SELECT COUNT(DISTINCT collection_name), COALESCE(SUM(count), 0) "
+                "FROM collection_chunk"
+            ).fetchone()
+        return {
+            "chunks": chunks,
+            "referenced_chunks": referenced,
+            "collections": collections,
+            "references": references,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
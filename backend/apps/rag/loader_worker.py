@@ -0,0 +1,62 @@
+"""
+Functions run in the document parser processes, see apps.rag.loaders.
+
+Workers are spawned, they import this module only: it must not import config
+or anything else that sets up the server. Documents are returned as
+(page_content, metadata) tuples.
+"""
+
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Queue on which jobs report (job id, process id) when they start running
+started_jobs = None
+
+
+def init_worker(max_memory=None, started_queue=None):
+    global started_jobs
+    started_jobs = started_queue
+
+    if max_memory is None:
+        return
+    try:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+    except (ImportError, ValueError, OSError) as e:
+        log.warning(f"Could not limit document parser memory: {e}")
+
+
+def run_job(job_id: int, fn, *args):
+    if started_jobs is not None:
+        started_jobs.put((job_id, os.getpid()))
+    return fn(*args)
+
+
+def load_documents(loader_name: str, args: tuple, kwargs: dict):
+    from langchain_community import document_loaders
+
+    loader = getattr(document_loaders, loader_name)(*args, **kwargs)
+    return [(doc.page_content, doc.metadata) for doc in loader.load()]
+
+
+def count_pdf_pages(file_path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+
+def load_pdf_pages(file_path: str, start: int, end: int):
+    """
+    Text of pages [start, end) of a PDF, as PyPDFLoader without image
+    extraction returns it.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [
+        (reader.pages[page].extract_text(), {"source": file_path, "page": page})
+        for page in range(start, min(end, len(reader.pages)))
+    ]
@@ -0,0 +1,235 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from apps.rag import loader_worker
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class DocumentParserTimeoutError(TimeoutError):
+    pass
+
+
+# Seconds between checks of the running time of a document's jobs
+POLL_INTERVAL = 0.2
+
+
+class DocumentParserPool:
+    """
+    Process pool parsing documents with langchain loaders, so that parsing
+    does not hold the GIL of the server process.
+
+    Processes are spawned on first use. A job that runs longer than `timeout`
+    seconds, counted from when a process picks it up rather than while it
+    waits for one, is abandoned and its process killed. That breaks the pool,
+    which is replaced; other documents being parsed at that moment are parsed
+    again on the new pool. `max_memory` bounds the address space of each
+    process. PDFs are parsed `pdf_pages_per_job` pages per process, in
+    parallel. With no `workers`, documents are parsed in the calling thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        timeout: int = 300,
+        max_memory: Optional[int] = None,
+        pdf_pages_per_job: int = 20,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.pdf_pages_per_job = pdf_pages_per_job
+
+        self.lock = threading.Lock()
+        self.executor = None
+        # Pools whose process was killed by a timeout
+        self.killed = weakref.WeakSet()
+
+        self.context = multiprocessing.get_context("spawn")
+        self.job_ids = itertools.count()
+        # Job id -> (process id, time.monotonic() it started at)
+        self.started = {}
+        self.started_queue = None
+        self.started_reader = None
+
+    def read_started_jobs(self, started_queue):
+        while True:
+            message = started_queue.get()
+            if message is None:
+                return
+            job_id, pid = message
+            with self.lock:
+                self.started[job_id] = (pid, time.monotonic())
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.started_queue is None:
+                self.started_queue = self.context.SimpleQueue()
+                self.started_reader = threading.Thread(
+                    target=self.read_started_jobs,
+                    args=(self.started_queue,),
+                    daemon=True,
+                )
+                self.started_reader.start()
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # Forking a server process with running threads is unsafe
+                    mp_context=self.context,
+                    initializer=loader_worker.init_worker,
+                    initargs=(self.max_memory, self.started_queue),
+                )
+            return self.executor
+
+    def restart(self, executor: ProcessPoolExecutor):
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        # Its jobs fail with BrokenProcessPool if one of its processes died,
+        # and are retried on the next pool
+        executor.shutdown(wait=False)
+
+    def kill(self, executor: ProcessPoolExecutor, pid: int):
+        # A running job cannot be cancelled, only its process killed. The pool
+        # notices the dead process and fails every job it was running.
+        self.killed.add(executor)
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError as e:
+            log.debug(f"Could not kill document parser process {pid}: {e}")
+        self.restart(executor)
+
+    def wait(self, executor: ProcessPoolExecutor, jobs: dict) -> list:
+        """
+        Wait for the futures of a document's jobs, by job id, killing the
+        process of any that runs longer than the timeout.
+        """
+        while True:
+            done, not_done = wait(
+                jobs.values(), timeout=POLL_INTERVAL, return_when=FIRST_EXCEPTION
+            )
+            if len(not_done) == 0 or any(
+                future.exception() is not None for future in done
+            ):
+                return [future.result() for future in jobs.values()]
+
+            now = time.monotonic()
+            for job_id, future in jobs.items():
+                with self.lock:
+                    pid, started_at = self.started.get(job_id, (None, now))
+                if not future.done() and now - started_at > self.timeout:
+                    self.kill(executor, pid)
+                    raise DocumentParserTimeoutError(
+                        f"Parsing the document took longer than {self.timeout}s"
+                    )
+
+    def run(self, jobs: list) -> list:
+        """
+        Run (function, *args) jobs of a single document, returning their
+        results in order. Each job has `timeout` seconds to run.
+        """
+        if self.workers <= 0:
+            return [fn(*args) for fn, *args in jobs]
+
+        crashes = 0
+        while True:
+            executor = self.get_executor()
+            futures = {}
+            try:
+                for fn, *args in jobs:
+                    job_id = next(self.job_ids)
+                    futures[job_id] = executor.submit(
+                        loader_worker.run_job, job_id, fn, *args
+                    )
+                return self.wait(executor, futures)
+            except BrokenProcessPool:
+                self.restart(executor)
+                # Jobs killed along with another document's are retried
+                # as often as that happens, a crash on this one only once
+                if executor not in self.killed:
+                    crashes += 1
+                    if crashes > 1:
+                        raise
+                log.warning("Document parser pool restarted, retrying")
+            finally:
+                with self.lock:
+                    for job_id in futures:
+                        self.started.pop(job_id, None)
+
+    def load(self, loader_name: str, args: tuple, kwargs: dict) -> List[Document]:
+        if (
+            loader_name == "PyPDFLoader"
+            and not kwargs.get("extract_images")
+            and self.workers > 0
+            and self.pdf_pages_per_job > 0
+        ):
+            results = self.load_pdf(args[0])
+        else:
+            results = self.run(
+                [(loader_worker.load_documents, loader_name, args, kwargs)]
+            )
+
+        return [
+            Document(page_content=page_content, metadata=metadata)
+            for documents in results
+            for page_content, metadata in documents
+        ]
+
+    def load_pdf(self, file_path: str) -> list:
+        [pages] = self.run([(loader_worker.count_pdf_pages, file_path)])
+        return self.run(
+            [
+                (
+                    loader_worker.load_pdf_pages,
+                    file_path,
+                    start,
+                    start + self.pdf_pages_per_job,
+                )
+                for start in range(0, pages, self.pdf_pages_per_job)
+            ]
+        )
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+            started_queue, self.started_queue = self.started_queue, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if started_queue is not None:
+            started_queue.put(None)
+
+
+class DocumentLoader:
+    """
+    A langchain document loader, by class name and arguments, parsed in a
+    DocumentParserPool.
+    """
+
+    def __init__(self, pool: DocumentParserPool, loader_name: str, *args, **kwargs):
+        self.pool = pool
+        self.loader_name = loader_name
+        self.args = args
+        self.kwargs = kwargs
+
+    def load(self) -> List[Document]:
+        start_time = time.perf_counter()
+        documents = self.pool.load(self.loader_name, self.args, self.kwargs)
+        log.info(
+            f"{self.loader_name} parsed {len(documents)} documents "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+        return documents
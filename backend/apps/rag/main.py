@@ -9,8 +9,10 @@ from fastapi import (
     Request,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 import requests
+import asyncio
 import os, shutil, logging, re
 from datetime import datetime
 
@@ -23,20 +25,8 @@ from langchain_core.documents import Document
 from langchain_community.document_loaders import (
     WebBaseLoader,
     TextLoader,
-    PyPDFLoader,
-    CSVLoader,
-    BSHTMLLoader,
-    Docx2txtLoader,
-    UnstructuredEPubLoader,
     UnstructuredWordDocumentLoader,
-    UnstructuredMarkdownLoader,
-    UnstructuredXMLLoader,
-    UnstructuredRSTLoader,
-    UnstructuredExcelLoader,
-    UnstructuredPowerPointLoader,
     YoutubeLoader,
-    OutlookMessageLoader,
-    JSONLoader,
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
@@ -51,6 +41,8 @@ import mimetypes
 import uuid
 import json
 
+import numpy as np
+
 from apps.webui.models.documents import (
     Documents,
     DocumentForm,
@@ -73,6 +65,10 @@ from apps.rag.utils import (
 from apps.rag.search.brave import search_brave
 from apps.rag.search.google_pse import search_google_pse
 from apps.rag.search.main import SearchResult
+from apps.rag.chunk_store import ChunkEmbeddingStore, get_chunk_hash
+from apps.rag.loaders import DocumentLoader, DocumentParserPool
+from apps.rag.migration import EmbeddingMigration
+from apps.rag.web import WebLoader, TTLCache, get_search_cache_key
 from apps.rag.search.searxng import search_searxng
 from apps.rag.search.serper import search_serper
 from apps.rag.search.serpstack import search_serpstack
@@ -84,6 +80,8 @@ from apps.rag.search.jina_search import search_jina
 from utils.misc import (
     calculate_sha256,
     calculate_sha256_string,
+    save_upload_file,
+    FileTooLargeError,
     sanitize_filename,
     extract_folders_after_data_docs,
 )
@@ -94,6 +92,7 @@ from config import (
     ENV,
     SRC_LOG_LEVELS,
     UPLOAD_DIR,
+    UPLOAD_MAX_FILE_SIZE,
     DOCS_DIR,
     CONTENT_EXTRACTION_ENGINE,
     TIKA_SERVER_URL,
@@ -132,7 +131,26 @@ from config import (
     TAVILY_API_KEY,
     RAG_WEB_SEARCH_RESULT_COUNT,
     RAG_WEB_SEARCH_CONCURRENT_REQUESTS,
+    RAG_WEB_LOADER_TIMEOUT,
+    RAG_WEB_LOADER_MAX_PAGE_SIZE,
+    RAG_WEB_LOADER_DNS_CACHE_TTL,
+    RAG_WEB_SEARCH_CACHE_TTL,
+    RAG_WEB_SEARCH_CACHE_MAX_ENTRIES,
+    RAG_WEB_PAGE_CACHE_TTL,
+    RAG_WEB_PAGE_CACHE_MAX_ENTRIES,
+    RAG_WEB_CHUNK_CACHE_MAX_SIZE,
     RAG_EMBEDDING_OPENAI_BATCH_SIZE,
+    DOCUMENT_PARSER_WORKERS,
+    DOCUMENT_PARSER_TIMEOUT,
+    DOCUMENT_PARSER_MAX_MEMORY,
+    DOCUMENT_PARSER_PDF_PAGES_PER_JOB,
+    ENABLE_RAG_CHUNK_EMBEDDING_STORE,
+    RAG_CHUNK_EMBEDDING_STORE_PATH,
+    RAG_REEMBEDDING_BATCH_SIZE,
+    RAG_REEMBEDDING_BATCH_DELAY,
+    WEB_CONCURRENCY,
+    WEBSOCKET_MANAGER,
+    CollectionFactory,
 )
 
 from constants import ERROR_MESSAGES
@@ -191,21 +209,106 @@ app.state.config.TAVILY_API_KEY = TAVILY_API_KEY
 app.state.config.RAG_WEB_SEARCH_RESULT_COUNT = RAG_WEB_SEARCH_RESULT_COUNT
 app.state.config.RAG_WEB_SEARCH_CONCURRENT_REQUESTS = RAG_WEB_SEARCH_CONCURRENT_REQUESTS
 
+app.state.WEB_LOADER = WebLoader(
+    timeout=RAG_WEB_LOADER_TIMEOUT,
+    max_page_size=RAG_WEB_LOADER_MAX_PAGE_SIZE,
+    dns_cache_ttl=RAG_WEB_LOADER_DNS_CACHE_TTL,
+    allow_local=ENABLE_RAG_LOCAL_WEB_FETCH,
+    page_cache_ttl=RAG_WEB_PAGE_CACHE_TTL,
+    page_cache_max_entries=RAG_WEB_PAGE_CACHE_MAX_ENTRIES,
+)
 
-def update_embedding_model(
+# Search engine results by get_search_cache_key
+app.state.WEB_SEARCH_CACHE = TTLCache(
+    max_items=RAG_WEB_SEARCH_CACHE_MAX_ENTRIES, ttl=RAG_WEB_SEARCH_CACHE_TTL
+)
+
+
+def get_web_chunks_size(chunks) -> int:
+    docs, embeddings = chunks
+    return embeddings.nbytes + sum(len(doc.page_content) for doc in docs)
+
+
+# Chunks and float32 embeddings of fetched pages, see store_web_data_in_vector_db
+app.state.WEB_CHUNK_CACHE = TTLCache(
+    max_items=RAG_WEB_PAGE_CACHE_MAX_ENTRIES,
+    ttl=RAG_WEB_PAGE_CACHE_TTL,
+    max_size=RAG_WEB_CHUNK_CACHE_MAX_SIZE,
+    get_size=get_web_chunks_size,
+)
+
+# Parses uploaded documents out of the server process, see get_loader
+app.state.DOCUMENT_PARSER = DocumentParserPool(
+    workers=DOCUMENT_PARSER_WORKERS,
+    timeout=DOCUMENT_PARSER_TIMEOUT,
+    max_memory=DOCUMENT_PARSER_MAX_MEMORY,
+    pdf_pages_per_job=DOCUMENT_PARSER_PDF_PAGES_PER_JOB,
+)
+
+# Chunk embeddings shared by all collections, see store_docs_in_vector_db
+app.state.CHUNK_STORE = (
+    ChunkEmbeddingStore(RAG_CHUNK_EMBEDDING_STORE_PATH)
+    if ENABLE_RAG_CHUNK_EMBEDDING_STORE
+    else None
+)
+
+# User memories are re-indexed from their table, and the Cisco guides and
+# articles are embedded by Chroma's default model, not RAG_EMBEDDING_MODEL
+NOT_REEMBEDDED_COLLECTIONS = {
+    name
+    for collections in [
+        CollectionFactory._article,
+        CollectionFactory._admin_guide,
+        CollectionFactory._cli_guide,
+    ]
+    for name in collections._collections.values()
+}
+
+
+def is_rag_collection(collection_name: str) -> bool:
+    return (
+        not collection_name.startswith("user-memory-")
+        and collection_name not in NOT_REEMBEDDED_COLLECTIONS
+    )
+
+
+# Re-embeds the collections when the embedding model changes
+app.state.EMBEDDING_MIGRATION = EmbeddingMigration(
+    CHROMA_CLIENT,
+    chunk_store=app.state.CHUNK_STORE,
+    batch_size=RAG_REEMBEDDING_BATCH_SIZE,
+    batch_delay=RAG_REEMBEDDING_BATCH_DELAY,
+    should_migrate=is_rag_collection,
+)
+
+# Writes on other server processes would neither be held during the swap
+# nor copied again, and they would keep embedding with the old model
+CAN_MIGRATE_EMBEDDINGS = WEB_CONCURRENCY <= 1 and WEBSOCKET_MANAGER != "redis"
+
+
+def load_embedding_model(
+    embedding_engine: str,
     embedding_model: str,
     update_model: bool = False,
 ):
-    if embedding_model and app.state.config.RAG_EMBEDDING_ENGINE == "":
+    if embedding_model and embedding_engine == "":
         import sentence_transformers
 
-        app.state.sentence_transformer_ef = sentence_transformers.SentenceTransformer(
+        return sentence_transformers.SentenceTransformer(
             get_model_path(embedding_model, update_model),
             device=DEVICE_TYPE,
             trust_remote_code=RAG_EMBEDDING_MODEL_TRUST_REMOTE_CODE,
         )
-    else:
-        app.state.sentence_transformer_ef = None
+    return None
+
+
+def update_embedding_model(
+    embedding_model: str,
+    update_model: bool = False,
+):
+    app.state.sentence_transformer_ef = load_embedding_model(
+        app.state.config.RAG_EMBEDDING_ENGINE, embedding_model, update_model
+    )
 
 
 def update_reranking_model(
@@ -297,6 +400,7 @@ async def get_embedding_config(user=Depends(get_admin_user)):
             "key": app.state.config.OPENAI_API_KEY,
             "batch_size": app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
         },
+        "migration": app.state.EMBEDDING_MIGRATION.job,
     }
 
 
@@ -327,31 +431,85 @@ async def update_embedding_config(
     log.info(
         f"Updating embedding model: {app.state.config.RAG_EMBEDDING_MODEL} to {form_data.embedding_model}"
     )
-    try:
-        app.state.config.RAG_EMBEDDING_ENGINE = form_data.embedding_engine
-        app.state.config.RAG_EMBEDDING_MODEL = form_data.embedding_model
+    if app.state.EMBEDDING_MIGRATION.is_running():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ERROR_MESSAGES.EMBEDDING_MIGRATION_RUNNING,
+        )
 
-        if app.state.config.RAG_EMBEDDING_ENGINE in ["ollama", "openai"]:
-            if form_data.openai_config is not None:
-                app.state.config.OPENAI_API_BASE_URL = form_data.openai_config.url
-                app.state.config.OPENAI_API_KEY = form_data.openai_config.key
-                app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE = (
-                    form_data.openai_config.batch_size
-                    if form_data.openai_config.batch_size
-                    else 1
-                )
+    # Existing collections hold vectors of the current model, which keeps
+    # serving them until they are re-embedded with the new one
+    model_changed = (form_data.embedding_engine, form_data.embedding_model) != (
+        app.state.config.RAG_EMBEDDING_ENGINE,
+        app.state.config.RAG_EMBEDDING_MODEL,
+    )
+    migrate = model_changed and bool(
+        await run_in_threadpool(app.state.EMBEDDING_MIGRATION.get_migrated_collections)
+    )
+    if migrate and not CAN_MIGRATE_EMBEDDINGS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ERROR_MESSAGES.EMBEDDING_MIGRATION_MULTIPLE_WORKERS,
+        )
 
-        update_embedding_model(app.state.config.RAG_EMBEDDING_MODEL)
+    try:
+        openai_config = {
+            "url": app.state.config.OPENAI_API_BASE_URL,
+            "key": app.state.config.OPENAI_API_KEY,
+            "batch_size": app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
+        }
+        if form_data.embedding_engine in ["ollama", "openai"]:
+            if form_data.openai_config is not None:
+                openai_config = {
+                    "url": form_data.openai_config.url,
+                    "key": form_data.openai_config.key,
+                    "batch_size": (
+                        form_data.openai_config.batch_size
+                        if form_data.openai_config.batch_size
+                        else 1
+                    ),
+                }
 
-        app.state.EMBEDDING_FUNCTION = get_embedding_function(
-            app.state.config.RAG_EMBEDDING_ENGINE,
-            app.state.config.RAG_EMBEDDING_MODEL,
-            app.state.sentence_transformer_ef,
-            app.state.config.OPENAI_API_KEY,
-            app.state.config.OPENAI_API_BASE_URL,
-            app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
+        sentence_transformer_ef = await run_in_threadpool(
+            load_embedding_model,
+            form_data.embedding_engine,
+            form_data.embedding_model,
+        )
+        embedding_function = get_embedding_function(
+            form_data.embedding_engine,
+            form_data.embedding_model,
+            sentence_transformer_ef,
+            openai_config["key"],
+            openai_config["url"],
+            openai_config["batch_size"],
         )
 
+        def apply_embedding_config():
+            app.state.config.RAG_EMBEDDING_ENGINE = form_data.embedding_engine
+            app.state.config.RAG_EMBEDDING_MODEL = form_data.embedding_model
+            app.state.config.OPENAI_API_BASE_URL = openai_config["url"]
+            app.state.config.OPENAI_API_KEY = openai_config["key"]
+            app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE = openai_config[
+                "batch_size"
+            ]
+            app.state.sentence_transformer_ef = sentence_transformer_ef
+            app.state.EMBEDDING_FUNCTION = embedding_function
+
+        if migrate:
+            app.state.EMBEDDING_MIGRATION.start(
+                embedding_function,
+                f"{form_data.embedding_engine}:{form_data.embedding_model}",
+                apply_embedding_config,
+                asyncio.get_running_loop(),
+            )
+        else:
+            apply_embedding_config()
+            if model_changed:
+                # Memories are re-indexed even with no collections to migrate
+                asyncio.get_running_loop().run_in_executor(
+                    None, app.state.EMBEDDING_MIGRATION.notify
+                )
+
         return {
             "status": True,
             "embedding_engine": app.state.config.RAG_EMBEDDING_ENGINE,
@@ -361,6 +519,7 @@ async def update_embedding_config(
                 "key": app.state.config.OPENAI_API_KEY,
                 "batch_size": app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
             },
+            "migration": app.state.EMBEDDING_MIGRATION.job,
         }
     except Exception as e:
         log.exception(f"Problem updating embedding model: {e}")
@@ -370,6 +529,16 @@ async def update_embedding_config(
         )
 
 
+@app.get("/embedding/migration")
+async def get_embedding_migration(user=Depends(get_admin_user)):
+    return {"status": True, "migration": app.state.EMBEDDING_MIGRATION.job}
+
+
+@app.post("/embedding/migration/cancel")
+async def cancel_embedding_migration(user=Depends(get_admin_user)):
+    return {"status": True, "migration": app.state.EMBEDDING_MIGRATION.cancel()}
+
+
 class RerankingModelUpdateForm(BaseModel):
     reranking_model: str
 
@@ -502,6 +671,9 @@ async def update_rag_config(form_data: ConfigUpdateForm, user=Depends(get_admin_
         app.state.YOUTUBE_LOADER_TRANSLATION = form_data.youtube.translation
 
     if form_data.web is not None:
+        # Results of the previous engine settings
+        app.state.WEB_SEARCH_CACHE.clear()
+
         app.state.config.ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION = (
             form_data.web.ssl_verification
         )
@@ -627,7 +799,7 @@ async def list_collections(user=Depends(get_verified_user)):
 @app.delete("/collection/{collection_name}")
 async def delete_collection(collection_name: str, user=Depends(get_verified_user)):
     try:
-        CHROMA_CLIENT.delete_collection(collection_name)
+        await run_in_threadpool(delete_collection_from_vector_db, collection_name)
         return {"status": "Ok", "collection_name": collection_name, "deleted": True}
     except Exception as e:
         log.exception(e)
@@ -830,20 +1002,22 @@ def store_youtube_video(form_data: UrlForm, user=Depends(get_verified_user)):
 
 
 @app.post("/web")
-def store_web(form_data: UrlForm, user=Depends(get_verified_user)):
+async def store_web(form_data: UrlForm, user=Depends(get_verified_user)):
     # "https://www.gutenberg.org/files/1727/1727-h/1727-h.htm"
     try:
-        loader = get_web_loader(
-            form_data.url,
+        # Check if the URL is valid
+        if not await app.state.WEB_LOADER.validate_url(form_data.url):
+            raise ValueError(ERROR_MESSAGES.INVALID_URL)
+        data = await app.state.WEB_LOADER.load(
+            [form_data.url],
             verify_ssl=app.state.config.ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION,
         )
-        data = loader.load()
 
         collection_name = form_data.collection_name
         if collection_name == "":
             collection_name = calculate_sha256_string(form_data.url)[:63]
 
-        store_data_in_vector_db(data, collection_name, overwrite=True)
+        await run_in_threadpool(store_web_data_in_vector_db, data, collection_name)
         return {
             "status": True,
             "collection_name": collection_name,
@@ -857,53 +1031,6 @@ def store_web(form_data: UrlForm, user=Depends(get_verified_user)):
         )
 
 
-def get_web_loader(url: Union[str, Sequence[str]], verify_ssl: bool = True):
-    # Check if the URL is valid
-    if not validate_url(url):
-        raise ValueError(ERROR_MESSAGES.INVALID_URL)
-    return SafeWebBaseLoader(
-        url,
-        verify_ssl=verify_ssl,
-        requests_per_second=RAG_WEB_SEARCH_CONCURRENT_REQUESTS,
-        continue_on_failure=True,
-    )
-
-
-def validate_url(url: Union[str, Sequence[str]]):
-    if isinstance(url, str):
-        if isinstance(validators.url(url), validators.ValidationError):
-            raise ValueError(ERROR_MESSAGES.INVALID_URL)
-        if not ENABLE_RAG_LOCAL_WEB_FETCH:
-            # Local web fetch is disabled, filter out any URLs that resolve to private IP addresses
-            parsed_url = urllib.parse.urlparse(url)
-            # Get IPv4 and IPv6 addresses
-            ipv4_addresses, ipv6_addresses = resolve_hostname(parsed_url.hostname)
-            # Check if any of the resolved addresses are private
-            # This is technically still vulnerable to DNS rebinding attacks, as we don't control WebBaseLoader
-            for ip in ipv4_addresses:
-                if validators.ipv4(ip, private=True):
-                    raise ValueError(ERROR_MESSAGES.INVALID_URL)
-            for ip in ipv6_addresses:
-                if validators.ipv6(ip, private=True):
-                    raise ValueError(ERROR_MESSAGES.INVALID_URL)
-        return True
-    elif isinstance(url, Sequence):
-        return all(validate_url(u) for u in url)
-    else:
-        return False
-
-
-def resolve_hostname(hostname):
-    # Get address information
-    addr_info = socket.getaddrinfo(hostname, None)
-
-    # Extract IP addresses from address information
-    ipv4_addresses = [info[4][0] for info in addr_info if info[0] == socket.AF_INET]
-    ipv6_addresses = [info[4][0] for info in addr_info if info[0] == socket.AF_INET6]
-
-    return ipv4_addresses, ipv6_addresses
-
-
 def search_web(engine: str, query: str) -> list[SearchResult]:
     """Search the web using a search engine and return the results as a list of SearchResult objects.
     Will look for a search engine API key in environment variables in the following order:
@@ -1008,14 +1135,23 @@ def search_web(engine: str, query: str) -> list[SearchResult]:
 
 
 @app.post("/web/search")
-def store_web_search(form_data: SearchForm, user=Depends(get_verified_user)):
+async def store_web_search(form_data: SearchForm, user=Depends(get_verified_user)):
     try:
         logging.info(
             f"trying to web search with {app.state.config.RAG_WEB_SEARCH_ENGINE, form_data.query}"
         )
-        web_results = search_web(
-            app.state.config.RAG_WEB_SEARCH_ENGINE, form_data.query
+        search_key = get_search_cache_key(
+            app.state.config.RAG_WEB_SEARCH_ENGINE,
+            form_data.query,
+            app.state.config.RAG_WEB_SEARCH_RESULT_COUNT,
+            app.state.config.RAG_WEB_SEARCH_DOMAIN_FILTER_LIST,
         )
+        web_results = app.state.WEB_SEARCH_CACHE.get(search_key)
+        if web_results is None:
+            web_results = await run_in_threadpool(
+                search_web, app.state.config.RAG_WEB_SEARCH_ENGINE, form_data.query
+            )
+            app.state.WEB_SEARCH_CACHE.set(search_key, web_results)
     except Exception as e:
         log.exception(e)
 
@@ -1027,14 +1163,18 @@ def store_web_search(form_data: SearchForm, user=Depends(get_verified_user)):
 
     try:
         urls = [result.link for result in web_results]
-        loader = get_web_loader(urls)
-        data = loader.load()
+        # Results are fetched concurrently, pages that fail are left out
+        data = await app.state.WEB_LOADER.load(
+            urls,
+            verify_ssl=app.state.config.ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION,
+            concurrency=app.state.config.RAG_WEB_SEARCH_CONCURRENT_REQUESTS,
+        )
 
         collection_name = form_data.collection_name
         if collection_name == "":
             collection_name = calculate_sha256_string(form_data.query)[:63]
 
-        store_data_in_vector_db(data, collection_name, overwrite=True)
+        await run_in_threadpool(store_web_data_in_vector_db, data, collection_name)
         return {
             "status": True,
             "collection_name": collection_name,
@@ -1070,6 +1210,90 @@ def store_data_in_vector_db(
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
 
+def store_web_data_in_vector_db(data: List[Document], collection_name: str) -> bool:
+    """
+    Store fetched web pages in a collection, reusing the chunks and embeddings
+    of pages already embedded by earlier web searches. A collection that
+    already holds the same pages, embedded the same way, is kept as is.
+    """
+    # The embedding model cannot change while the pages are embedded
+    with app.state.EMBEDDING_MIGRATION.writing(collection_name):
+        embedding_key = (
+            app.state.config.RAG_EMBEDDING_ENGINE,
+            app.state.config.RAG_EMBEDDING_MODEL,
+            app.state.config.CHUNK_SIZE,
+            app.state.config.CHUNK_OVERLAP,
+        )
+        page_keys = [
+            (
+                *embedding_key,
+                document.metadata.get("source"),
+                calculate_sha256_string(document.page_content),
+            )
+            for document in data
+        ]
+        fingerprint = calculate_sha256_string(json.dumps(page_keys))
+
+        try:
+            collection = CHROMA_CLIENT.get_collection(name=collection_name)
+            if (collection.metadata or {}).get("web_fingerprint") == fingerprint:
+                log.info(f"reusing collection {collection_name}")
+                return True
+        except Exception:
+            # The collection does not exist yet
+            pass
+
+        chunks = {key: app.state.WEB_CHUNK_CACHE.get(key) for key in page_keys}
+        missing = {
+            key: document
+            for key, document in zip(page_keys, data)
+            if chunks[key] is None
+        }
+        if len(missing) > 0:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=app.state.config.CHUNK_SIZE,
+                chunk_overlap=app.state.config.CHUNK_OVERLAP,
+                add_start_index=True,
+            )
+            pages = {
+                key: text_splitter.split_documents([document])
+                for key, document in missing.items()
+            }
+            texts = [
+                doc.page_content.replace("\n", " ")
+                for docs in pages.values()
+                for doc in docs
+            ]
+            embeddings = np.asarray(
+                app.state.EMBEDDING_FUNCTION(texts) if len(texts) > 0 else [],
+                dtype=np.float32,
+            )
+
+            offset = 0
+            for key, docs in pages.items():
+                chunks[key] = (docs, embeddings[offset : offset + len(docs)])
+                offset += len(docs)
+                app.state.WEB_CHUNK_CACHE.set(key, chunks[key])
+
+        docs = [doc for key in page_keys for doc in chunks[key][0]]
+        embeddings = [
+            embedding for key in page_keys for embedding in chunks[key][1].tolist()
+        ]
+        if len(docs) == 0:
+            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+
+        log.info(
+            f"store_web_data_in_vector_db {len(missing)}/{len(data)} pages embedded"
+        )
+        return store_docs_in_vector_db(
+            docs,
+            collection_name,
+            overwrite=True,
+            embeddings=embeddings,
+            collection_metadata={"web_fingerprint": fingerprint},
+        )
+
+
 def store_text_in_vector_db(
     text, metadata, collection_name, overwrite: bool = False
 ) -> bool:
@@ -1082,8 +1306,27 @@ def store_text_in_vector_db(
     return store_docs_in_vector_db(docs, collection_name, overwrite=overwrite)
 
 
+def get_embedding_model_key() -> str:
+    # Embeddings of different engines or models are not interchangeable
+    engine = app.state.config.RAG_EMBEDDING_ENGINE
+    return f"{engine}:{app.state.config.RAG_EMBEDDING_MODEL}"
+
+
+def delete_collection_from_vector_db(collection_name: str):
+    with app.state.EMBEDDING_MIGRATION.writing(collection_name):
+        CHROMA_CLIENT.delete_collection(collection_name)
+    if app.state.CHUNK_STORE is not None:
+        app.state.CHUNK_STORE.release(collection_name)
+        app.state.CHUNK_STORE.collect_garbage()
+
+
 def store_docs_in_vector_db(
-    docs, collection_name, metadata: Optional[dict] = None, overwrite: bool = False
+    docs,
+    collection_name,
+    metadata: Optional[dict] = None,
+    overwrite: bool = False,
+    embeddings: Optional[list] = None,
+    collection_metadata: Optional[dict] = None,
 ) -> bool:
     log.info(f"store_docs_in_vector_db {docs} {collection_name}")
 
@@ -1097,44 +1340,83 @@ def store_docs_in_vector_db(
             if isinstance(value, datetime):
                 metadata[key] = str(value)
 
-    try:
-        if overwrite:
-            for collection in CHROMA_CLIENT.list_collections():
-                if collection_name == collection.name:
-                    log.info(f"deleting existing collection {collection_name}")
-                    CHROMA_CLIENT.delete_collection(name=collection_name)
+    # Collections written while the embedding model changes are re-embedded
+    with app.state.EMBEDDING_MIGRATION.writing(collection_name):
+        chunk_store = app.state.CHUNK_STORE
+        model = get_embedding_model_key()
 
-        collection = CHROMA_CLIENT.create_collection(name=collection_name)
+        try:
+            if overwrite:
+                for collection in CHROMA_CLIENT.list_collections():
+                    if collection_name == collection.name:
+                        log.info(f"deleting existing collection {collection_name}")
+                        CHROMA_CLIENT.delete_collection(name=collection_name)
+                        if chunk_store is not None:
+                            # Unreferenced chunks are only collected once the new
+                            # collection holds its own, which it may share
+                            chunk_store.release(collection_name)
+
+            collection = CHROMA_CLIENT.create_collection(
+                name=collection_name, metadata=collection_metadata
+            )
 
-        embedding_func = get_embedding_function(
-            app.state.config.RAG_EMBEDDING_ENGINE,
-            app.state.config.RAG_EMBEDDING_MODEL,
-            app.state.sentence_transformer_ef,
-            app.state.config.OPENAI_API_KEY,
-            app.state.config.OPENAI_API_BASE_URL,
-            app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
-        )
+            embedding_texts = list(map(lambda x: x.replace("\n", " "), texts))
+            hashes = [get_chunk_hash(text) for text in embedding_texts]
+
+            # Unless the caller already embedded the texts
+            if embeddings is None:
+                embedding_func = get_embedding_function(
+                    app.state.config.RAG_EMBEDDING_ENGINE,
+                    app.state.config.RAG_EMBEDDING_MODEL,
+                    app.state.sentence_transformer_ef,
+                    app.state.config.OPENAI_API_KEY,
+                    app.state.config.OPENAI_API_BASE_URL,
+                    app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
+                )
+
+                # Chunks embedded for any collection before, or repeated in this
+                # one, are embedded once
+                stored = (
+                    chunk_store.get_many(model, hashes)
+                    if chunk_store is not None
+                    else {}
+                )
+                missing = {
+                    hash: text
+                    for hash, text in zip(hashes, embedding_texts)
+                    if hash not in stored
+                }
+                if len(missing) > 0:
+                    stored.update(
+                        zip(missing.keys(), embedding_func(list(missing.values())))
+                    )
+                embeddings = [stored[hash] for hash in hashes]
+                log.info(
+                    f"store_docs_in_vector_db embedded {len(missing)}/{len(hashes)} chunks"
+                )
 
-        embedding_texts = list(map(lambda x: x.replace("\n", " "), texts))
-        embeddings = embedding_func(embedding_texts)
+            for batch in create_batches(
+                api=CHROMA_CLIENT,
+                ids=[str(uuid.uuid4()) for _ in texts],
+                metadatas=metadatas,
+                embeddings=embeddings,
+                documents=texts,
+            ):
+                collection.add(*batch)
 
-        for batch in create_batches(
-            api=CHROMA_CLIENT,
-            ids=[str(uuid.uuid4()) for _ in texts],
-            metadatas=metadatas,
-            embeddings=embeddings,
-            documents=texts,
-        ):
-            collection.add(*batch)
+            if chunk_store is not None:
+                chunk_store.add(collection_name, model, hashes, embeddings)
+                if overwrite:
+                    chunk_store.collect_garbage()
 
-        return True
-    except Exception as e:
-        if e.__class__.__name__ == "UniqueConstraintError":
             return True
+        except Exception as e:
+            if e.__class__.__name__ == "UniqueConstraintError":
+                return True
 
-        log.exception(e)
+            log.exception(e)
 
-        return False
+            return False
 
 
 class TikaLoader:
@@ -1235,54 +1517,91 @@ def get_loader(filename: str, file_content_type: str, file_path: str):
             loader = TikaLoader(file_path, file_content_type)
     else:
         if file_ext == "pdf":
-            loader = PyPDFLoader(
-                file_path, extract_images=app.state.config.PDF_EXTRACT_IMAGES
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER,
+                "PyPDFLoader",
+                file_path,
+                extract_images=app.state.config.PDF_EXTRACT_IMAGES,
             )
         elif file_ext == "csv":
-            loader = CSVLoader(file_path)
+            loader = DocumentLoader(app.state.DOCUMENT_PARSER, "CSVLoader", file_path)
         elif file_ext == "rst":
-            loader = UnstructuredRSTLoader(file_path, mode="elements")
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER,
+                "UnstructuredRSTLoader",
+                file_path,
+                mode="elements",
+            )
         elif file_ext == "xml":
-            loader = UnstructuredXMLLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "UnstructuredXMLLoader", file_path
+            )
         elif file_ext in ["htm", "html"]:
-            loader = BSHTMLLoader(file_path, open_encoding="unicode_escape")
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER,
+                "BSHTMLLoader",
+                file_path,
+                open_encoding="unicode_escape",
+            )
         elif file_ext == "md":
-            loader = UnstructuredMarkdownLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "UnstructuredMarkdownLoader", file_path
+            )
         elif file_content_type == "application/epub+zip":
-            loader = UnstructuredEPubLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "UnstructuredEPubLoader", file_path
+            )
         elif (
             file_content_type
             == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             or file_ext in ["doc", "docx"]
         ):
-            loader = Docx2txtLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "Docx2txtLoader", file_path
+            )
         elif file_content_type in [
             "application/vnd.ms-excel",
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         ] or file_ext in ["xls", "xlsx"]:
-            loader = UnstructuredExcelLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "UnstructuredExcelLoader", file_path
+            )
         elif file_content_type in [
             "application/vnd.ms-powerpoint",
             "application/vnd.openxmlformats-officedocument.presentationml.presentation",
         ] or file_ext in ["ppt", "pptx"]:
-            loader = UnstructuredPowerPointLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "UnstructuredPowerPointLoader", file_path
+            )
         elif file_ext == "msg":
-            loader = OutlookMessageLoader(file_path)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER, "OutlookMessageLoader", file_path
+            )
         elif file_ext in known_source_ext or (
             file_content_type and file_content_type.find("text/") >= 0
         ):
-            loader = TextLoader(file_path, autodetect_encoding=True)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER,
+                "TextLoader",
+                file_path,
+                autodetect_encoding=True,
+            )
         elif file_ext == "json" or file_content_type == "application/json":
-            loader = JSONLoader(file_path)
+            loader = DocumentLoader(app.state.DOCUMENT_PARSER, "JSONLoader", file_path)
         else:
-            loader = TextLoader(file_path, autodetect_encoding=True)
+            loader = DocumentLoader(
+                app.state.DOCUMENT_PARSER,
+                "TextLoader",
+                file_path,
+                autodetect_encoding=True,
+            )
             known_type = False
 
     return loader, known_type
 
 
 @app.post("/doc")
-def store_doc(
+async def store_doc(
     collection_name: Optional[str] = Form(None),
     file: UploadFile = File(...),
     user=Depends(get_verified_user),
@@ -1296,21 +1615,17 @@ def store_doc(
 
         file_path = f"{UPLOAD_DIR}/{filename}"
 
-        contents = file.file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
-            f.close()
-
-        f = open(file_path, "rb")
+        size, sha256 = await save_upload_file(file, file_path, UPLOAD_MAX_FILE_SIZE)
         if collection_name == None:
-            collection_name = calculate_sha256(f)[:63]
-        f.close()
+            collection_name = sha256[:63]
 
         loader, known_type = get_loader(filename, file.content_type, file_path)
-        data = loader.load()
+        data = await run_in_threadpool(loader.load)
 
         try:
-            result = store_data_in_vector_db(data, collection_name)
+            result = await run_in_threadpool(
+                store_data_in_vector_db, data, collection_name
+            )
 
             if result:
                 return {
@@ -1324,6 +1639,11 @@ def store_doc(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=e,
             )
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=ERROR_MESSAGES.FILE_TOO_LARGE(e.max_size),
+        )
     except Exception as e:
         log.exception(e)
         if "No pandoc was found" in str(e):
@@ -1492,9 +1812,21 @@ def scan_docs_dir(user=Depends(get_admin_user)):
     return True
 
 
+@app.get("/chunks/stats")
+async def get_chunk_store_stats(user=Depends(get_admin_user)):
+    if app.state.CHUNK_STORE is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        **(await run_in_threadpool(app.state.CHUNK_STORE.get_stats)),
+    }
+
+
 @app.get("/reset/db")
 def reset_vector_db(user=Depends(get_admin_user)):
     reset = CHROMA_CLIENT.reset()
+    if reset and app.state.CHUNK_STORE is not None:
+        app.state.CHUNK_STORE.clear()
     message = "Database successfully reset"
     if not reset:
         message = "Error resetting database"
@@ -1540,39 +1872,14 @@ def reset(user=Depends(get_admin_user)) -> bool:
 
     try:
         CHROMA_CLIENT.reset()
+        if app.state.CHUNK_STORE is not None:
+            app.state.CHUNK_STORE.clear()
     except Exception as e:
         log.exception(e)
 
     return True
 
 
-class SafeWebBaseLoader(WebBaseLoader):
-    """WebBaseLoader with enhanced error handling for URLs."""
-
-    def lazy_load(self) -> Iterator[Document]:
-        """Lazy load text from the url(s) in web_path with error handling."""
-        for path in self.web_paths:
-            try:
-                soup = self._scrape(path, bs_kwargs=self.bs_kwargs)
-                text = soup.get_text(**self.bs_get_text_kwargs)
-
-                # Build metadata
-                metadata = {"source": path}
-                if title := soup.find("title"):
-                    metadata["title"] = title.get_text()
-                if description := soup.find("meta", attrs={"name": "description"}):
-                    metadata["description"] = description.get(
-                        "content", "No description found."
-                    )
-                if html := soup.find("html"):
-                    metadata["language"] = html.get("lang", "No language found.")
-
-                yield Document(page_content=text, metadata=metadata)
-            except Exception as e:
-                # Log the error and continue with the next URL
-                log.error(f"Error loading {path}: {e}")
-
-
 if ENV == "dev":
 
     @app.get("/ef")
@@ -0,0 +1,342 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from apps.rag.chunk_store import ChunkEmbeddingStore, get_chunk_hash
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+SHADOW_PREFIX = "reembed-"
+RETIRED_PREFIX = "retired-"
+
+
+class EmbeddingMigrationCancelled(Exception):
+    pass
+
+
+class EmbeddingMigration:
+    """
+    Re-embeds the vector collections with a new embedding model in the
+    background, so that the model can be changed without serving queries
+    embedded by one model against vectors of another.
+
+    Every collection is copied into a shadow collection embedded by the new
+    model, `batch_size` chunks at a time with `batch_delay` seconds between
+    batches, while the current model keeps serving queries and ingestion.
+    Collections written to meanwhile, which writers signal by wrapping their
+    writes in `writing`, are copied again. Once every collection has its
+    shadow, writes are held, the shadows are renamed over the collections
+    and `on_complete` switches the model, then `listeners` are called.
+    A model changed without migrating any collection calls `notify`.
+
+    Progress is kept in `job`. `should_migrate` selects the collections
+    embedded by the configured model.
+    """
+
+    def __init__(
+        self,
+        client,
+        chunk_store: Optional[ChunkEmbeddingStore] = None,
+        batch_size: int = 64,
+        batch_delay: float = 0.1,
+        should_migrate: Callable[[str], bool] = lambda name: True,
+    ):
+        self.client = client
+        self.chunk_store = chunk_store
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.should_migrate = should_migrate
+        self.listeners = []
+
+        self.job = None
+        self.cancelled = threading.Event()
+
+        # Collections written to since they were copied
+        self.dirty = set()
+        # Writes in progress, held while the shadows are swapped in
+        self.condition = threading.Condition()
+        self.writers = 0
+        self.swapping = False
+        self.local = threading.local()
+
+    def is_running(self) -> bool:
+        return self.job is not None and self.job["status"] == "running"
+
+    @contextmanager
+    def writing(self, collection_name: str):
+        # Reentrant, a write may call another
+        depth = getattr(self.local, "depth", 0)
+        if depth == 0:
+            with self.condition:
+                self.condition.wait_for(lambda: not self.swapping)
+                self.writers += 1
+        self.local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.local.depth = depth
+            with self.condition:
+                if self.is_running():
+                    self.dirty.add(collection_name)
+                if depth == 0:
+                    self.writers -= 1
+                    self.condition.notify_all()
+
+    def get_migrated_collections(self) -> dict:
+        return {
+            collection.name: collection
+            for collection in self.client.list_collections()
+            if not collection.name.startswith((SHADOW_PREFIX, RETIRED_PREFIX))
+            and self.should_migrate(collection.name)
+        }
+
+    def delete_collection(self, name: str):
+        try:
+            self.client.delete_collection(name)
+        except Exception as e:
+            log.debug(f"Could not delete collection {name}: {e}")
+        if self.chunk_store is not None:
+            self.chunk_store.release(name)
+
+    def cleanup(self):
+        """Delete the shadows of an interrupted migration."""
+        for collection in self.client.list_collections():
+            if collection.name.startswith(SHADOW_PREFIX):
+                log.info(f"Deleting leftover collection {collection.name}")
+                self.delete_collection(collection.name)
+            elif collection.name.startswith(RETIRED_PREFIX):
+                # The server stopped while swapping it, it may be the only
+                # copy of a collection
+                log.warning(f"Keeping collection {collection.name} of a migration")
+        if self.chunk_store is not None:
+            self.chunk_store.collect_garbage()
+
+    def embed(self, embedding_function, model: str, texts: list, hashes: list):
+        stored = (
+            self.chunk_store.get_many(model, hashes)
+            if self.chunk_store is not None
+            else {}
+        )
+        missing = {
+            hash: text for hash, text in zip(hashes, texts) if hash not in stored
+        }
+        if len(missing) > 0:
+            stored.update(
+                zip(missing.keys(), embedding_function(list(missing.values())))
+            )
+        return [stored[hash] for hash in hashes]
+
+    def copy(self, collection, embedding_function, model: str) -> str:
+        """Copy a collection into a new shadow collection, returning its name."""
+        shadow_name = f"{SHADOW_PREFIX}{uuid.uuid4().hex}"
+        shadow = self.client.create_collection(
+            name=shadow_name, metadata=collection.metadata or None
+        )
+
+        try:
+            offset = 0
+            while True:
+                if self.cancelled.is_set():
+                    raise EmbeddingMigrationCancelled()
+
+                rows = collection.get(
+                    include=["documents", "metadatas"],
+                    limit=self.batch_size,
+                    offset=offset,
+                )
+                if len(rows["ids"]) == 0:
+                    break
+                offset += len(rows["ids"])
+
+                # Vectors stored without their text cannot be re-embedded
+                rows = [
+                    row
+                    for row in zip(rows["ids"], rows["documents"], rows["metadatas"])
+                    if row[1] is not None
+                ]
+                if len(rows) > 0:
+                    ids, documents, metadatas = map(list, zip(*rows))
+                    texts = [document.replace("\n", " ") for document in documents]
+                    hashes = [get_chunk_hash(text) for text in texts]
+                    embeddings = self.embed(embedding_function, model, texts, hashes)
+                    shadow.add(
+                        ids=ids,
+                        documents=documents,
+                        metadatas=metadatas,
+                        embeddings=embeddings,
+                    )
+                    if self.chunk_store is not None:
+                        self.chunk_store.add(shadow_name, model, hashes, embeddings)
+                    self.job["chunks"] += len(ids)
+
+                time.sleep(self.batch_delay)
+        except Exception:
+            self.delete_collection(shadow_name)
+            raise
+
+        return shadow_name
+
+    def rename(self, name: str, new_name: str):
+        self.client.get_collection(name).modify(name=new_name)
+
+    def swap(self, shadows: dict, on_complete: Callable):
+        """
+        Rename the shadows over their collections and switch the model,
+        restoring the collections if any of it fails.
+        """
+        # (name, shadow name, retired name)
+        swapped = []
+        try:
+            for name, shadow_name in shadows.items():
+                retired_name = f"{RETIRED_PREFIX}{uuid.uuid4().hex}"
+                self.rename(name, retired_name)
+                try:
+                    self.rename(shadow_name, name)
+                except Exception:
+                    self.rename(retired_name, name)
+                    raise
+                swapped.append((name, shadow_name, retired_name))
+            on_complete()
+        except Exception:
+            for name, shadow_name, retired_name in reversed(swapped):
+                self.rename(name, shadow_name)
+                self.rename(retired_name, name)
+            raise
+
+        for name, shadow_name, retired_name in swapped:
+            self.client.delete_collection(retired_name)
+            if self.chunk_store is not None:
+                self.chunk_store.release(name)
+                self.chunk_store.rename(shadow_name, name)
+
+    def run(self, embedding_function, model: str, on_complete: Callable):
+        job = self.job
+        # Collection name -> its shadow
+        shadows = {}
+        try:
+            start_time = time.perf_counter()
+            self.cleanup()
+
+            while True:
+                collections = self.get_migrated_collections()
+                with self.condition:
+                    dirty, self.dirty = self.dirty, set()
+
+                for name in list(shadows):
+                    if name in dirty or name not in collections:
+                        self.delete_collection(shadows.pop(name))
+
+                job["total"] = len(collections)
+                job["migrated"] = len(shadows)
+                pending = [
+                    collection
+                    for name, collection in collections.items()
+                    if name not in shadows
+                ]
+                if len(pending) == 0:
+                    with self.condition:
+                        self.swapping = True
+                        self.condition.wait_for(lambda: self.writers == 0)
+                        if len(self.dirty) == 0:
+                            break
+                        # Written to while writes were draining, copy again
+                        self.swapping = False
+                        self.condition.notify_all()
+                    continue
+
+                for collection in pending:
+                    job["collection"] = collection.name
+                    try:
+                        shadows[collection.name] = self.copy(
+                            collection, embedding_function, model
+                        )
+                    except EmbeddingMigrationCancelled:
+                        raise
+                    except Exception:
+                        if collection.name in self.get_migrated_collections():
+                            raise
+                        log.info(f"Collection {collection.name} deleted meanwhile")
+                        continue
+                    job["migrated"] += 1
+
+            try:
+                job["collection"] = None
+                self.swap(shadows, on_complete)
+            finally:
+                with self.condition:
+                    self.swapping = False
+                    self.condition.notify_all()
+
+            if self.chunk_store is not None:
+                self.chunk_store.collect_garbage()
+
+            job["status"] = "done"
+            log.info(
+                f"Re-embedded {len(shadows)} collections ({job['chunks']} chunks) "
+                f"with {model} in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+            )
+        except EmbeddingMigrationCancelled:
+            job["status"] = "cancelled"
+        except Exception as e:
+            log.exception(f"Error re-embedding collections with {model}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            if job["status"] != "done":
+                for shadow_name in shadows.values():
+                    self.delete_collection(shadow_name)
+                if self.chunk_store is not None:
+                    self.chunk_store.collect_garbage()
+            job["collection"] = None
+            job["finished_at"] = int(time.time())
+
+        if job["status"] == "done":
+            self.notify()
+
+    def notify(self):
+        """Call the listeners once the embedding model changed."""
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                log.exception(e)
+
+    def start(
+        self, embedding_function, model: str, on_complete: Callable, loop
+    ) -> dict:
+        """
+        Schedule the migration of every collection to `model`, embedded by
+        `embedding_function`, on a worker thread of `loop` and return its job
+        status. `on_complete` switches the configured model, it is called
+        while writes are held.
+        """
+        if self.is_running():
+            raise RuntimeError("An embedding migration is already running")
+
+        self.cancelled.clear()
+        with self.condition:
+            self.dirty = set()
+        self.job = {
+            "status": "running",
+            "model": model,
+            "total": None,
+            "migrated": 0,
+            "collection": None,
+            "chunks": 0,
+            "error": None,
+            "started_at": int(time.time()),
+            "finished_at": None,
+        }
+        loop.run_in_executor(None, self.run, embedding_function, model, on_complete)
+        return self.job
+
+    def cancel(self) -> Optional[dict]:
+        if self.is_running():
+            self.cancelled.set()
+        return self.job
@@ -0,0 +1,391 @@
+import asyncio
+import codecs
+import ipaddress
+import logging
+import socket
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Callable, List, Optional, Sequence
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+import validators
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import ThreadedResolver
+from langchain_core.documents import Document
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+CHUNK_SIZE = 64 * 1024
+
+HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml", "application/xml"]
+
+REDIRECT_STATUSES = [301, 302, 303, 307, 308]
+MAX_REDIRECTS = 10
+
+
+class TTLCache:
+    """
+    Thread-safe LRU mapping holding at most `max_items` entries, each for
+    `ttl` seconds after it was set. A `ttl` of 0 disables the cache.
+
+    With a `max_size`, entries are also evicted once the sum of their sizes,
+    as returned by `get_size`, exceeds it.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 1000,
+        ttl: int = 3600,
+        max_size: Optional[int] = None,
+        get_size: Optional[Callable] = None,
+    ):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_size = max_size
+        self.get_size = get_size
+        self.lock = threading.Lock()
+        # key -> (expires_at, value, size)
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def pop(self, key):
+        # Caller holds the lock
+        self.size -= self.entries.pop(key)[2]
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                self.pop(key)
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_items <= 0:
+            return
+        size = self.get_size(value) if self.get_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.pop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, size)
+            self.size += size
+            while len(self.entries) > self.max_items or (
+                self.max_size is not None and self.size > self.max_size
+            ):
+                self.pop(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def get_search_cache_key(
+    engine: str, query: str, count: int, domain_filter: Optional[List[str]]
+) -> tuple:
+    """
+    Key of a search engine response: queries differing only in case, Unicode
+    form or whitespace, and filters differing only in order, share it.
+    """
+    query = " ".join(unicodedata.normalize("NFKC", query).lower().split())
+    return (engine, query, count, tuple(sorted(domain_filter or [])))
+
+
+class CachedPage:
+    def __init__(
+        self,
+        document: Document,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.document = document
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Incremental HTML to text conversion: fed the page as it is downloaded, it
+    keeps the text content and the title, description and language metadata.
+    Script, style and template contents are not text.
+    """
+
+    SKIP_TAGS = {"script", "style", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.skip = 0
+        self.title = None
+        self.in_title = False
+        self.description = None
+        self.language = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip += 1
+        elif tag == "title" and self.title is None:
+            self.title = []
+            self.in_title = True
+        elif tag == "meta" and self.description is None:
+            attrs = dict(attrs)
+            if attrs.get("name") == "description":
+                self.description = attrs.get("content", "No description found.")
+        elif tag == "html" and self.language is None:
+            self.language = dict(attrs).get("lang", "No language found.")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag == "title":
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        if self.in_title:
+            self.title.append(data)
+        self.text.append(data)
+
+    def get_document(self, source: str) -> Document:
+        metadata = {"source": source}
+        if self.title is not None:
+            metadata["title"] = "".join(self.title)
+        if self.description is not None:
+            metadata["description"] = self.description
+        if self.language is not None:
+            metadata["language"] = self.language
+        return Document(page_content="".join(self.text), metadata=metadata)
+
+
+class CachingResolver(AbstractResolver):
+    """
+    Resolver reusing the addresses of up to `max_hosts` hosts for `ttl`
+    seconds, shared by the private address check and the connections of the
+    web loader.
+    """
+
+    def __init__(self, ttl: int = 300, max_hosts: int = 1000):
+        self.resolver = ThreadedResolver()
+        # (host, family) -> hosts
+        self.cache = TTLCache(max_items=max_hosts, ttl=ttl)
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        key = (host, family)
+        hosts = self.cache.get(key)
+        if hosts is None:
+            hosts = await self.resolver.resolve(host, 0, family)
+            self.cache.set(key, hosts)
+        return [{**host, "port": port} for host in hosts]
+
+    async def close(self):
+        self.cache.clear()
+        await self.resolver.close()
+
+
+def is_private_address(address: str) -> bool:
+    # Loopback, link-local and private ranges, IPv4 and IPv6
+    return not ipaddress.ip_address(address.split("%")[0]).is_global
+
+
+class WebLoader:
+    """
+    Loads web pages as documents for RAG. Pages are downloaded concurrently
+    through one aiohttp session, at most `concurrency` at a time, each within
+    `timeout` seconds and `max_page_size` bytes, and converted to text while
+    they are downloaded. Pages that fail to load are skipped.
+
+    Loaded pages are kept for `page_cache_ttl` seconds. Within that time a
+    page is revalidated with a conditional request when the server gave it an
+    ETag or Last-Modified date, and reused without a request otherwise.
+
+    Unless `allow_local` is set, URLs whose host resolves to a private address
+    are refused, including the targets of redirects, which are followed one
+    at a time; the resolution is cached and reused for the connection.
+    """
+
+    def __init__(
+        self,
+        timeout: int = 10,
+        max_page_size: int = 5 * 1024 * 1024,
+        dns_cache_ttl: int = 300,
+        allow_local: bool = False,
+        page_cache_ttl: int = 3600,
+        page_cache_max_entries: int = 256,
+    ):
+        self.timeout = timeout
+        self.max_page_size = max_page_size
+        self.dns_cache_ttl = dns_cache_ttl
+        self.allow_local = allow_local
+
+        self.pages = TTLCache(max_items=page_cache_max_entries, ttl=page_cache_ttl)
+        self.session = None
+        self.resolver = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.resolver = CachingResolver(ttl=self.dns_cache_ttl)
+            self.session = aiohttp.ClientSession(
+                trust_env=True,
+                headers=DEFAULT_HEADERS,
+                connector=aiohttp.TCPConnector(
+                    resolver=self.resolver, use_dns_cache=False
+                ),
+            )
+        return self.session
+
+    async def validate_url(self, url: str) -> bool:
+        if isinstance(validators.url(url), validators.ValidationError):
+            return False
+        if self.allow_local:
+            return True
+
+        hostname = urlparse(url).hostname
+        self.get_session()
+        try:
+            hosts = await self.resolver.resolve(hostname, 0, socket.AF_UNSPEC)
+        except OSError as e:
+            log.warning(f"Could not resolve {hostname}: {e}")
+            return False
+        return not any(is_private_address(host["host"]) for host in hosts)
+
+    async def get(
+        self, url: str, headers: dict, verify_ssl: bool
+    ) -> Optional[aiohttp.ClientResponse]:
+        """
+        GET a URL, following redirects only to URLs that pass validate_url.
+        None if one of them does not.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            if not await self.validate_url(url):
+                log.warning(f"Skipping invalid or local url {url}")
+                return None
+
+            response = await self.get_session().get(
+                url,
+                headers=headers,
+                ssl=None if verify_ssl else False,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                allow_redirects=False,
+            )
+            location = response.headers.get("Location")
+            if response.status not in REDIRECT_STATUSES or location is None:
+                return response
+
+            response.release()
+            url = urljoin(str(response.url), location)
+
+        log.warning(f"Skipping {url} after {MAX_REDIRECTS} redirects")
+        return None
+
+    async def fetch(self, url: str, verify_ssl: bool = True) -> Optional[Document]:
+        cached = self.pages.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+            if not headers:
+                return cached.document
+
+        response = await self.get(url, headers, verify_ssl)
+        if response is None:
+            return None
+
+        async with response as r:
+            if r.status == 304 and cached is not None:
+                self.pages.set(url, cached)
+                return cached.document
+            r.raise_for_status()
+
+            is_html = r.content_type in HTML_CONTENT_TYPES
+            if not is_html and not r.content_type.startswith("text/"):
+                log.warning(f"Skipping {url} with content type {r.content_type}")
+                return None
+
+            try:
+                decoder = codecs.getincrementaldecoder(r.charset or "utf-8")(
+                    errors="replace"
+                )
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+            parser = HTMLTextExtractor()
+            # Plain text pages are taken as is
+            feed = parser.feed if is_html else parser.handle_data
+            size = 0
+            async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                feed(decoder.decode(chunk))
+                if size >= self.max_page_size:
+                    log.warning(f"Truncated {url} at {size} bytes")
+                    break
+
+            feed(decoder.decode(b"", final=True))
+            parser.close()
+
+            document = parser.get_document(url)
+            self.pages.set(
+                url,
+                CachedPage(
+                    document, r.headers.get("ETag"), r.headers.get("Last-Modified")
+                ),
+            )
+
+        return document
+
+    async def load(
+        self,
+        urls: Sequence[str],
+        verify_ssl: bool = True,
+        concurrency: int = 10,
+    ) -> List[Document]:
+        """
+        Load pages concurrently, returning the documents of the pages that
+        loaded in the order of `urls`.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(url):
+            async with semaphore:
+                start_time = time.perf_counter()
+                try:
+                    document = await self.fetch(url, verify_ssl)
+                except Exception as e:
+                    # Log the error and continue with the next URL
+                    log.error(f"Error loading {url}: {e!r}")
+                    return None
+                log.debug(
+                    f"Loaded {url} in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+                )
+                return document
+
+        documents = await asyncio.gather(*[fetch(url) for url in urls])
+        return [document for document in documents if document is not None]
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -3,19 +3,70 @@ import asyncio
 
 
 from apps.webui.models.users import Users
+from apps.socket.utils import (
+    MemoryLock,
+    MemorySessionPool,
+    MemoryUsagePool,
+    RedisLock,
+    RedisSessionPool,
+    RedisUsagePool,
+    get_redis_client,
+)
 from utils.utils import decode_token
 
-sio = socketio.AsyncServer(cors_allowed_origins=[], async_mode="asgi")
-app = socketio.ASGIApp(sio, socketio_path="/ws/socket.io")
-
-# Dictionary to maintain the user pool
+from config import WEBSOCKET_MANAGER, WEBSOCKET_REDIS_URL
 
-SESSION_POOL = {}
-USER_POOL = {}
-USAGE_POOL = {}
 # Timeout duration in seconds
 TIMEOUT_DURATION = 3
 
+# Sessions of a worker that stopped refreshing them expire after SESSION_TTL
+SESSION_HEARTBEAT_INTERVAL = 10
+SESSION_TTL = SESSION_HEARTBEAT_INTERVAL * 3
+
+redis_client = None
+if WEBSOCKET_MANAGER == "redis":
+    # Rooms, emits and presence pools are shared across workers through Redis
+    mgr = socketio.AsyncRedisManager(WEBSOCKET_REDIS_URL)
+    sio = socketio.AsyncServer(
+        cors_allowed_origins=[], async_mode="asgi", client_manager=mgr
+    )
+
+    redis_client = get_redis_client(WEBSOCKET_REDIS_URL)
+    SESSION_POOL = RedisSessionPool(
+        "open-webui:session_pool", redis_client, SESSION_TTL
+    )
+    USAGE_POOL = RedisUsagePool("open-webui:usage_pool", redis_client)
+
+    pool_cleanup_lock = RedisLock(
+        "open-webui:pool_cleanup_lock", redis_client, TIMEOUT_DURATION * 2
+    )
+else:
+    sio = socketio.AsyncServer(cors_allowed_origins=[], async_mode="asgi")
+
+    SESSION_POOL = MemorySessionPool()
+    USAGE_POOL = MemoryUsagePool()
+
+    pool_cleanup_lock = MemoryLock()
+
+app = socketio.ASGIApp(sio, socketio_path="/ws/socket.io")
+
+# Sessions connected to this worker, whose heartbeats it refreshes
+LOCAL_SIDS = set()
+
+
+async def add_user_session(sid, user):
+    LOCAL_SIDS.add(sid)
+    await SESSION_POOL.add(sid, user.id)
+
+
+async def remove_user_session(sid):
+    LOCAL_SIDS.discard(sid)
+    await SESSION_POOL.remove(sid)
+
+
+async def get_user_count():
+    return len(await SESSION_POOL.get_user_ids())
+
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -27,16 +78,12 @@ async def connect(sid, environ, auth):
             user = Users.get_user_by_id(data["id"])
 
         if user:
-            SESSION_POOL[sid] = user.id
-            if user.id in USER_POOL:
-                USER_POOL[user.id].append(sid)
-            else:
-                USER_POOL[user.id] = [sid]
+            await add_user_session(sid, user)
 
             print(f"user {user.name}({user.id}) connected with session ID {sid}")
 
-            await sio.emit("user-count", {"count": len(set(USER_POOL))})
-            await sio.emit("usage", {"models": get_models_in_use()})
+            await sio.emit("user-count", {"count": await get_user_count()})
+            await sio.emit("usage", {"models": await get_models_in_use()})
 
 
 @sio.on("user-join")
@@ -48,93 +95,83 @@ async def user_join(sid, data):
     if auth and "token" in auth:
         data = decode_token(auth["token"])
 
+        user = None
         if data is not None and "id" in data:
             user = Users.get_user_by_id(data["id"])
 
         if user:
-
-            SESSION_POOL[sid] = user.id
-            if user.id in USER_POOL:
-                USER_POOL[user.id].append(sid)
-            else:
-                USER_POOL[user.id] = [sid]
+            await add_user_session(sid, user)
 
             print(f"user {user.name}({user.id}) connected with session ID {sid}")
 
-            await sio.emit("user-count", {"count": len(set(USER_POOL))})
+            await sio.emit("user-count", {"count": await get_user_count()})
 
 
 @sio.on("user-count")
 async def user_count(sid):
-    await sio.emit("user-count", {"count": len(set(USER_POOL))})
+    await sio.emit("user-count", {"count": await get_user_count()})
 
 
-def get_models_in_use():
+async def get_models_in_use():
     # Aggregate all models in use
-    models_in_use = []
-    for model_id, data in USAGE_POOL.items():
-        models_in_use.append(model_id)
-
-    return models_in_use
+    return await USAGE_POOL.get_models()
 
 
 @sio.on("usage")
 async def usage(sid, data):
-
     model_id = data["model"]
 
-    # Cancel previous callback if there is one
-    if model_id in USAGE_POOL:
-        USAGE_POOL[model_id]["callback"].cancel()
+    # Record the last time this session used the model; stale entries are
+    # removed by the cleanup task after TIMEOUT_DURATION
+    await USAGE_POOL.touch(model_id, sid)
 
-    # Store the new usage data and task
+    # Broadcast the usage data to all clients
+    await sio.emit("usage", {"models": await get_models_in_use()})
 
-    if model_id in USAGE_POOL:
-        USAGE_POOL[model_id]["sids"].append(sid)
-        USAGE_POOL[model_id]["sids"] = list(set(USAGE_POOL[model_id]["sids"]))
 
-    else:
-        USAGE_POOL[model_id] = {"sids": [sid]}
+async def periodic_pool_cleanup():
+    """
+    Refresh the heartbeats of this worker's sessions and, on one worker at a
+    time, expire stale model usage and the sessions of dead workers.
+    Started and stopped by the app lifespan.
+    """
+    loop = asyncio.get_running_loop()
+    last_heartbeat = 0
 
-    # Schedule a task to remove the usage data after TIMEOUT_DURATION
-    USAGE_POOL[model_id]["callback"] = asyncio.create_task(
-        remove_after_timeout(sid, model_id)
-    )
+    while True:
+        await asyncio.sleep(1)
 
-    # Broadcast the usage data to all clients
-    await sio.emit("usage", {"models": get_models_in_use()})
+        try:
+            if loop.time() - last_heartbeat >= SESSION_HEARTBEAT_INTERVAL:
+                await SESSION_POOL.refresh(LOCAL_SIDS)
+                last_heartbeat = loop.time()
 
+            if not await pool_cleanup_lock.acquire():
+                continue
 
-async def remove_after_timeout(sid, model_id):
-    try:
-        await asyncio.sleep(TIMEOUT_DURATION)
-        if model_id in USAGE_POOL:
-            print(USAGE_POOL[model_id]["sids"])
-            USAGE_POOL[model_id]["sids"].remove(sid)
-            USAGE_POOL[model_id]["sids"] = list(set(USAGE_POOL[model_id]["sids"]))
+            if await SESSION_POOL.expire() > 0:
+                await sio.emit("user-count", {"count": await get_user_count()})
 
-            if len(USAGE_POOL[model_id]["sids"]) == 0:
-                del USAGE_POOL[model_id]
+            if await USAGE_POOL.expire(TIMEOUT_DURATION):
+                # Broadcast the usage data to all clients
+                await sio.emit("usage", {"models": await get_models_in_use()})
+        except Exception as e:
+            print(f"Error cleaning up socket pools: {e}")
 
-            # Broadcast the usage data to all clients
-            await sio.emit("usage", {"models": get_models_in_use()})
-    except asyncio.CancelledError:
-        # Task was cancelled due to new 'usage' event
-        pass
+
+async def close_pools():
+    if redis_client is not None:
+        await pool_cleanup_lock.release()
+        await redis_client.aclose()
 
 
 @sio.event
 async def disconnect(sid):
-    if sid in SESSION_POOL:
-        user_id = SESSION_POOL[sid]
-        del SESSION_POOL[sid]
-
-        USER_POOL[user_id].remove(sid)
-
-        if len(USER_POOL[user_id]) == 0:
-            del USER_POOL[user_id]
+    LOCAL_SIDS.discard(sid)
+    if await SESSION_POOL.contains(sid):
+        await remove_user_session(sid)
 
-        await sio.emit("user-count", {"count": len(USER_POOL)})
+        await sio.emit("user-count", {"count": await get_user_count()})
     else:
         print(f"Unknown session ID {sid} disconnected")
 
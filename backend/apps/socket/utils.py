@@ -0,0 +1,209 @@
+import json
+import time
+import uuid
+from typing import Iterable, Optional
+
+
+def get_redis_client(redis_url: str):
+    import redis.asyncio as redis
+
+    return redis.Redis.from_url(redis_url, decode_responses=True)
+
+
+class RedisSessionPool:
+    """
+    Socket sessions by sid with the id of their user, shared by every worker
+    connected to the same Redis. Each session is its own hash field, so
+    workers adding and removing sessions at the same time don't overwrite
+    each other.
+
+    Workers `refresh` the sessions they hold; sessions not refreshed for
+    `ttl` seconds, left behind by a worker that died, are deleted by `expire`.
+    """
+
+    def __init__(self, name: str, redis_client, ttl: int):
+        self.name = name
+        self.heartbeats = f"{name}:heartbeats"
+        self.redis = redis_client
+        self.ttl = ttl
+
+    async def add(self, sid: str, user_id: str):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.name, sid, user_id)
+            pipe.zadd(self.heartbeats, {sid: time.time()})
+            await pipe.execute()
+
+    async def remove(self, sid: str) -> Optional[str]:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hget(self.name, sid)
+            pipe.hdel(self.name, sid)
+            pipe.zrem(self.heartbeats, sid)
+            user_id, _, _ = await pipe.execute()
+        return user_id
+
+    async def contains(self, sid: str) -> bool:
+        return bool(await self.redis.hexists(self.name, sid))
+
+    async def get_user_ids(self) -> set:
+        return set(await self.redis.hvals(self.name))
+
+    async def refresh(self, sids: Iterable[str]):
+        now = time.time()
+        sids = list(sids)
+        if len(sids) > 0:
+            # Only existing sessions, a removed session is not brought back
+            await self.redis.zadd(self.heartbeats, {sid: now for sid in sids}, xx=True)
+
+    async def expire(self) -> int:
+        sids = await self.redis.zrangebyscore(
+            self.heartbeats, "-inf", time.time() - self.ttl
+        )
+        if len(sids) == 0:
+            return 0
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.name, *sids)
+            pipe.zrem(self.heartbeats, *sids)
+            await pipe.execute()
+        return len(sids)
+
+
+class MemorySessionPool:
+    """
+    In-process counterpart of RedisSessionPool for the single-process backend.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+
+    async def add(self, sid: str, user_id: str):
+        self.sessions[sid] = user_id
+
+    async def remove(self, sid: str) -> Optional[str]:
+        return self.sessions.pop(sid, None)
+
+    async def contains(self, sid: str) -> bool:
+        return sid in self.sessions
+
+    async def get_user_ids(self) -> set:
+        return set(self.sessions.values())
+
+    async def refresh(self, sids: Iterable[str]):
+        pass
+
+    async def expire(self) -> int:
+        return 0
+
+
+class RedisUsagePool:
+    """
+    Last time each session used a model, as a Redis sorted set of
+    [model_id, sid] members scored by timestamp, shared by every worker.
+    """
+
+    def __init__(self, name: str, redis_client):
+        self.name = name
+        self.redis = redis_client
+
+    async def touch(self, model_id: str, sid: str):
+        await self.redis.zadd(self.name, {json.dumps([model_id, sid]): time.time()})
+
+    async def get_models(self) -> list:
+        members = await self.redis.zrange(self.name, 0, -1)
+        return list(dict.fromkeys(json.loads(member)[0] for member in members))
+
+    async def expire(self, timeout: int) -> bool:
+        """Remove the uses older than `timeout` seconds, returning if any were."""
+        removed = await self.redis.zremrangebyscore(
+            self.name, "-inf", time.time() - timeout
+        )
+        return removed > 0
+
+
+class MemoryUsagePool:
+    """
+    In-process counterpart of RedisUsagePool for the single-process backend.
+    """
+
+    def __init__(self):
+        self.uses = {}
+
+    async def touch(self, model_id: str, sid: str):
+        self.uses[(model_id, sid)] = time.time()
+
+    async def get_models(self) -> list:
+        return list(dict.fromkeys(model_id for model_id, _ in self.uses))
+
+    async def expire(self, timeout: int) -> bool:
+        now = time.time()
+        expired = [
+            key for key, used_at in self.uses.items() if now - used_at >= timeout
+        ]
+        for key in expired:
+            del self.uses[key]
+        return len(expired) > 0
+
+
+# Compare and act in one step, the lock may expire and pass to another
+# worker between a GET and the command that follows it
+RENEW_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """
+    Expiring Redis lock so periodic jobs run on a single worker at a time.
+    """
+
+    def __init__(self, name: str, redis_client, timeout_secs: int):
+        self.name = name
+        self.redis = redis_client
+        self.timeout_secs = timeout_secs
+        self.lock_id = str(uuid.uuid4())
+        self.renew_script = redis_client.register_script(RENEW_LOCK_SCRIPT)
+        self.release_script = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+    async def acquire(self) -> bool:
+        return (
+            bool(
+                await self.redis.set(
+                    self.name, self.lock_id, nx=True, ex=self.timeout_secs
+                )
+            )
+            or await self.renew()
+        )
+
+    async def renew(self) -> bool:
+        return bool(
+            await self.renew_script(
+                keys=[self.name], args=[self.lock_id, self.timeout_secs]
+            )
+        )
+
+    async def release(self):
+        await self.release_script(keys=[self.name], args=[self.lock_id])
+
+
+class MemoryLock:
+    """
+    No-op counterpart of RedisLock for the single-process in-memory backend.
+    """
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def renew(self) -> bool:
+        return True
+
+    async def release(self):
+        pass
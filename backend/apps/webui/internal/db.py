@@ -1,20 +1,37 @@
 import os
 import logging
 import json
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
+from fastapi.concurrency import run_in_threadpool
 from peewee_migrate import Router
 from apps.webui.internal.wrappers import register_connection
 
 from typing import Optional, Any
 from typing_extensions import Self
 
-from sqlalchemy import create_engine, types, Dialect
+from sqlalchemy import create_engine, event, types, Dialect, make_url
+from sqlalchemy.exc import ArgumentError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql.type_api import _T
 
-from config import SRC_LOG_LEVELS, DATA_DIR, DATABASE_URL, BACKEND_DIR
+from config import (
+    SRC_LOG_LEVELS,
+    DATA_DIR,
+    DATABASE_URL,
+    BACKEND_DIR,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_SQLITE_JOURNAL_MODE,
+    DATABASE_SQLITE_SYNCHRONOUS,
+    DATABASE_SQLITE_BUSY_TIMEOUT,
+    DATABASE_SQLITE_MMAP_SIZE,
+    DATABASE_SQLITE_CACHE_SIZE,
+)
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["DB"])
@@ -102,13 +119,120 @@ def handle_peewee_migration(DATABASE_URL: str):
 handle_peewee_migration(DATABASE_URL)
 
 
+SQLITE_PRAGMAS = {
+    # WAL lets readers run alongside the single writer instead of blocking on it
+    "journal_mode": DATABASE_SQLITE_JOURNAL_MODE,
+    # NORMAL only fsyncs on checkpoints in WAL mode, still safe against corruption
+    "synchronous": DATABASE_SQLITE_SYNCHRONOUS,
+    "busy_timeout": DATABASE_SQLITE_BUSY_TIMEOUT,
+    "mmap_size": DATABASE_SQLITE_MMAP_SIZE,
+    "cache_size": DATABASE_SQLITE_CACHE_SIZE,
+    "temp_store": "MEMORY",
+}
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+
+def get_sqlite_pool_args(url: str) -> dict:
+    # In-memory databases keep SQLAlchemy's default pool, every pooled
+    # connection would otherwise see its own empty database
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        return {}
+    return {
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_POOL_MAX_OVERFLOW,
+        "pool_timeout": DATABASE_POOL_TIMEOUT,
+    }
+
+
+def create_sqlite_engine(url: str):
+    """
+    SQLite engine with the tuning pragmas applied on connect and, for file
+    databases, a sized connection pool.
+    """
+    sqlite_engine = create_engine(
+        url, connect_args={"check_same_thread": False}, **get_sqlite_pool_args(url)
+    )
+    event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+    return sqlite_engine
+
+
+# Sync drivers and the asyncio driver of the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+pg8000": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+}
+
+
+def get_async_database_url(url: str) -> Optional[str]:
+    """
+    Same database as `url`, through its asyncio driver, or None if there is
+    no known asyncio driver for it.
+    """
+    try:
+        url = make_url(url)
+    except ArgumentError:
+        return None
+    if url.drivername in ASYNC_DRIVERS.values():
+        return url.render_as_string(hide_password=False)
+    if url.drivername in ASYNC_DRIVERS:
+        return url.set(drivername=ASYNC_DRIVERS[url.drivername]).render_as_string(
+            hide_password=False
+        )
+    return None
+
+
+def create_database_async_engine(url: str):
+    """
+    Async engine of the database at `url`, or None if it has no asyncio
+    driver installed, in which case run_async_db falls back to the sync
+    engine on the threadpool.
+    """
+    async_url = get_async_database_url(url)
+    if async_url is None:
+        log.warning(
+            f"No asyncio driver for {make_url(url).drivername}, "
+            "async database sessions use the sync engine"
+        )
+        return None
+
+    try:
+        if make_url(async_url).get_backend_name() == "sqlite":
+            async_pool_args = get_sqlite_pool_args(async_url)
+            if async_pool_args:
+                # aiosqlite defaults to NullPool for file databases, which
+                # reopens the database (and reruns the pragmas) for every session
+                async_pool_args["poolclass"] = AsyncAdaptedQueuePool
+            sqlite_async_engine = create_async_engine(async_url, **async_pool_args)
+            event.listen(sqlite_async_engine.sync_engine, "connect", set_sqlite_pragmas)
+            return sqlite_async_engine
+        return create_async_engine(async_url, pool_pre_ping=True)
+    except ImportError as e:
+        log.warning(
+            f"Could not load the asyncio driver of {make_url(async_url).drivername} "
+            f"({e}), async database sessions use the sync engine"
+        )
+        return None
+
+
 SQLALCHEMY_DATABASE_URL = DATABASE_URL
 if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
+    engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
 else:
     engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+async_engine = create_database_async_engine(SQLALCHEMY_DATABASE_URL)
 
 
 SessionLocal = sessionmaker(
@@ -128,3 +252,37 @@ def get_session():
 
 
 get_db = contextmanager(get_session)
+
+
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
+
+
+@asynccontextmanager
+async def get_async_db():
+    """
+    Async counterpart of get_db. Table classes share their query code between
+    both paths by running it through `await db.run_sync(fn, ...)`, which hands
+    `fn` a regular Session whose IO goes through the asyncio driver.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def run_sync_db(fn, *args, **kwargs):
+    with get_db() as db:
+        return fn(db, *args, **kwargs)
+
+
+async def run_async_db(fn, *args, **kwargs):
+    """
+    Run `fn(db, *args, **kwargs)` on an async session without blocking the
+    event loop, or on a sync session in the threadpool without an async engine.
+    """
+    if AsyncSessionLocal is None:
+        return await run_in_threadpool(run_sync_db, fn, *args, **kwargs)
+    async with get_async_db() as db:
+        return await db.run_sync(fn, *args, **kwargs)
@@ -19,10 +19,18 @@ from apps.webui.routers import (
     files,
     functions,
     series,
+    search,
 )
 from apps.webui.models.functions import Functions
+from apps.webui.models.memories import Memories
 from apps.webui.models.models import Models
-from apps.webui.utils import load_function_module_by_id
+from apps.webui.models.tools import Tools
+from apps.webui.utils import (
+    MemoryIndex,
+    ModuleRegistry,
+    load_function_module_by_id,
+    load_toolkit_module_by_id,
+)
 
 from utils.misc import stream_message_template
 from utils.task import prompt_template
@@ -47,6 +55,14 @@ from config import (
     AppConfig,
     OAUTH_USERNAME_CLAIM,
     OAUTH_PICTURE_CLAIM,
+    TOOLS_DIR,
+    FUNCTIONS_DIR,
+    MODULE_VALVES_CACHE_TTL,
+    CHROMA_CLIENT,
+    MEMORY_INDEX_BATCH_SIZE,
+    MEMORY_CACHE_MAX_USERS,
+    MEMORY_CACHE_MAX_ITEMS,
+    MEMORY_CACHE_TTL,
 )
 
 from apps.socket.main import get_event_call, get_event_emitter
@@ -88,8 +104,27 @@ app.state.config.OAUTH_USERNAME_CLAIM = OAUTH_USERNAME_CLAIM
 app.state.config.OAUTH_PICTURE_CLAIM = OAUTH_PICTURE_CLAIM
 
 app.state.MODELS = {}
-app.state.TOOLS = {}
-app.state.FUNCTIONS = {}
+app.state.TOOLS = ModuleRegistry(
+    TOOLS_DIR,
+    lambda id: load_toolkit_module_by_id(id)[0],
+    Tools.get_tool_valves_by_id,
+    MODULE_VALVES_CACHE_TTL,
+)
+app.state.FUNCTIONS = ModuleRegistry(
+    FUNCTIONS_DIR,
+    lambda id: load_function_module_by_id(id)[0],
+    Functions.get_function_valves_by_id,
+    MODULE_VALVES_CACHE_TTL,
+)
+app.state.MEMORY_INDEX = MemoryIndex(
+    CHROMA_CLIENT,
+    lambda: app.state.EMBEDDING_FUNCTION,
+    Memories.get_memories_by_user_id,
+    MEMORY_INDEX_BATCH_SIZE,
+    cache_max_users=MEMORY_CACHE_MAX_USERS,
+    cache_max_items=MEMORY_CACHE_MAX_ITEMS,
+    cache_ttl=MEMORY_CACHE_TTL,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -123,6 +158,7 @@ app.include_router(tools.router, prefix="/tools", tags=["tools"])
 app.include_router(functions.router, prefix="/functions", tags=["functions"])
 
 app.include_router(series.router, prefix="/series", tags=["series"])
+app.include_router(search.router, prefix="/search", tags=["search"])
 app.include_router(utils.router, prefix="/utils", tags=["utils"])
 
 
@@ -137,24 +173,11 @@ async def get_status():
 
 
 async def get_pipe_models():
-    pipes = Functions.get_functions_by_type("pipe", active_only=True)
+    pipes = await Functions.get_functions_by_type_async("pipe", active_only=True)
     pipe_models = []
 
     for pipe in pipes:
-        # Check if function is already loaded
-        if pipe.id not in app.state.FUNCTIONS:
-            function_module, function_type, frontmatter = load_function_module_by_id(
-                pipe.id
-            )
-            app.state.FUNCTIONS[pipe.id] = function_module
-        else:
-            function_module = app.state.FUNCTIONS[pipe.id]
-
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(pipe.id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
+        function_module = app.state.FUNCTIONS.get_module(pipe.id)
 
         # Check if function is a manifold
         if hasattr(function_module, "type"):
@@ -211,7 +234,7 @@ async def get_pipe_models():
 
 async def generate_function_chat_completion(form_data, user):
     model_id = form_data.get("model")
-    model_info = Models.get_model_by_id(model_id)
+    model_info = await Models.get_model_by_id_async(model_id)
 
     metadata = None
     if "metadata" in form_data:
@@ -308,21 +331,7 @@ async def generate_function_chat_completion(form_data, user):
             pipe_id, sub_pipe_id = pipe_id.split(".", 1)
         print(pipe_id)
 
-        # Check if function is already loaded
-        if pipe_id not in app.state.FUNCTIONS:
-            function_module, function_type, frontmatter = load_function_module_by_id(
-                pipe_id
-            )
-            app.state.FUNCTIONS[pipe_id] = function_module
-        else:
-            function_module = app.state.FUNCTIONS[pipe_id]
-
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-
-            valves = Functions.get_function_valves_by_id(pipe_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
+        function_module = app.state.FUNCTIONS.get_module(pipe_id)
 
         pipe = function_module.pipe
 
@@ -13,6 +13,8 @@ from sqlalchemy import (
     text,
     Boolean,
     CHAR,
+    select,
+    insert,
 )
 from sqlalchemy.orm import relationship, Mapped
 from enum import Enum as PyEnum
@@ -20,7 +22,12 @@ import uuid
 import json
 import logging
 import time
-from apps.webui.internal.db import Base, get_db, JSONField
+from apps.webui.internal.db import Base, get_db, run_async_db, JSONField
+from apps.webui.models.search import (
+    SearchIndex,
+    SearchEntityType,
+    get_article_search_text,
+)
 from config import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
@@ -89,6 +96,17 @@ class Article(Base):
     )
 
 
+ARTICLE_COLUMNS = [column.name for column in Article.__table__.columns]
+
+# Keeps IN (...) lists under the bound parameter limit of older SQLite builds
+BULK_BATCH_SIZE = 500
+
+
+def _batched(items: list, size: int = BULK_BATCH_SIZE):
+    for offset in range(0, len(items), size):
+        yield items[offset : offset + size]
+
+
 ####################
 # Pydantic Models
 ####################
@@ -283,6 +301,44 @@ class ArticleForm(BaseModel):
 
 
 class ArticlesTable:
+    def _get_series_ids(self, db, article_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Series ids of many articles in one query on the association table,
+        instead of lazy loading article.series row by row.
+        """
+        series_ids = {id: [] for id in article_ids}
+        for batch in _batched(article_ids):
+            for article_id, series_id in db.execute(
+                select(
+                    ARTICLE_ON_SERIES.c.article_id, ARTICLE_ON_SERIES.c.series_id
+                ).where(ARTICLE_ON_SERIES.c.article_id.in_(batch))
+            ):
+                series_ids[article_id].append(series_id)
+        return series_ids
+
+    def _to_article_models(self, db, articles: List[Article]) -> List[ArticleModel]:
+        series_ids = self._get_series_ids(db, [article.id for article in articles])
+        return [
+            ArticleModel.model_validate(
+                {
+                    **{column: getattr(article, column) for column in ARTICLE_COLUMNS},
+                    "series_ids": series_ids[article.id],
+                }
+            )
+            for article in articles
+        ]
+
+    def _to_article_model(self, db, article: Article) -> ArticleModel:
+        return self._to_article_models(db, [article])[0]
+
+    def _index_article(self, db, article: Article):
+        SearchIndex.index(
+            db,
+            SearchEntityType.ARTICLE,
+            article.id,
+            *get_article_search_text(article.title, article.objective, article.steps),
+        )
+
     def insert_new_article(
         self,
         *,
@@ -306,37 +362,20 @@ class ArticlesTable:
         with get_db() as db:
             # Check if the article already exists
             article = db.query(Article).filter_by(document_id=document_id).first()
-            series = db.query(Series).filter_by(id=series_id).first()
+            series = db.query(Series.id).filter_by(id=series_id).first()
             if article and series:
                 # Update the article.series if the series is not already associated.
-                log.info(f"Series: {series}")
-                if series.id not in [series.id for series in article.series]:
-                    article.series.append(series)
+                log.info(f"Series: {series_id}")
+                if series_id not in self._get_series_ids(db, [article.id])[article.id]:
+                    db.execute(
+                        insert(ARTICLE_ON_SERIES).values(
+                            article_id=article.id, series_id=series_id
+                        )
+                    )
                     db.commit()
-                    db.refresh(article)
-
-                # Create a new article model (this is not inserted into the DB, just returned to the user with updates), attach only the series id to the model
-                article_model = ArticleModel(
-                    **{
-                        "id": article.id,
-                        "title": article.title,
-                        "document_id": article.document_id,
-                        "objective": article.objective,
-                        "category": article.category,
-                        "url": article.url,
-                        "introduction": article.introduction,
-                        "applicable_devices": article.applicable_devices,
-                        "steps": article.steps,
-                        "revision_history": article.revision_history,
-                        "published": article.published,
-                        "user_id": article.user_id,
-                        "series_ids": [series.id for series in article.series],
-                        "sources": article.sources,
-                        "created_at": article.created_at,
-                        "updated_at": article.updated_at,
-                    }
-                )
-                return ArticleModel.model_validate(article_model)
+
+                # The article is not changed in the DB, only returned with its series ids
+                return self._to_article_model(db, article)
             else:
                 if not series:
                     raise ValueError(
@@ -362,33 +401,147 @@ class ArticlesTable:
                     updated_at=int(time.time()),
                 )
                 db.add(result)
-                db.commit()
-                db.refresh(result)
+                db.flush()
 
                 # Associate the new article with the series
-                result.series.append(series)
+                db.execute(
+                    insert(ARTICLE_ON_SERIES).values(
+                        article_id=result.id, series_id=series_id
+                    )
+                )
+                self._index_article(db, result)
                 db.commit()
-                db.refresh(result)
-                series_ids = [series.id for series in result.series]
-                article = {
-                    column.name: getattr(result, column.name)
-                    for column in result.__table__.columns
-                }
-                article["series_ids"] = series_ids
+
                 # Return the newly created article
-                return ArticleModel.model_validate(article)
+                return self._to_article_model(db, result)
+
+    def insert_new_articles(self, articles: List[dict]) -> List[ArticleModel]:
+        """
+        Bulk counterpart of insert_new_article, each item takes its keyword
+        arguments. Existing articles are looked up by document_id once for the
+        whole batch, then the new articles and their series links are inserted
+        with executemany in a single transaction. Articles that already exist
+        are only linked to the series they are missing. Raises ValueError if
+        any series does not exist, before anything is written.
+        """
+        from apps.webui.models.series import Series
+
+        if len(articles) == 0:
+            return []
+
+        with get_db() as db:
+            series_ids = list({article["series_id"] for article in articles})
+            found_series_ids = set()
+            for batch in _batched(series_ids):
+                found_series_ids.update(
+                    db.scalars(select(Series.id).where(Series.id.in_(batch)))
+                )
+            missing_series_ids = [id for id in series_ids if id not in found_series_ids]
+            if missing_series_ids:
+                raise ValueError(
+                    f"Series with id {', '.join(missing_series_ids)} not found. Articles must be associated with a series."
+                )
+
+            document_ids = list(dict.fromkeys(a["document_id"] for a in articles))
+            article_ids = {}
+            for batch in _batched(document_ids):
+                for id, document_id in db.execute(
+                    select(Article.id, Article.document_id).where(
+                        Article.document_id.in_(batch)
+                    )
+                ):
+                    article_ids[document_id] = id
+
+            links = {
+                (article_id, series_id)
+                for article_id, ids in self._get_series_ids(
+                    db, list(article_ids.values())
+                ).items()
+                for series_id in ids
+            }
+
+            now = int(time.time())
+            new_articles = []
+            new_links = []
+            for article in articles:
+                if article["document_id"] not in article_ids:
+                    article_ids[article["document_id"]] = article.get("id") or str(
+                        uuid.uuid4()
+                    )
+                    new_articles.append(
+                        {
+                            "id": article_ids[article["document_id"]],
+                            "title": article["title"],
+                            "document_id": article["document_id"],
+                            "objective": article.get("objective"),
+                            "category": article["category"],
+                            "url": article["url"],
+                            "introduction": article.get("introduction"),
+                            "applicable_devices": article.get("applicable_devices")
+                            or [],
+                            "steps": article.get("steps") or [],
+                            "revision_history": article.get("revision_history") or [],
+                            "published": article.get("published", False),
+                            "user_id": article.get("user_id"),
+                            "sources": (
+                                json.dumps(article["sources"])
+                                if article.get("sources")
+                                else None
+                            ),
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                    )
+
+                link = (article_ids[article["document_id"]], article["series_id"])
+                if link not in links:
+                    links.add(link)
+                    new_links.append({"article_id": link[0], "series_id": link[1]})
+
+            if new_articles:
+                db.execute(insert(Article), new_articles)
+            if new_links:
+                db.execute(insert(ARTICLE_ON_SERIES), new_links)
+            SearchIndex.index_many(
+                db,
+                SearchEntityType.ARTICLE,
+                [
+                    (
+                        article["id"],
+                        *get_article_search_text(
+                            article["title"], article["objective"], article["steps"]
+                        ),
+                        None,
+                    )
+                    for article in new_articles
+                ],
+            )
+            db.commit()
+            log.info(
+                f"Inserted {len(new_articles)} articles and {len(new_links)} series links"
+            )
+
+            ids = [article_ids[document_id] for document_id in document_ids]
+            rows = {}
+            for batch in _batched(ids):
+                for article in db.query(Article).filter(Article.id.in_(batch)):
+                    rows[article.id] = article
+            return self._to_article_models(db, [rows[id] for id in ids])
+
+    def _get_article_by_id(self, db, id: str) -> Optional[ArticleModel]:
+        article = db.query(Article).filter_by(id=id).first()
+        return self._to_article_model(db, article)
 
     def get_article_by_id(self, id: str) -> Optional[ArticleModel]:
         try:
             with get_db() as db:
-                article = db.query(Article).filter_by(id=id).first()
-                series_ids = [series.id for series in article.series]
-                article_data = {
-                    column.name: getattr(article, column.name)
-                    for column in article.__table__.columns
-                }
-                article_data["series_ids"] = series_ids
-                return ArticleModel.model_validate(article_data)
+                return self._get_article_by_id(db, id)
+        except Exception as e:
+            return None
+
+    async def get_article_by_id_async(self, id: str) -> Optional[ArticleModel]:
+        try:
+            return await run_async_db(self._get_article_by_id, id)
         except Exception as e:
             return None
 
@@ -396,13 +549,7 @@ class ArticlesTable:
         try:
             with get_db() as db:
                 article = db.query(Article).filter_by(document_id=document_id).first()
-                series_ids = [series.id for series in article.series]
-                article_data = {
-                    column.name: getattr(article, column.name)
-                    for column in article.__table__.columns
-                }
-                article_data.update({"series_ids": series_ids})
-                return ArticleModel.model_validate(article_data)
+                return self._to_article_model(db, article)
         except Exception as e:
             return None
 
@@ -410,54 +557,58 @@ class ArticlesTable:
         try:
             with get_db() as db:
                 article = db.query(Article).filter_by(url=url).first()
-                return ArticleModel.model_validate(article)
+                return self._to_article_model(db, article)
         except Exception as e:
             return None
 
-    def get_articles(self, skip: int = 0, limit: int = 50) -> List[ArticleModel]:
+    def _get_articles(self, db, skip: int = 0, limit: int = 50) -> List[ArticleModel]:
+        articles = db.query(Article).offset(skip).limit(limit).all()
+        return self._to_article_models(db, articles)
 
+    def get_articles(self, skip: int = 0, limit: int = 50) -> List[ArticleModel]:
         with get_db() as db:
-            articles = db.query(Article).offset(skip).limit(limit).all()
-            article_models = []
-            for article in articles:
-                series_ids = [series.id for series in article.series]
-                article_data = {
-                    column.name: getattr(article, column.name)
-                    for column in article.__table__.columns
-                }
-                article_data["series_ids"] = series_ids
-                article_models.append(ArticleModel.model_validate(article_data))
-            return article_models
+            return self._get_articles(db, skip, limit)
+
+    async def get_articles_async(
+        self, skip: int = 0, limit: int = 50
+    ) -> List[ArticleModel]:
+        return await run_async_db(self._get_articles, skip, limit)
+
+    def _get_articles_by_series_id(self, db, series_id: str) -> List[ArticleModel]:
+        articles = (
+            db.query(Article)
+            .join(ARTICLE_ON_SERIES, ARTICLE_ON_SERIES.c.article_id == Article.id)
+            .filter(ARTICLE_ON_SERIES.c.series_id == series_id)
+            .all()
+        )
+        return self._to_article_models(db, articles)
 
     def get_articles_by_series_id(self, series_id: str) -> List[ArticleModel]:
         with get_db() as db:
-            articles = (
-                db.query(Article)
-                .join(ARTICLE_ON_SERIES, ARTICLE_ON_SERIES.c.article_id == Article.id)
-                .filter(ARTICLE_ON_SERIES.c.series_id == series_id)
-                .all()
-            )
-            a = []
-            for article in articles:
-                series_ids = [series.id for series in article.series]
-                article_data = {
-                    column.name: getattr(article, column.name)
-                    for column in article.__table__.columns
-                }
-                article_data["series_ids"] = series_ids
-                a.append(article_data)
+            return self._get_articles_by_series_id(db, series_id)
 
-            return [ArticleModel.model_validate(article) for article in a]
+    async def get_articles_by_series_id_async(
+        self, series_id: str
+    ) -> List[ArticleModel]:
+        return await run_async_db(self._get_articles_by_series_id, series_id)
 
     def get_articles_by_user_id(self, user_id: str) -> List[ArticleModel]:
         with get_db() as db:
             articles = db.query(Article).filter_by(user_id=user_id).all()
-            return [ArticleModel.model_validate(article) for article in articles]
+            return self._to_article_models(db, articles)
+
+    def _get_many_articles_by_ids(self, db, ids: List[str]) -> List[ArticleModel]:
+        articles = db.query(Article).filter(Article.id.in_(ids)).all()
+        return self._to_article_models(db, articles)
 
     def get_many_articles_by_ids(self, ids: List[str]) -> List[ArticleModel]:
         with get_db() as db:
-            articles = db.query(Article).filter(Article.id.in_(ids)).all()
-            return [ArticleModel.model_validate(article) for article in articles]
+            return self._get_many_articles_by_ids(db, ids)
+
+    async def get_many_articles_by_ids_async(
+        self, ids: List[str]
+    ) -> List[ArticleModel]:
+        return await run_async_db(self._get_many_articles_by_ids, ids)
 
     def update_article_by_id(self, id: str, updated: dict) -> Optional[ArticleModel]:
         from apps.webui.models.series import Series
@@ -474,9 +625,10 @@ class ArticlesTable:
                     series = db.query(Series).filter(Series.id.in_(series_ids)).all()
                     article.series = series
 
+                self._index_article(db, article)
                 db.commit()
                 db.refresh(article)
-                return ArticleModel.model_validate(article)
+                return self._to_article_model(db, article)
         except Exception as e:
             return None
 
@@ -494,9 +646,10 @@ class ArticlesTable:
                         steps[step_idx] = updated
                         article.steps = steps
                         article.updated_at = int(time.time())
+                        self._index_article(db, article)
                         db.commit()
                         db.refresh(article)
-                        return ArticleModel.model_validate(article)
+                        return self._to_article_model(db, article)
                     else:
                         log.debug(f"Step index {step_idx} out of range")
                         return None
@@ -526,6 +679,7 @@ class ArticlesTable:
             article = db.query(Article).filter_by(id=id).first()
             if article:
                 db.delete(article)
+                SearchIndex.delete(db, SearchEntityType.ARTICLE, [article.id])
                 db.commit()
                 return True
             else:
@@ -534,13 +688,14 @@ class ArticlesTable:
     def delete_all_articles(self) -> bool:
         with get_db() as db:
             db.query(Article).delete()
+            SearchIndex.delete_all(db, SearchEntityType.ARTICLE)
             db.commit()
             return True
 
     def get_articles_for_editor_review(self) -> List[ArticleModel]:
         with get_db() as db:
             articles = db.query(Article).filter_by(published=False).all()
-            return [ArticleModel.model_validate(article) for article in articles]
+            return self._to_article_models(db, articles)
 
     def update_article_review_status_by_id(
         self, id: str, published: bool
@@ -551,7 +706,7 @@ class ArticlesTable:
                 article.published = published
                 db.commit()
                 db.refresh(article)
-                return ArticleModel.model_validate(article)
+                return self._to_article_model(db, article)
             else:
                 return None
 
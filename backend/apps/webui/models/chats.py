@@ -1,13 +1,41 @@
 from pydantic import BaseModel, ConfigDict
 from typing import List, Union, Optional
 
+import asyncio
+import base64
+import hashlib
 import json
+import logging
+import threading
 import uuid
 import time
 
-from sqlalchemy import Column, String, BigInteger, Boolean, Text
+from sqlalchemy import (
+    Column,
+    String,
+    BigInteger,
+    Boolean,
+    Text,
+    Index,
+    and_,
+    or_,
+    insert,
+)
 
-from apps.webui.internal.db import Base, get_db
+from apps.webui.internal.db import Base, get_db, run_async_db
+from apps.webui.models.search import (
+    SearchIndex,
+    SearchEntityType,
+    get_chat_search_text,
+)
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# Chats re-indexed for search per query
+INDEX_BATCH_SIZE = 100
 
 
 ####################
@@ -29,6 +57,22 @@ class Chat(Base):
     share_id = Column(Text, unique=True, nullable=True)
     archived = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Backs the (updated_at, id) keyset pagination of a user's chat list
+        Index("chat_user_id_updated_at_id_idx", "user_id", "updated_at", "id"),
+    )
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_message"
+
+    chat_id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)
+    message = Column(Text)  # Save Message JSON as Text
+    content_hash = Column(String)
+
+    updated_at = Column(BigInteger)
+
 
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -76,45 +120,317 @@ class ChatTitleIdResponse(BaseModel):
     created_at: int
 
 
+class ChatListPageResponse(BaseModel):
+    chats: List[ChatTitleIdResponse]
+    next_cursor: Optional[str] = None
+
+
+def encode_chat_list_cursor(updated_at: int, id: str) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at}:{id}".encode()).decode()
+
+
+def decode_chat_list_cursor(cursor: str) -> tuple[int, str]:
+    """
+    Raises ValueError if the cursor was not produced by encode_chat_list_cursor.
+    """
+    try:
+        updated_at, id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        )
+        return int(updated_at), id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+####################
+# Message Storage
+#
+# Messages in chat["history"]["messages"] are stored one row per message in
+# chat_message; Chat.chat keeps the remaining skeleton, with the message ids
+# under history["message_ids"]. Legacy rows whose history still holds the
+# messages are read as-is and normalized on their next update.
+####################
+
+
+def split_chat_messages(chat: dict) -> tuple[dict, dict]:
+    """
+    Split a chat JSON into its skeleton and a {message_id: message} dict.
+    """
+    history = chat.get("history")
+    if not isinstance(history, dict) or not isinstance(history.get("messages"), dict):
+        return chat, {}
+
+    messages = history["messages"]
+    skeleton_history = {k: v for k, v in history.items() if k != "messages"}
+    skeleton = {
+        **chat,
+        "history": {**skeleton_history, "message_ids": list(messages.keys())},
+    }
+
+    # The flat message list mirrors the history, keep only ids for shared entries
+    if isinstance(chat.get("messages"), list):
+        skeleton["messages"] = [
+            (
+                message["id"]
+                if isinstance(message, dict)
+                and messages.get(message.get("id")) == message
+                else message
+            )
+            for message in chat["messages"]
+        ]
+
+    return skeleton, messages
+
+
+def is_split_chat(chat: dict) -> bool:
+    return isinstance(chat.get("history"), dict) and "message_ids" in chat["history"]
+
+
+def join_chat_messages(skeleton: dict, messages: dict) -> dict:
+    """
+    Rebuild the chat JSON from a skeleton and its {message_id: message} dict.
+    """
+    if not is_split_chat(skeleton):
+        return skeleton
+
+    history = {k: v for k, v in skeleton["history"].items() if k != "message_ids"}
+    chat = {
+        **skeleton,
+        "history": {
+            **history,
+            "messages": {
+                id: messages[id]
+                for id in skeleton["history"]["message_ids"]
+                if id in messages
+            },
+        },
+    }
+
+    if isinstance(skeleton.get("messages"), list):
+        chat["messages"] = [
+            messages.get(message) if isinstance(message, str) else message
+            for message in skeleton["messages"]
+        ]
+
+    return chat
+
+
+def get_message_hash(message: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(message, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
 class ChatTable:
 
-    def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
-        with get_db() as db:
+    def __init__(self):
+        # Ids of updated chats waiting to be re-indexed for search
+        self.index_queue = set()
+        self.index_queue_lock = threading.Lock()
+
+    def _save_messages(self, db, chat_id: str, messages: dict):
+        """
+        Write only the messages that were added or changed and drop removed ones.
+        """
+        existing_hashes = {
+            id: content_hash
+            for id, content_hash in db.query(
+                ChatMessage.id, ChatMessage.content_hash
+            ).filter_by(chat_id=chat_id)
+        }
+
+        new_rows = []
+        for id, message in messages.items():
+            content_hash = get_message_hash(message)
+            if existing_hashes.get(id) == content_hash:
+                continue
+
+            row = {
+                "message": json.dumps(message),
+                "content_hash": content_hash,
+                "updated_at": int(time.time()),
+            }
+            if id in existing_hashes:
+                db.query(ChatMessage).filter_by(chat_id=chat_id, id=id).update(row)
+            else:
+                new_rows.append({"chat_id": chat_id, "id": id, **row})
+
+        if len(new_rows) > 0:
+            db.execute(insert(ChatMessage), new_rows)
+
+        removed_ids = [id for id in existing_hashes if id not in messages]
+        if len(removed_ids) > 0:
+            db.query(ChatMessage).filter(
+                ChatMessage.chat_id == chat_id, ChatMessage.id.in_(removed_ids)
+            ).delete(synchronize_session=False)
+
+    def _index_chat(self, db, id: str, user_id: str, chat: dict):
+        # Shared snapshots are copies of the original chat, keep them out of search
+        if not user_id.startswith("shared-"):
+            title, body = get_chat_search_text(chat)
+            SearchIndex.index(db, SearchEntityType.CHAT, id, title, body, user_id)
+
+    def _queue_chat_index(self, id: str, user_id: str):
+        # Indexing rewrites the text of the whole conversation, so updates are
+        # indexed in batches by index_queued_chats, once per chat however many
+        # times it was saved meanwhile
+        if not user_id.startswith("shared-"):
+            with self.index_queue_lock:
+                self.index_queue.add(id)
+
+    def _index_queued_chats(self, db) -> int:
+        with self.index_queue_lock:
+            ids, self.index_queue = list(self.index_queue), set()
 
-            id = str(uuid.uuid4())
-            chat = ChatModel(
-                **{
-                    "id": id,
-                    "user_id": user_id,
-                    "title": (
-                        form_data.chat["title"]
-                        if "title" in form_data.chat
-                        else "New Chat"
-                    ),
-                    "chat": json.dumps(form_data.chat),
-                    "created_at": int(time.time()),
-                    "updated_at": int(time.time()),
+        try:
+            for offset in range(0, len(ids), INDEX_BATCH_SIZE):
+                chats = self._to_chat_models(
+                    db,
+                    db.query(Chat)
+                    .filter(Chat.id.in_(ids[offset : offset + INDEX_BATCH_SIZE]))
+                    .all(),
+                )
+                SearchIndex.index_many(
+                    db,
+                    SearchEntityType.CHAT,
+                    [
+                        (
+                            chat.id,
+                            *get_chat_search_text(json.loads(chat.chat)),
+                            chat.user_id,
+                        )
+                        for chat in chats
+                    ],
+                )
+            db.commit()
+        except Exception:
+            # Retried on the next run
+            with self.index_queue_lock:
+                self.index_queue.update(ids)
+            raise
+
+        return len(ids)
+
+    def index_queued_chats(self) -> int:
+        """
+        Re-index the chats updated since the last run, returning how many.
+        """
+        with get_db() as db:
+            return self._index_queued_chats(db)
+
+    async def index_queued_chats_async(self) -> int:
+        return await run_async_db(self._index_queued_chats)
+
+    async def watch_index_queue(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                count = await self.index_queued_chats_async()
+                if count > 0:
+                    log.debug(f"Re-indexed {count} updated chats")
+            except Exception as e:
+                log.error(f"Error re-indexing updated chats: {e}")
+
+    def _delete_messages(self, db, chat_ids):
+        db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
+    def _to_chat_models(self, db, chats) -> List[ChatModel]:
+        """
+        Validate Chat rows into ChatModels, reattaching their stored messages.
+        """
+        skeletons = {chat.id: json.loads(chat.chat) for chat in chats}
+        normalized_ids = [
+            id for id, skeleton in skeletons.items() if is_split_chat(skeleton)
+        ]
+
+        messages = {id: {} for id in normalized_ids}
+        if len(normalized_ids) > 0:
+            for chat_id, id, message in db.query(
+                ChatMessage.chat_id, ChatMessage.id, ChatMessage.message
+            ).filter(ChatMessage.chat_id.in_(normalized_ids)):
+                messages[chat_id][id] = json.loads(message)
+
+        return [
+            ChatModel.model_validate(chat).model_copy(
+                update={
+                    "chat": (
+                        json.dumps(
+                            join_chat_messages(skeletons[chat.id], messages[chat.id])
+                        )
+                        if chat.id in messages
+                        else chat.chat
+                    )
                 }
             )
+            for chat in chats
+        ]
 
-            result = Chat(**chat.model_dump())
-            db.add(result)
-            db.commit()
-            db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+    def _to_chat_model(self, db, chat) -> ChatModel:
+        return self._to_chat_models(db, [chat])[0]
+
+    def _insert_new_chat(
+        self, db, user_id: str, form_data: ChatForm
+    ) -> Optional[ChatModel]:
+        id = str(uuid.uuid4())
+        chat = ChatModel(
+            **{
+                "id": id,
+                "user_id": user_id,
+                "title": (
+                    form_data.chat["title"] if "title" in form_data.chat else "New Chat"
+                ),
+                "chat": json.dumps(form_data.chat),
+                "created_at": int(time.time()),
+                "updated_at": int(time.time()),
+            }
+        )
+
+        skeleton, messages = split_chat_messages(form_data.chat)
+
+        result = Chat(**{**chat.model_dump(), "chat": json.dumps(skeleton)})
+        db.add(result)
+        self._save_messages(db, id, messages)
+        self._index_chat(db, id, user_id, form_data.chat)
+        db.commit()
+        return chat if result else None
+
+    def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
+        with get_db() as db:
+            return self._insert_new_chat(db, user_id, form_data)
+
+    async def insert_new_chat_async(
+        self, user_id: str, form_data: ChatForm
+    ) -> Optional[ChatModel]:
+        return await run_async_db(self._insert_new_chat, user_id, form_data)
+
+    def _update_chat_by_id(self, db, id: str, chat: dict) -> Optional[ChatModel]:
+        chat_obj = db.get(Chat, id)
+        skeleton, messages = split_chat_messages(chat)
+
+        self._save_messages(db, id, messages)
+        self._queue_chat_index(id, chat_obj.user_id)
+        chat_obj.chat = json.dumps(skeleton)
+        chat_obj.title = chat["title"] if "title" in chat else "New Chat"
+        chat_obj.updated_at = int(time.time())
+        db.commit()
+        db.refresh(chat_obj)
+
+        return ChatModel.model_validate(chat_obj).model_copy(
+            update={"chat": json.dumps(chat)}
+        )
 
     def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
         try:
             with get_db() as db:
+                return self._update_chat_by_id(db, id, chat)
+        except Exception as e:
+            return None
 
-                chat_obj = db.get(Chat, id)
-                chat_obj.chat = json.dumps(chat)
-                chat_obj.title = chat["title"] if "title" in chat else "New Chat"
-                chat_obj.updated_at = int(time.time())
-                db.commit()
-                db.refresh(chat_obj)
-
-                return ChatModel.model_validate(chat_obj)
+    async def update_chat_by_id_async(self, id: str, chat: dict) -> Optional[ChatModel]:
+        try:
+            return await run_async_db(self._update_chat_by_id, id, chat)
         except Exception as e:
             return None
 
@@ -132,15 +448,19 @@ class ChatTable:
                     "id": str(uuid.uuid4()),
                     "user_id": f"shared-{chat_id}",
                     "title": chat.title,
-                    "chat": chat.chat,
+                    "chat": self._to_chat_model(db, chat).chat,
                     "created_at": chat.created_at,
                     "updated_at": int(time.time()),
                 }
             )
-            shared_result = Chat(**shared_chat.model_dump())
+            skeleton, messages = split_chat_messages(json.loads(shared_chat.chat))
+
+            shared_result = Chat(
+                **{**shared_chat.model_dump(), "chat": json.dumps(skeleton)}
+            )
             db.add(shared_result)
+            self._save_messages(db, shared_chat.id, messages)
             db.commit()
-            db.refresh(shared_result)
 
             # Update the original chat with the share_id
             result = (
@@ -171,6 +491,11 @@ class ChatTable:
         try:
             with get_db() as db:
 
+                shared_chat_ids = [
+                    chat.id
+                    for chat in db.query(Chat.id).filter_by(user_id=f"shared-{chat_id}")
+                ]
+                self._delete_messages(db, shared_chat_ids)
                 db.query(Chat).filter_by(user_id=f"shared-{chat_id}").delete()
                 db.commit()
 
@@ -188,7 +513,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except:
             return None
 
@@ -200,7 +525,7 @@ class ChatTable:
                 chat.archived = not chat.archived
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_model(db, chat)
         except:
             return None
 
@@ -215,17 +540,33 @@ class ChatTable:
 
     def get_archived_chat_list_by_user_id(
         self, user_id: str, skip: int = 0, limit: int = 50
-    ) -> List[ChatModel]:
+    ) -> List[ChatTitleIdResponse]:
         with get_db() as db:
 
             all_chats = (
-                db.query(Chat)
+                db.query(Chat.id, Chat.title, Chat.updated_at, Chat.created_at)
                 .filter_by(user_id=user_id, archived=True)
-                .order_by(Chat.updated_at.desc())
+                .order_by(Chat.updated_at.desc(), Chat.id.desc())
                 # .limit(limit).offset(skip)
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return [ChatTitleIdResponse(**chat._mapping) for chat in all_chats]
+
+    def _get_chat_list_by_user_id(
+        self, db, user_id: str, include_archived: bool = False
+    ) -> List[ChatTitleIdResponse]:
+        # Only the summary columns, the chat JSON is never loaded for lists
+        query = db.query(
+            Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+        ).filter_by(user_id=user_id)
+        if not include_archived:
+            query = query.filter_by(archived=False)
+        all_chats = (
+            query.order_by(Chat.updated_at.desc(), Chat.id.desc())
+            # .limit(limit).offset(skip)
+            .all()
+        )
+        return [ChatTitleIdResponse(**chat._mapping) for chat in all_chats]
 
     def get_chat_list_by_user_id(
         self,
@@ -233,37 +574,117 @@ class ChatTable:
         include_archived: bool = False,
         skip: int = 0,
         limit: int = 50,
-    ) -> List[ChatModel]:
+    ) -> List[ChatTitleIdResponse]:
         with get_db() as db:
-            query = db.query(Chat).filter_by(user_id=user_id)
-            if not include_archived:
-                query = query.filter_by(archived=False)
-            all_chats = (
-                query.order_by(Chat.updated_at.desc())
-                # .limit(limit).offset(skip)
-                .all()
+            return self._get_chat_list_by_user_id(db, user_id, include_archived)
+
+    async def get_chat_list_by_user_id_async(
+        self,
+        user_id: str,
+        include_archived: bool = False,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> List[ChatTitleIdResponse]:
+        return await run_async_db(
+            self._get_chat_list_by_user_id, user_id, include_archived
+        )
+
+    def _get_chat_list_page_by_user_id(
+        self,
+        db,
+        user_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_archived: bool = False,
+    ) -> ChatListPageResponse:
+        query = db.query(
+            Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+        ).filter_by(user_id=user_id)
+        if not include_archived:
+            query = query.filter_by(archived=False)
+
+        if cursor:
+            updated_at, id = decode_chat_list_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Chat.updated_at < updated_at,
+                    and_(Chat.updated_at == updated_at, Chat.id < id),
+                )
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+
+        # Fetch one extra row to know whether there is a next page
+        rows = (
+            query.order_by(Chat.updated_at.desc(), Chat.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+
+        chats = [ChatTitleIdResponse(**row._mapping) for row in rows[:limit]]
+        next_cursor = (
+            encode_chat_list_cursor(chats[-1].updated_at, chats[-1].id)
+            if len(rows) > limit
+            else None
+        )
+        return ChatListPageResponse(chats=chats, next_cursor=next_cursor)
+
+    def get_chat_list_page_by_user_id(
+        self,
+        user_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_archived: bool = False,
+    ) -> ChatListPageResponse:
+        """
+        Keyset-paginated chat list ordered by (updated_at, id) descending.
+        Raises ValueError for an invalid cursor.
+        """
+        with get_db() as db:
+            return self._get_chat_list_page_by_user_id(
+                db, user_id, cursor, limit, include_archived
+            )
+
+    async def get_chat_list_page_by_user_id_async(
+        self,
+        user_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_archived: bool = False,
+    ) -> ChatListPageResponse:
+        return await run_async_db(
+            self._get_chat_list_page_by_user_id,
+            user_id,
+            cursor,
+            limit,
+            include_archived,
+        )
 
     def get_chat_list_by_chat_ids(
         self, chat_ids: List[str], skip: int = 0, limit: int = 50
-    ) -> List[ChatModel]:
+    ) -> List[ChatTitleIdResponse]:
         with get_db() as db:
             all_chats = (
-                db.query(Chat)
+                db.query(Chat.id, Chat.title, Chat.updated_at, Chat.created_at)
                 .filter(Chat.id.in_(chat_ids))
                 .filter_by(archived=False)
-                .order_by(Chat.updated_at.desc())
+                .order_by(Chat.updated_at.desc(), Chat.id.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return [ChatTitleIdResponse(**chat._mapping) for chat in all_chats]
+
+    def _get_chat_by_id(self, db, id: str) -> Optional[ChatModel]:
+        chat = db.get(Chat, id)
+        return self._to_chat_model(db, chat)
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
+                return self._get_chat_by_id(db, id)
+        except:
+            return None
 
-                chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+    async def get_chat_by_id_async(self, id: str) -> Optional[ChatModel]:
+        try:
+            return await run_async_db(self._get_chat_by_id, id)
         except:
             return None
 
@@ -280,12 +701,24 @@ class ChatTable:
         except Exception as e:
             return None
 
+    def _get_chat_by_id_and_user_id(
+        self, db, id: str, user_id: str
+    ) -> Optional[ChatModel]:
+        chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
+        return self._to_chat_model(db, chat)
+
     def get_chat_by_id_and_user_id(self, id: str, user_id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
+                return self._get_chat_by_id_and_user_id(db, id, user_id)
+        except:
+            return None
 
-                chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+    async def get_chat_by_id_and_user_id_async(
+        self, id: str, user_id: str
+    ) -> Optional[ChatModel]:
+        try:
+            return await run_async_db(self._get_chat_by_id_and_user_id, id, user_id)
         except:
             return None
 
@@ -297,7 +730,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_chats_by_user_id(self, user_id: str) -> List[ChatModel]:
         with get_db() as db:
@@ -307,7 +740,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def get_archived_chats_by_user_id(self, user_id: str) -> List[ChatModel]:
         with get_db() as db:
@@ -317,12 +750,14 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats.all())
 
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
 
+                self._delete_messages(db, [id])
+                SearchIndex.delete(db, SearchEntityType.CHAT, [id])
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -334,7 +769,9 @@ class ChatTable:
         try:
             with get_db() as db:
 
-                db.query(Chat).filter_by(id=id, user_id=user_id).delete()
+                if db.query(Chat).filter_by(id=id, user_id=user_id).delete():
+                    self._delete_messages(db, [id])
+                    SearchIndex.delete(db, SearchEntityType.CHAT, [id])
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -348,6 +785,10 @@ class ChatTable:
 
                 self.delete_shared_chats_by_user_id(user_id)
 
+                self._delete_messages(
+                    db, db.query(Chat.id).filter_by(user_id=user_id).scalar_subquery()
+                )
+                SearchIndex.delete_by_user_id(db, SearchEntityType.CHAT, user_id)
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -360,9 +801,15 @@ class ChatTable:
 
             with get_db() as db:
 
-                chats_by_user = db.query(Chat).filter_by(user_id=user_id).all()
+                chats_by_user = db.query(Chat.id).filter_by(user_id=user_id).all()
                 shared_chat_ids = [f"shared-{chat.id}" for chat in chats_by_user]
 
+                self._delete_messages(
+                    db,
+                    db.query(Chat.id)
+                    .filter(Chat.user_id.in_(shared_chat_ids))
+                    .scalar_subquery(),
+                )
                 db.query(Chat).filter(Chat.user_id.in_(shared_chat_ids)).delete()
                 db.commit()
 
@@ -6,6 +6,11 @@ import logging
 from sqlalchemy import String, Column, BigInteger, Text
 
 from apps.webui.internal.db import Base, get_db
+from apps.webui.models.search import (
+    SearchIndex,
+    SearchEntityType,
+    get_document_search_text,
+)
 
 import json
 
@@ -71,6 +76,14 @@ class DocumentForm(DocumentUpdateForm):
 
 class DocumentsTable:
 
+    def _index_doc(self, db, name: str, title: str):
+        SearchIndex.index(
+            db,
+            SearchEntityType.DOCUMENT,
+            name,
+            *get_document_search_text(title, name),
+        )
+
     def insert_new_doc(
         self, user_id: str, form_data: DocumentForm
     ) -> Optional[DocumentModel]:
@@ -87,6 +100,7 @@ class DocumentsTable:
             try:
                 result = Document(**document.model_dump())
                 db.add(result)
+                self._index_doc(db, document.name, document.title)
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -125,6 +139,8 @@ class DocumentsTable:
                         "timestamp": int(time.time()),
                     }
                 )
+                SearchIndex.delete(db, SearchEntityType.DOCUMENT, [name])
+                self._index_doc(db, form_data.name, form_data.title)
                 db.commit()
                 return self.get_doc_by_name(form_data.name)
         except Exception as e:
@@ -158,6 +174,7 @@ class DocumentsTable:
             with get_db() as db:
 
                 db.query(Document).filter_by(name=name).delete()
+                SearchIndex.delete(db, SearchEntityType.DOCUMENT, [name])
                 db.commit()
                 return True
         except:
@@ -5,7 +5,7 @@ import logging
 
 from sqlalchemy import Column, String, Text, BigInteger, Boolean
 
-from apps.webui.internal.db import JSONField, Base, get_db
+from apps.webui.internal.db import JSONField, Base, get_db, run_async_db
 from apps.webui.models.users import Users
 
 import json
@@ -116,28 +116,42 @@ class FunctionsTable:
             print(f"Error creating tool: {e}")
             return None
 
+    def _get_function_by_id(self, db, id: str) -> Optional[FunctionModel]:
+        function = db.get(Function, id)
+        return FunctionModel.model_validate(function)
+
     def get_function_by_id(self, id: str) -> Optional[FunctionModel]:
         try:
             with get_db() as db:
+                return self._get_function_by_id(db, id)
+        except:
+            return None
 
-                function = db.get(Function, id)
-                return FunctionModel.model_validate(function)
+    async def get_function_by_id_async(self, id: str) -> Optional[FunctionModel]:
+        try:
+            return await run_async_db(self._get_function_by_id, id)
         except:
             return None
 
+    def _get_functions(self, db, **kwargs) -> List[FunctionModel]:
+        return [
+            FunctionModel.model_validate(function)
+            for function in db.query(Function).filter_by(**kwargs).all()
+        ]
+
     def get_functions(self, active_only=False) -> List[FunctionModel]:
         with get_db() as db:
 
             if active_only:
-                return [
-                    FunctionModel.model_validate(function)
-                    for function in db.query(Function).filter_by(is_active=True).all()
-                ]
+                return self._get_functions(db, is_active=True)
             else:
-                return [
-                    FunctionModel.model_validate(function)
-                    for function in db.query(Function).all()
-                ]
+                return self._get_functions(db)
+
+    async def get_functions_async(self, active_only=False) -> List[FunctionModel]:
+        if active_only:
+            return await run_async_db(self._get_functions, is_active=True)
+        else:
+            return await run_async_db(self._get_functions)
 
     def get_functions_by_type(
         self, type: str, active_only=False
@@ -145,36 +159,39 @@ class FunctionsTable:
         with get_db() as db:
 
             if active_only:
-                return [
-                    FunctionModel.model_validate(function)
-                    for function in db.query(Function)
-                    .filter_by(type=type, is_active=True)
-                    .all()
-                ]
+                return self._get_functions(db, type=type, is_active=True)
             else:
-                return [
-                    FunctionModel.model_validate(function)
-                    for function in db.query(Function).filter_by(type=type).all()
-                ]
+                return self._get_functions(db, type=type)
+
+    async def get_functions_by_type_async(
+        self, type: str, active_only=False
+    ) -> List[FunctionModel]:
+        if active_only:
+            return await run_async_db(self._get_functions, type=type, is_active=True)
+        else:
+            return await run_async_db(self._get_functions, type=type)
 
     def get_global_filter_functions(self) -> List[FunctionModel]:
         with get_db() as db:
+            return self._get_functions(
+                db, type="filter", is_active=True, is_global=True
+            )
 
-            return [
-                FunctionModel.model_validate(function)
-                for function in db.query(Function)
-                .filter_by(type="filter", is_active=True, is_global=True)
-                .all()
-            ]
+    async def get_global_filter_functions_async(self) -> List[FunctionModel]:
+        return await run_async_db(
+            self._get_functions, type="filter", is_active=True, is_global=True
+        )
 
     def get_global_action_functions(self) -> List[FunctionModel]:
         with get_db() as db:
-            return [
-                FunctionModel.model_validate(function)
-                for function in db.query(Function)
-                .filter_by(type="action", is_active=True, is_global=True)
-                .all()
-            ]
+            return self._get_functions(
+                db, type="action", is_active=True, is_global=True
+            )
+
+    async def get_global_action_functions_async(self) -> List[FunctionModel]:
+        return await run_async_db(
+            self._get_functions, type="action", is_active=True, is_global=True
+        )
 
     def get_function_valves_by_id(self, id: str) -> Optional[dict]:
         with get_db() as db:
@@ -5,7 +5,7 @@ from typing import Optional
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import String, Column, BigInteger, Text
 
-from apps.webui.internal.db import Base, JSONField, get_db
+from apps.webui.internal.db import Base, JSONField, get_db, run_async_db
 
 from typing import List, Union, Optional
 from config import SRC_LOG_LEVELS
@@ -142,17 +142,30 @@ class ModelsTable:
             print(e)
             return None
 
+    def _get_all_models(self, db) -> List[ModelModel]:
+        return [ModelModel.model_validate(model) for model in db.query(Model).all()]
+
     def get_all_models(self) -> List[ModelModel]:
         with get_db() as db:
+            return self._get_all_models(db)
+
+    async def get_all_models_async(self) -> List[ModelModel]:
+        return await run_async_db(self._get_all_models)
 
-            return [ModelModel.model_validate(model) for model in db.query(Model).all()]
+    def _get_model_by_id(self, db, id: str) -> Optional[ModelModel]:
+        model = db.get(Model, id)
+        return ModelModel.model_validate(model)
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
             with get_db() as db:
+                return self._get_model_by_id(db, id)
+        except:
+            return None
 
-                model = db.get(Model, id)
-                return ModelModel.model_validate(model)
+    async def get_model_by_id_async(self, id: str) -> Optional[ModelModel]:
+        try:
+            return await run_async_db(self._get_model_by_id, id)
         except:
             return None
 
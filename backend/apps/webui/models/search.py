@@ -0,0 +1,384 @@
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
+from enum import Enum as PyEnum
+import hashlib
+import logging
+import re
+
+from sqlalchemy import text
+
+from apps.webui.internal.db import get_db
+
+from config import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Search Index DB Schema
+#
+# A single search_index table holds (entity_type, entity_id, user_id, title,
+# body) rows. On SQLite it is an FTS5 virtual table ranked with bm25, on
+# Postgres a regular table with a weighted tsvector column and a GIN index
+# ranked with ts_rank. FTS5 rows are keyed by a rowid derived from
+# (entity_type, entity_id), so replacing an entry never scans the index. The
+# table is created by the alembic migrations, see SEARCH_INDEX_DDL.
+####################
+
+SEARCH_INDEX_TABLE = "search_index"
+
+SEARCH_INDEX_DDL = {
+    "sqlite": [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} USING fts5(
+            entity_type UNINDEXED,
+            entity_id UNINDEXED,
+            user_id UNINDEXED,
+            title,
+            body,
+            tokenize = 'porter unicode61'
+        )
+        """,
+    ],
+    "postgresql": [
+        f"""
+        CREATE TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} (
+            entity_type VARCHAR NOT NULL,
+            entity_id VARCHAR NOT NULL,
+            user_id VARCHAR,
+            title TEXT,
+            body TEXT,
+            tsv TSVECTOR,
+            PRIMARY KEY (entity_type, entity_id)
+        )
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_TABLE}_tsv_idx
+        ON {SEARCH_INDEX_TABLE} USING GIN (tsv)
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_TABLE}_user_id_idx
+        ON {SEARCH_INDEX_TABLE} (entity_type, user_id)
+        """,
+    ],
+}
+
+# Title matches rank above body matches
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+SNIPPET_WORDS = 16
+
+# Keeps IN (...) lists under the bound parameter limit of older SQLite builds
+DELETE_BATCH_SIZE = 500
+
+
+class SearchEntityType(str, PyEnum):
+    CHAT = "chat"
+    ARTICLE = "article"
+    DOCUMENT = "document"
+
+
+####################
+# Forms
+####################
+
+
+class SearchResultModel(BaseModel):
+    type: SearchEntityType
+    id: str
+    title: Optional[str] = None
+    snippet: Optional[str] = None
+    rank: float
+
+
+class SearchResultsResponse(BaseModel):
+    results: List[SearchResultModel]
+    has_more: bool
+
+
+####################
+# Indexed Text
+####################
+
+
+def _collect_text(value) -> List[str]:
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in _collect_text(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in _collect_text(item)]
+    return []
+
+
+def get_chat_search_text(chat: dict) -> Tuple[str, str]:
+    """
+    Return the (title, body) indexed for a chat JSON: its title and the text
+    content of every message in the history.
+    """
+    history = chat.get("history") if isinstance(chat.get("history"), dict) else {}
+    messages = history.get("messages")
+    if isinstance(messages, dict):
+        messages = list(messages.values())
+    elif not isinstance(messages, list):
+        messages = (
+            chat.get("messages") if isinstance(chat.get("messages"), list) else []
+        )
+
+    body = [
+        message["content"]
+        for message in messages
+        if isinstance(message, dict) and isinstance(message.get("content"), str)
+    ]
+    return chat.get("title", "New Chat"), "\n".join(body)
+
+
+def get_article_search_text(
+    title: str, objective: Optional[str], steps: Optional[list]
+) -> Tuple[str, str]:
+    return title, "\n".join([objective or "", *_collect_text(steps or [])])
+
+
+def get_document_search_text(title: str, name: str) -> Tuple[str, str]:
+    return title, name
+
+
+def get_fts5_rowid(type: SearchEntityType, id: str) -> int:
+    digest = hashlib.sha256(f"{type.value}:{id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def build_fts5_query(query: str) -> str:
+    """
+    Quote every word of a free text query for FTS5 MATCH so that user input is
+    never parsed as FTS5 syntax. The last word matches as a prefix.
+    """
+    terms = [f'"{term}"' for term in re.findall(r"\w[\w'-]*", query)]
+    if not terms:
+        return ""
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+####################
+# Search Index
+####################
+
+
+class SearchIndexTable:
+
+    def _dialect(self, db) -> str:
+        return db.get_bind().dialect.name
+
+    def index(
+        self,
+        db,
+        type: SearchEntityType,
+        id: str,
+        title: str,
+        body: str,
+        user_id: Optional[str] = None,
+    ):
+        """
+        Add or replace the entry of an entity within the caller's transaction.
+        Indexing errors are logged and never fail the write they belong to.
+        """
+        self.index_many(db, type, [(id, title, body, user_id)])
+
+    def index_many(
+        self,
+        db,
+        type: SearchEntityType,
+        entries: List[Tuple[str, str, str, Optional[str]]],
+    ):
+        """
+        Add or replace many (id, title, body, user_id) entries at once, with a
+        single executemany.
+        """
+        if len(entries) == 0:
+            return
+        try:
+            with db.begin_nested():
+                params = [
+                    {
+                        "entity_type": type.value,
+                        "entity_id": id,
+                        "user_id": user_id,
+                        "title": title or "",
+                        "body": body or "",
+                    }
+                    for id, title, body, user_id in entries
+                ]
+                if self._dialect(db) == "postgresql":
+                    db.execute(
+                        text(
+                            f"""
+                            INSERT INTO {SEARCH_INDEX_TABLE}
+                                (entity_type, entity_id, user_id, title, body, tsv)
+                            VALUES (
+                                :entity_type, :entity_id, :user_id, :title, :body,
+                                setweight(to_tsvector('english', :title), 'A')
+                                || setweight(to_tsvector('english', :body), 'B')
+                            )
+                            ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+                                user_id = EXCLUDED.user_id,
+                                title = EXCLUDED.title,
+                                body = EXCLUDED.body,
+                                tsv = EXCLUDED.tsv
+                            """
+                        ),
+                        params,
+                    )
+                else:
+                    self._delete(db, type, [entry[0] for entry in entries])
+                    db.execute(
+                        text(
+                            f"""
+                            INSERT INTO {SEARCH_INDEX_TABLE}
+                                (rowid, entity_type, entity_id, user_id, title, body)
+                            VALUES (
+                                :rowid, :entity_type, :entity_id, :user_id, :title, :body
+                            )
+                            """
+                        ),
+                        [
+                            {**row, "rowid": get_fts5_rowid(type, row["entity_id"])}
+                            for row in params
+                        ],
+                    )
+        except Exception as e:
+            log.exception(f"Failed to index {len(entries)} {type.value} entries: {e}")
+
+    def _delete(self, db, type: SearchEntityType, ids: List[str]):
+        for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[offset : offset + DELETE_BATCH_SIZE]
+            if self._dialect(db) == "postgresql":
+                params = {f"id_{idx}": id for idx, id in enumerate(batch)}
+                column = "entity_id"
+            else:
+                params = {
+                    f"id_{idx}": get_fts5_rowid(type, id)
+                    for idx, id in enumerate(batch)
+                }
+                column = "rowid"
+            db.execute(
+                text(
+                    f"""
+                    DELETE FROM {SEARCH_INDEX_TABLE}
+                    WHERE entity_type = :entity_type
+                    AND {column} IN ({", ".join(f":{key}" for key in params)})
+                    """
+                ),
+                {"entity_type": type.value, **params},
+            )
+
+    def delete(self, db, type: SearchEntityType, ids: List[str]):
+        try:
+            with db.begin_nested():
+                self._delete(db, type, ids)
+        except Exception as e:
+            log.exception(f"Failed to remove {type.value} entries from index: {e}")
+
+    def delete_by_user_id(self, db, type: SearchEntityType, user_id: str):
+        try:
+            with db.begin_nested():
+                db.execute(
+                    text(
+                        f"""
+                        DELETE FROM {SEARCH_INDEX_TABLE}
+                        WHERE entity_type = :entity_type AND user_id = :user_id
+                        """
+                    ),
+                    {"entity_type": type.value, "user_id": user_id},
+                )
+        except Exception as e:
+            log.exception(f"Failed to remove {type.value} entries from index: {e}")
+
+    def delete_all(self, db, type: SearchEntityType):
+        try:
+            with db.begin_nested():
+                db.execute(
+                    text(
+                        f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE entity_type = :entity_type"
+                    ),
+                    {"entity_type": type.value},
+                )
+        except Exception as e:
+            log.exception(f"Failed to remove {type.value} entries from index: {e}")
+
+    def search(
+        self,
+        type: SearchEntityType,
+        query: str,
+        user_id: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20,
+    ) -> SearchResultsResponse:
+        """
+        Ranked full-text search over one entity type, optionally restricted to
+        the entries of a user.
+        """
+        with get_db() as db:
+            params = {
+                "entity_type": type.value,
+                "user_id": user_id,
+                # Fetch one extra row to know whether there is a next page
+                "limit": limit + 1,
+                "skip": skip,
+            }
+            user_filter = "AND user_id = :user_id" if user_id is not None else ""
+
+            if self._dialect(db) == "postgresql":
+                if not query.strip():
+                    return SearchResultsResponse(results=[], has_more=False)
+                params["query"] = query
+                params["headline_options"] = (
+                    f"MaxWords={SNIPPET_WORDS}, MinWords=5, MaxFragments=1"
+                )
+                statement = f"""
+                    SELECT entity_id, title, rank,
+                        ts_headline('english', body, tsquery, :headline_options) AS snippet
+                    FROM (
+                        SELECT entity_id, title, body, tsquery,
+                            ts_rank(tsv, tsquery) AS rank
+                        FROM {SEARCH_INDEX_TABLE},
+                            websearch_to_tsquery('english', :query) AS tsquery
+                        WHERE tsv @@ tsquery
+                        AND entity_type = :entity_type {user_filter}
+                        ORDER BY rank DESC, entity_id
+                        LIMIT :limit OFFSET :skip
+                    ) AS matches
+                    ORDER BY rank DESC, entity_id
+                """
+            else:
+                params["query"] = build_fts5_query(query)
+                if not params["query"]:
+                    return SearchResultsResponse(results=[], has_more=False)
+                # bm25 is lower-is-better, negate it so rank is higher-is-better
+                statement = f"""
+                    SELECT entity_id, title,
+                        -bm25({SEARCH_INDEX_TABLE}, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank,
+                        snippet({SEARCH_INDEX_TABLE}, 4, '', '', '...', {SNIPPET_WORDS}) AS snippet
+                    FROM {SEARCH_INDEX_TABLE}
+                    WHERE {SEARCH_INDEX_TABLE} MATCH :query
+                    AND entity_type = :entity_type {user_filter}
+                    ORDER BY rank DESC, entity_id
+                    LIMIT :limit OFFSET :skip
+                """
+
+            rows = db.execute(text(statement), params).all()
+            results = [
+                SearchResultModel(
+                    type=type,
+                    id=row.entity_id,
+                    title=row.title,
+                    snippet=row.snippet,
+                    rank=row.rank,
+                )
+                for row in rows[:limit]
+            ]
+            return SearchResultsResponse(results=results, has_more=len(rows) > limit)
+
+
+SearchIndex = SearchIndexTable()
@@ -6,7 +6,8 @@ import uuid
 import time
 import logging
 
-from sqlalchemy import String, Column, BigInteger, Text
+from sqlalchemy import String, Column, BigInteger, Text, Index, and_, func
+from sqlalchemy.exc import IntegrityError
 
 from apps.webui.internal.db import Base, get_db
 
@@ -27,6 +28,10 @@ class Tag(Base):
     name = Column(String)
     user_id = Column(String)
     data = Column(Text, nullable=True)
+    # Number of chats tagged with this tag, kept in sync by TagTable
+    chat_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (Index("tag_user_id_name_idx", "user_id", "name", unique=True),)
 
 
 class ChatIdTag(Base):
@@ -38,12 +43,18 @@ class ChatIdTag(Base):
     user_id = Column(String)
     timestamp = Column(BigInteger)
 
+    __table_args__ = (
+        Index("chatidtag_user_id_tag_name_idx", "user_id", "tag_name"),
+        Index("chatidtag_user_id_chat_id_idx", "user_id", "chat_id"),
+    )
+
 
 class TagModel(BaseModel):
     id: str
     name: str
     user_id: str
     data: Optional[str] = None
+    chat_count: int = 0
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -108,51 +119,57 @@ class TagTable:
     def add_tag_to_chat(
         self, user_id: str, form_data: ChatIdTagForm
     ) -> Optional[ChatIdTagModel]:
-        tag = self.get_tag_by_name_and_user_id(form_data.tag_name, user_id)
-        if tag == None:
-            tag = self.insert_new_tag(form_data.tag_name, user_id)
-
-        id = str(uuid.uuid4())
-        chatIdTag = ChatIdTagModel(
-            **{
-                "id": id,
-                "user_id": user_id,
-                "chat_id": form_data.chat_id,
-                "tag_name": tag.name,
-                "timestamp": int(time.time()),
-            }
-        )
         try:
             with get_db() as db:
-                result = ChatIdTag(**chatIdTag.model_dump())
+                tag = (
+                    db.query(Tag)
+                    .filter_by(name=form_data.tag_name, user_id=user_id)
+                    .first()
+                )
+                if tag is None:
+                    try:
+                        with db.begin_nested():
+                            tag = Tag(
+                                id=str(uuid.uuid4()),
+                                name=form_data.tag_name,
+                                user_id=user_id,
+                                chat_count=0,
+                            )
+                            db.add(tag)
+                    except IntegrityError:
+                        # Created meanwhile by a concurrent request
+                        tag = (
+                            db.query(Tag)
+                            .filter_by(name=form_data.tag_name, user_id=user_id)
+                            .one()
+                        )
+
+                result = ChatIdTag(
+                    id=str(uuid.uuid4()),
+                    user_id=user_id,
+                    chat_id=form_data.chat_id,
+                    tag_name=tag.name,
+                    timestamp=int(time.time()),
+                )
                 db.add(result)
+                db.query(Tag).filter_by(id=tag.id).update(
+                    {"chat_count": Tag.chat_count + 1}
+                )
                 db.commit()
-                db.refresh(result)
-                if result:
-                    return ChatIdTagModel.model_validate(result)
-                else:
-                    return None
-        except:
+                return ChatIdTagModel.model_validate(result)
+        except Exception as e:
+            log.error(f"add_tag_to_chat: {e}")
             return None
 
     def get_tags_by_user_id(self, user_id: str) -> List[TagModel]:
         with get_db() as db:
-            tag_names = [
-                chat_id_tag.tag_name
-                for chat_id_tag in (
-                    db.query(ChatIdTag)
-                    .filter_by(user_id=user_id)
-                    .order_by(ChatIdTag.timestamp.desc())
-                    .all()
-                )
-            ]
-
+            # Served from the per-tag chat counts, chatidtag is not scanned
             return [
                 TagModel.model_validate(tag)
                 for tag in (
                     db.query(Tag)
-                    .filter_by(user_id=user_id)
-                    .filter(Tag.name.in_(tag_names))
+                    .filter(Tag.user_id == user_id, Tag.chat_count > 0)
+                    .order_by(Tag.name)
                     .all()
                 )
             ]
@@ -161,23 +178,19 @@ class TagTable:
         self, chat_id: str, user_id: str
     ) -> List[TagModel]:
         with get_db() as db:
-
-            tag_names = [
-                chat_id_tag.tag_name
-                for chat_id_tag in (
-                    db.query(ChatIdTag)
-                    .filter_by(user_id=user_id, chat_id=chat_id)
-                    .order_by(ChatIdTag.timestamp.desc())
-                    .all()
-                )
-            ]
-
             return [
                 TagModel.model_validate(tag)
                 for tag in (
                     db.query(Tag)
-                    .filter_by(user_id=user_id)
-                    .filter(Tag.name.in_(tag_names))
+                    .join(
+                        ChatIdTag,
+                        and_(
+                            ChatIdTag.user_id == Tag.user_id,
+                            ChatIdTag.tag_name == Tag.name,
+                        ),
+                    )
+                    .filter(ChatIdTag.user_id == user_id, ChatIdTag.chat_id == chat_id)
+                    .order_by(ChatIdTag.timestamp.desc())
                     .all()
                 )
             ]
@@ -208,6 +221,22 @@ class TagTable:
                 .count()
             )
 
+    def _decrement_chat_counts(self, db, user_id: str, tag_counts: dict):
+        """
+        Lower the chat count of each tag name by the number of removed chat
+        tags, dropping the tags no chat uses anymore.
+        """
+        for tag_name, count in tag_counts.items():
+            db.query(Tag).filter_by(name=tag_name, user_id=user_id).update(
+                {"chat_count": Tag.chat_count - count}
+            )
+        if len(tag_counts) > 0:
+            db.query(Tag).filter(
+                Tag.user_id == user_id,
+                Tag.name.in_(list(tag_counts.keys())),
+                Tag.chat_count <= 0,
+            ).delete(synchronize_session=False)
+
     def delete_tag_by_tag_name_and_user_id(self, tag_name: str, user_id: str) -> bool:
         try:
             with get_db() as db:
@@ -217,15 +246,10 @@ class TagTable:
                     .delete()
                 )
                 log.debug(f"res: {res}")
-                db.commit()
 
-                tag_count = self.count_chat_ids_by_tag_name_and_user_id(
-                    tag_name, user_id
-                )
-                if tag_count == 0:
-                    # Remove tag item from Tag col as well
-                    db.query(Tag).filter_by(name=tag_name, user_id=user_id).delete()
-                    db.commit()
+                # Every chat lost the tag, remove the tag item as well
+                db.query(Tag).filter_by(name=tag_name, user_id=user_id).delete()
+                db.commit()
                 return True
         except Exception as e:
             log.error(f"delete_tag: {e}")
@@ -243,15 +267,9 @@ class TagTable:
                     .delete()
                 )
                 log.debug(f"res: {res}")
-                db.commit()
 
-                tag_count = self.count_chat_ids_by_tag_name_and_user_id(
-                    tag_name, user_id
-                )
-                if tag_count == 0:
-                    # Remove tag item from Tag col as well
-                    db.query(Tag).filter_by(name=tag_name, user_id=user_id).delete()
-                    db.commit()
+                self._decrement_chat_counts(db, user_id, {tag_name: res})
+                db.commit()
 
                 return True
         except Exception as e:
@@ -259,14 +277,23 @@ class TagTable:
             return False
 
     def delete_tags_by_chat_id_and_user_id(self, chat_id: str, user_id: str) -> bool:
-        tags = self.get_tags_by_chat_id_and_user_id(chat_id, user_id)
+        try:
+            with get_db() as db:
+                tag_counts = dict(
+                    db.query(ChatIdTag.tag_name, func.count(ChatIdTag.id))
+                    .filter_by(chat_id=chat_id, user_id=user_id)
+                    .group_by(ChatIdTag.tag_name)
+                    .all()
+                )
+                db.query(ChatIdTag).filter_by(chat_id=chat_id, user_id=user_id).delete()
 
-        for tag in tags:
-            self.delete_tag_by_tag_name_and_chat_id_and_user_id(
-                tag.tag_name, chat_id, user_id
-            )
+                self._decrement_chat_counts(db, user_id, tag_counts)
+                db.commit()
 
-        return True
+                return True
+        except Exception as e:
+            log.error(f"delete_tags: {e}")
+            return False
 
 
 Tags = TagTable()
@@ -6,7 +6,7 @@ from sqlalchemy import String, Column, BigInteger, Text
 
 from utils.misc import get_gravatar_url
 
-from apps.webui.internal.db import Base, JSONField, Session, get_db
+from apps.webui.internal.db import Base, JSONField, Session, get_db, run_async_db
 from apps.webui.models.chats import Chats
 
 ####################
@@ -121,29 +121,46 @@ class UsersTable:
             else:
                 return None
 
+    def _get_user_by(self, db, **kwargs) -> Optional[UserModel]:
+        user = db.query(User).filter_by(**kwargs).first()
+        return UserModel.model_validate(user)
+
     def get_user_by_id(self, id: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
-                user = db.query(User).filter_by(id=id).first()
-                return UserModel.model_validate(user)
+                return self._get_user_by(db, id=id)
+        except Exception as e:
+            return None
+
+    async def get_user_by_id_async(self, id: str) -> Optional[UserModel]:
+        try:
+            return await run_async_db(self._get_user_by, id=id)
         except Exception as e:
             return None
 
     def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
+                return self._get_user_by(db, api_key=api_key)
+        except:
+            return None
 
-                user = db.query(User).filter_by(api_key=api_key).first()
-                return UserModel.model_validate(user)
+    async def get_user_by_api_key_async(self, api_key: str) -> Optional[UserModel]:
+        try:
+            return await run_async_db(self._get_user_by, api_key=api_key)
         except:
             return None
 
     def get_user_by_email(self, email: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
+                return self._get_user_by(db, email=email)
+        except:
+            return None
 
-                user = db.query(User).filter_by(email=email).first()
-                return UserModel.model_validate(user)
+    async def get_user_by_email_async(self, email: str) -> Optional[UserModel]:
+        try:
+            return await run_async_db(self._get_user_by, email=email)
         except:
             return None
 
@@ -202,17 +219,23 @@ class UsersTable:
         except:
             return None
 
+    def _update_user_last_active_by_id(self, db, id: str) -> Optional[UserModel]:
+        db.query(User).filter_by(id=id).update({"last_active_at": int(time.time())})
+        db.commit()
+
+        user = db.query(User).filter_by(id=id).first()
+        return UserModel.model_validate(user)
+
     def update_user_last_active_by_id(self, id: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
+                return self._update_user_last_active_by_id(db, id)
+        except:
+            return None
 
-                db.query(User).filter_by(id=id).update(
-                    {"last_active_at": int(time.time())}
-                )
-                db.commit()
-
-                user = db.query(User).filter_by(id=id).first()
-                return UserModel.model_validate(user)
+    async def update_user_last_active_by_id_async(self, id: str) -> Optional[UserModel]:
+        try:
+            return await run_async_db(self._update_user_last_active_by_id, id)
         except:
             return None
 
@@ -45,7 +45,7 @@ class ArticleStepsForm(BaseModel):
 
 @router.get("/")
 async def get_articles(skip: int = 0, limit: int = 50):
-    articles = Article_Table.get_articles(skip=skip, limit=limit)
+    articles = await Article_Table.get_articles_async(skip=skip, limit=limit)
     return articles
 
 
@@ -56,7 +56,7 @@ async def get_articles(skip: int = 0, limit: int = 50):
 
 @router.get("/series/{series_id}", response_model=List[ArticleModel])
 async def get_articles_by_series_id(series_id: str):
-    return Article_Table.get_articles_by_series_id(series_id)
+    return await Article_Table.get_articles_by_series_id_async(series_id)
 
 
 ################
@@ -66,7 +66,7 @@ async def get_articles_by_series_id(series_id: str):
 
 @router.get("/{id}", response_model=Optional[ArticleModel])
 async def get_article_by_id(id: str):
-    article = Article_Table.get_article_by_id(id)
+    article = await Article_Table.get_article_by_id_async(id)
 
     if article:
         return article
@@ -140,7 +140,7 @@ async def get_articles_by_user(user_id: str, user=Depends(get_current_user)):
 
 @router.post("/many", response_model=List[ArticleModel])
 async def get_many_articles_by_ids(form_data: ManyArticlesByIDs):
-    articles = Article_Table.get_many_articles_by_ids(form_data.ids)
+    articles = await Article_Table.get_many_articles_by_ids_async(form_data.ids)
     return articles
 
 
@@ -201,36 +201,16 @@ async def add_new_article(form_data: InsertNewArticleForm):
 
 @router.post("/add/bulk", response_model=Optional[List[ArticleModel]])
 async def bulk_add_new_article(form_data: BulkInsertNewArticleForm):
-    articles: List[ArticleModel] = []
-    for article_form in form_data.articles:
-        series = Series_Table.get_series_by_name(article_form.series_name)
-
-        if not series:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=ERROR_MESSAGES.SERIES_NOT_FOUND,
-            )
-        article_data = {
-            "title": article_form.title,
-            "document_id": article_form.document_id,
-            "url": article_form.url,
-            "category": article_form.category,
-            "objective": article_form.objective,
-            "introduction": article_form.introduction,
-            "applicable_devices": article_form.applicable_devices,
-            "steps": article_form.steps,
-            "series_id": series.id,
-        }
-        article = Article_Table.insert_new_article(**article_data)
-
-        if not article:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=ERROR_MESSAGES.DEFAULT(),
-            )
-        articles.append(article)
-
-    return articles
+    try:
+        return Article_Table.insert_new_articles(
+            [article_form.model_dump() for article_form in form_data.articles]
+        )
+    except ValueError as e:
+        log.error(e)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=ERROR_MESSAGES.SERIES_NOT_FOUND,
+        )
 
 
 ################
@@ -242,7 +222,7 @@ async def bulk_add_new_article(form_data: BulkInsertNewArticleForm):
 async def update_article_by_id(
     id: str, form_data: ArticleForm, user=Depends(get_verified_user)
 ):
-    article = Article_Table.get_article_by_id(id)
+    article = await Article_Table.get_article_by_id_async(id)
     log.debug(f"Article: {article.title}")
     if article:
         updated = {**article.model_dump(), **form_data.article}
@@ -274,7 +254,7 @@ async def update_article_by_id(
 async def update_article_steps_by_id(
     id: str, form_data: ArticleStepsForm, user=Depends(get_verified_user)
 ):
-    article = Article_Table.get_article_by_id(id)
+    article = await Article_Table.get_article_by_id_async(id)
     if article:
         updated_article_steps = {
             **article.steps[form_data.step_index],
@@ -363,7 +343,7 @@ async def generate_new_article(
 
 @router.delete("/{id}")
 async def delete_article_by_id(id: str, user=Depends(get_admin_user)):
-    article = Article_Table.get_article_by_id(id)
+    article = await Article_Table.get_article_by_id_async(id)
     if article:
         Article_Table.delete_article_by_id(id)
         return {"message": "Article deleted successfully"}
@@ -418,7 +398,7 @@ async def update_articles(
     form_data: UpdateArticlePublishedField, user=Depends(get_current_user)
 ):
     print(user)
-    articles = Article_Table.get_articles(skip=0, limit=10000)
+    articles = await Article_Table.get_articles_async(skip=0, limit=10000)
     updated_articles = []
     for article in articles:
         updated = Article_Table.update_article_by_id(article.id, {"published": True})
@@ -14,6 +14,7 @@ from apps.webui.models.chats import (
     ChatTitleForm,
     ChatForm,
     ChatTitleIdResponse,
+    ChatListPageResponse,
     Chats,
 )
 
@@ -45,7 +46,27 @@ router = APIRouter()
 async def get_session_user_chat_list(
     user=Depends(get_verified_user), skip: int = 0, limit: int = 50
 ):
-    return Chats.get_chat_list_by_user_id(user.id, skip, limit)
+    return await Chats.get_chat_list_by_user_id_async(user.id, skip=skip, limit=limit)
+
+
+############################
+# GetChatListPage
+############################
+
+
+@router.get("/list/page", response_model=ChatListPageResponse)
+async def get_session_user_chat_list_page(
+    user=Depends(get_verified_user), cursor: Optional[str] = None, limit: int = 50
+):
+    try:
+        return await Chats.get_chat_list_page_by_user_id_async(
+            user.id, cursor=cursor, limit=max(1, min(limit, 1000))
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.INVALID_CURSOR,
+        )
 
 
 ############################
@@ -81,7 +102,7 @@ async def get_user_chat_list_by_user_id(
     skip: int = 0,
     limit: int = 50,
 ):
-    return Chats.get_chat_list_by_user_id(
+    return await Chats.get_chat_list_by_user_id_async(
         user_id, include_archived=True, skip=skip, limit=limit
     )
 
@@ -94,7 +115,7 @@ async def get_user_chat_list_by_user_id(
 @router.post("/new", response_model=Optional[ChatResponse])
 async def create_new_chat(form_data: ChatForm, user=Depends(get_verified_user)):
     try:
-        chat = Chats.insert_new_chat(user.id, form_data)
+        chat = await Chats.insert_new_chat_async(user.id, form_data)
         return ChatResponse(**{**chat.model_dump(), "chat": json.loads(chat.chat)})
     except Exception as e:
         log.exception(e)
@@ -184,7 +205,7 @@ async def get_shared_chat_by_id(share_id: str, user=Depends(get_verified_user)):
     if user.role == "user":
         chat = Chats.get_chat_by_share_id(share_id)
     elif user.role == "admin":
-        chat = Chats.get_chat_by_id(share_id)
+        chat = await Chats.get_chat_by_id_async(share_id)
 
     if chat:
         return ChatResponse(**{**chat.model_dump(), "chat": json.loads(chat.chat)})
@@ -249,7 +270,7 @@ async def get_all_tags(user=Depends(get_verified_user)):
 
 @router.get("/{id}", response_model=Optional[ChatResponse])
 async def get_chat_by_id(id: str, user=Depends(get_verified_user)):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
 
     if chat:
         log.info(f"get_chat_by_id: {chat.model_dump()}")
@@ -269,11 +290,11 @@ async def get_chat_by_id(id: str, user=Depends(get_verified_user)):
 async def update_chat_by_id(
     id: str, form_data: ChatForm, user=Depends(get_verified_user)
 ):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
     if chat:
         updated_chat = {**json.loads(chat.chat), **form_data.chat}
 
-        chat = Chats.update_chat_by_id(id, updated_chat)
+        chat = await Chats.update_chat_by_id_async(id, updated_chat)
         return ChatResponse(**{**chat.model_dump(), "chat": json.loads(chat.chat)})
     else:
         raise HTTPException(
@@ -311,7 +332,7 @@ async def delete_chat_by_id(request: Request, id: str, user=Depends(get_verified
 
 @router.get("/{id}/clone", response_model=Optional[ChatResponse])
 async def clone_chat_by_id(id: str, user=Depends(get_verified_user)):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
     if chat:
 
         chat_body = json.loads(chat.chat)
@@ -322,7 +343,9 @@ async def clone_chat_by_id(id: str, user=Depends(get_verified_user)):
             "title": f"Clone of {chat.title}",
         }
 
-        chat = Chats.insert_new_chat(user.id, ChatForm(**{"chat": updated_chat}))
+        chat = await Chats.insert_new_chat_async(
+            user.id, ChatForm(**{"chat": updated_chat})
+        )
         return ChatResponse(**{**chat.model_dump(), "chat": json.loads(chat.chat)})
     else:
         raise HTTPException(
@@ -337,7 +360,7 @@ async def clone_chat_by_id(id: str, user=Depends(get_verified_user)):
 
 @router.get("/{id}/archive", response_model=Optional[ChatResponse])
 async def archive_chat_by_id(id: str, user=Depends(get_verified_user)):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
     if chat:
         chat = Chats.toggle_chat_archive_by_id(id)
         return ChatResponse(**{**chat.model_dump(), "chat": json.loads(chat.chat)})
@@ -354,7 +377,7 @@ async def archive_chat_by_id(id: str, user=Depends(get_verified_user)):
 
 @router.post("/{id}/share", response_model=Optional[ChatResponse])
 async def share_chat_by_id(id: str, user=Depends(get_verified_user)):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
     if chat:
         if chat.share_id:
             shared_chat = Chats.update_shared_chat_by_chat_id(chat.id)
@@ -386,7 +409,7 @@ async def share_chat_by_id(id: str, user=Depends(get_verified_user)):
 
 @router.delete("/{id}/share", response_model=Optional[bool])
 async def delete_shared_chat_by_id(id: str, user=Depends(get_verified_user)):
-    chat = Chats.get_chat_by_id_and_user_id(id, user.id)
+    chat = await Chats.get_chat_by_id_and_user_id_async(id, user.id)
     if chat:
         if not chat.share_id:
             return False
@@ -430,7 +453,7 @@ async def add_chat_tag_by_id(
 ):
     tags = Tags.get_tags_by_chat_id_and_user_id(id, user.id)
 
-    if form_data.tag_name not in tags:
+    if form_data.tag_name not in [tag.name for tag in tags]:
         tag = Tags.add_tag_to_chat(user.id, form_data)
 
         if tag:
@@ -27,6 +27,7 @@ from apps.webui.models.files import (
     FileModelResponse,
 )
 from utils.utils import get_verified_user, get_admin_user
+from utils.misc import FileTooLargeError, save_upload_file
 from constants import ERROR_MESSAGES
 
 from importlib import util
@@ -35,7 +36,7 @@ import uuid
 import os, shutil, logging, re
 
 
-from config import SRC_LOG_LEVELS, UPLOAD_DIR
+from config import SRC_LOG_LEVELS, UPLOAD_DIR, UPLOAD_MAX_FILE_SIZE
 
 
 log = logging.getLogger(__name__)
@@ -105,7 +106,7 @@ def upload_cisco_file(form_data: CiscoFakeFileForm, user=Depends(get_verified_us
 
 
 @router.post("/")
-def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
+async def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
     log.info(f"file.content_type: {file.content_type}")
     try:
         unsanitized_filename = file.filename
@@ -117,10 +118,7 @@ def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
         filename = f"{id}_{filename}"
         file_path = f"{UPLOAD_DIR}/{filename}"
 
-        contents = file.file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
-            f.close()
+        size, sha256 = await save_upload_file(file, file_path, UPLOAD_MAX_FILE_SIZE)
 
         # Note: this is how we should store paths in the database
         # This makes us portable across different systems
@@ -136,7 +134,8 @@ def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": size,
+                        "sha256": sha256,
                         "path": file_path,
                     },
                 }
@@ -151,6 +150,11 @@ def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
                 detail=ERROR_MESSAGES.DEFAULT("Error uploading file"),
             )
 
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=ERROR_MESSAGES.FILE_TOO_LARGE(e.max_size),
+        )
     except Exception as e:
         log.exception(e)
         raise HTTPException(
@@ -34,7 +34,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[FunctionModel])
 async def get_functions(user=Depends(get_verified_user)):
-    return Functions.get_functions()
+    return await Functions.get_functions_async()
 
 
 ############################
@@ -44,7 +44,17 @@ async def get_functions(user=Depends(get_verified_user)):
 
 @router.get("/export", response_model=List[FunctionModel])
 async def get_functions(user=Depends(get_admin_user)):
-    return Functions.get_functions()
+    return await Functions.get_functions_async()
+
+
+############################
+# GetFunctionsRegistryStats
+############################
+
+
+@router.get("/registry", response_model=dict)
+async def get_functions_registry_stats(request: Request, user=Depends(get_admin_user)):
+    return request.app.state.FUNCTIONS.get_stats()
 
 
 ############################
@@ -63,7 +73,7 @@ async def create_new_function(
 
     form_data.id = form_data.id.lower()
 
-    function = Functions.get_function_by_id(form_data.id)
+    function = await Functions.get_function_by_id_async(form_data.id)
     if function == None:
         function_path = os.path.join(FUNCTIONS_DIR, f"{form_data.id}.py")
         try:
@@ -75,8 +85,7 @@ async def create_new_function(
             )
             form_data.meta.manifest = frontmatter
 
-            FUNCTIONS = request.app.state.FUNCTIONS
-            FUNCTIONS[form_data.id] = function_module
+            request.app.state.FUNCTIONS.set_module(form_data.id, function_module)
 
             function = Functions.insert_new_function(user.id, function_type, form_data)
 
@@ -110,7 +119,7 @@ async def create_new_function(
 
 @router.get("/id/{id}", response_model=Optional[FunctionModel])
 async def get_function_by_id(id: str, user=Depends(get_admin_user)):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
 
     if function:
         return function
@@ -128,7 +137,7 @@ async def get_function_by_id(id: str, user=Depends(get_admin_user)):
 
 @router.post("/id/{id}/toggle", response_model=Optional[FunctionModel])
 async def toggle_function_by_id(id: str, user=Depends(get_admin_user)):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
         function = Functions.update_function_by_id(
             id, {"is_active": not function.is_active}
@@ -155,7 +164,7 @@ async def toggle_function_by_id(id: str, user=Depends(get_admin_user)):
 
 @router.post("/id/{id}/toggle/global", response_model=Optional[FunctionModel])
 async def toggle_global_by_id(id: str, user=Depends(get_admin_user)):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
         function = Functions.update_function_by_id(
             id, {"is_global": not function.is_global}
@@ -193,8 +202,7 @@ async def update_function_by_id(
         function_module, function_type, frontmatter = load_function_module_by_id(id)
         form_data.meta.manifest = frontmatter
 
-        FUNCTIONS = request.app.state.FUNCTIONS
-        FUNCTIONS[id] = function_module
+        request.app.state.FUNCTIONS.set_module(id, function_module)
 
         updated = {**form_data.model_dump(exclude={"id"}), "type": function_type}
         print(updated)
@@ -228,9 +236,7 @@ async def delete_function_by_id(
     result = Functions.delete_function_by_id(id)
 
     if result:
-        FUNCTIONS = request.app.state.FUNCTIONS
-        if id in FUNCTIONS:
-            del FUNCTIONS[id]
+        request.app.state.FUNCTIONS.remove(id)
 
         # delete the function file
         function_path = os.path.join(FUNCTIONS_DIR, f"{id}.py")
@@ -249,7 +255,7 @@ async def delete_function_by_id(
 
 @router.get("/id/{id}/valves", response_model=Optional[dict])
 async def get_function_valves_by_id(id: str, user=Depends(get_admin_user)):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
         try:
             valves = Functions.get_function_valves_by_id(id)
@@ -275,13 +281,9 @@ async def get_function_valves_by_id(id: str, user=Depends(get_admin_user)):
 async def get_function_valves_spec_by_id(
     request: Request, id: str, user=Depends(get_admin_user)
 ):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = request.app.state.FUNCTIONS.get_module(id)
 
         if hasattr(function_module, "Valves"):
             Valves = function_module.Valves
@@ -303,14 +305,10 @@ async def get_function_valves_spec_by_id(
 async def update_function_valves_by_id(
     request: Request, id: str, form_data: dict, user=Depends(get_admin_user)
 ):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
 
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = request.app.state.FUNCTIONS.get_module(id)
 
         if hasattr(function_module, "Valves"):
             Valves = function_module.Valves
@@ -319,6 +317,7 @@ async def update_function_valves_by_id(
                 form_data = {k: v for k, v in form_data.items() if v is not None}
                 valves = Valves(**form_data)
                 Functions.update_function_valves_by_id(id, valves.model_dump())
+                request.app.state.FUNCTIONS.invalidate_valves(id)
                 return valves.model_dump()
             except Exception as e:
                 print(e)
@@ -346,7 +345,7 @@ async def update_function_valves_by_id(
 
 @router.get("/id/{id}/valves/user", response_model=Optional[dict])
 async def get_function_user_valves_by_id(id: str, user=Depends(get_verified_user)):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
         try:
             user_valves = Functions.get_user_valves_by_id_and_user_id(id, user.id)
@@ -367,13 +366,9 @@ async def get_function_user_valves_by_id(id: str, user=Depends(get_verified_user
 async def get_function_user_valves_spec_by_id(
     request: Request, id: str, user=Depends(get_verified_user)
 ):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = request.app.state.FUNCTIONS.get_module(id)
 
         if hasattr(function_module, "UserValves"):
             UserValves = function_module.UserValves
@@ -390,14 +385,10 @@ async def get_function_user_valves_spec_by_id(
 async def update_function_user_valves_by_id(
     request: Request, id: str, form_data: dict, user=Depends(get_verified_user)
 ):
-    function = Functions.get_function_by_id(id)
+    function = await Functions.get_function_by_id_async(id)
 
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = request.app.state.FUNCTIONS.get_module(id)
 
         if hasattr(function_module, "UserValves"):
             UserValves = function_module.UserValves
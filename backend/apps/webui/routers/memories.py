@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from typing import List, Union, Optional
 
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import logging
 
@@ -12,7 +13,7 @@ from apps.webui.models.memories import Memories, MemoryModel
 from utils.utils import get_verified_user
 from constants import ERROR_MESSAGES
 
-from config import SRC_LOG_LEVELS, CHROMA_CLIENT
+from config import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -55,15 +56,7 @@ async def add_memory(
     user=Depends(get_verified_user),
 ):
     memory = Memories.insert_new_memory(user.id, form_data.content)
-    memory_embedding = request.app.state.EMBEDDING_FUNCTION(memory.content)
-
-    collection = CHROMA_CLIENT.get_or_create_collection(name=f"user-memory-{user.id}")
-    collection.upsert(
-        documents=[memory.content],
-        ids=[memory.id],
-        embeddings=[memory_embedding],
-        metadatas=[{"created_at": memory.created_at}],
-    )
+    await run_in_threadpool(request.app.state.MEMORY_INDEX.upsert, user.id, [memory])
 
     return memory
 
@@ -80,17 +73,8 @@ async def update_memory_by_id(
         raise HTTPException(status_code=404, detail="Memory not found")
 
     if form_data.content is not None:
-        memory_embedding = request.app.state.EMBEDDING_FUNCTION(form_data.content)
-        collection = CHROMA_CLIENT.get_or_create_collection(
-            name=f"user-memory-{user.id}"
-        )
-        collection.upsert(
-            documents=[form_data.content],
-            ids=[memory.id],
-            embeddings=[memory_embedding],
-            metadatas=[
-                {"created_at": memory.created_at, "updated_at": memory.updated_at}
-            ],
+        await run_in_threadpool(
+            request.app.state.MEMORY_INDEX.upsert, user.id, [memory]
         )
 
     return memory
@@ -110,12 +94,11 @@ class QueryMemoryForm(BaseModel):
 async def query_memory(
     request: Request, form_data: QueryMemoryForm, user=Depends(get_verified_user)
 ):
-    query_embedding = request.app.state.EMBEDDING_FUNCTION(form_data.content)
-    collection = CHROMA_CLIENT.get_or_create_collection(name=f"user-memory-{user.id}")
-
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=form_data.k,  # how many results to return
+    results = await run_in_threadpool(
+        request.app.state.MEMORY_INDEX.query,
+        user.id,
+        form_data.content,
+        form_data.k,  # how many results to return
     )
 
     return results
@@ -124,38 +107,44 @@ async def query_memory(
 ############################
 # ResetMemoryFromVectorDB
 ############################
+
+
+class MemoryIndexJobResponse(BaseModel):
+    status: str
+    total: Optional[int] = None
+    indexed: int
+    error: Optional[str] = None
+    started_at: int
+    finished_at: Optional[int] = None
+
+
 @router.get("/reset", response_model=bool)
 async def reset_memory_from_vector_db(
     request: Request, user=Depends(get_verified_user)
 ):
-    CHROMA_CLIENT.delete_collection(f"user-memory-{user.id}")
-    collection = CHROMA_CLIENT.get_or_create_collection(name=f"user-memory-{user.id}")
-
-    memories = Memories.get_memories_by_user_id(user.id)
-    for memory in memories:
-        memory_embedding = request.app.state.EMBEDDING_FUNCTION(memory.content)
-        collection.upsert(
-            documents=[memory.content],
-            ids=[memory.id],
-            embeddings=[memory_embedding],
-        )
+    # The collection is rebuilt in the background, see /reset/status
+    request.app.state.MEMORY_INDEX.start_rebuild(user.id)
     return True
 
 
+@router.get("/reset/status", response_model=Optional[MemoryIndexJobResponse])
+async def get_reset_memory_status(request: Request, user=Depends(get_verified_user)):
+    return request.app.state.MEMORY_INDEX.get_job(user.id)
+
+
 ############################
 # DeleteMemoriesByUserId
 ############################
 
 
 @router.delete("/user", response_model=bool)
-async def delete_memory_by_user_id(user=Depends(get_verified_user)):
+async def delete_memory_by_user_id(request: Request, user=Depends(get_verified_user)):
     result = Memories.delete_memories_by_user_id(user.id)
 
     if result:
-        try:
-            CHROMA_CLIENT.delete_collection(f"user-memory-{user.id}")
-        except Exception as e:
-            log.error(e)
+        await run_in_threadpool(
+            request.app.state.MEMORY_INDEX.delete_collection, user.id
+        )
         return True
 
     return False
@@ -167,14 +156,15 @@ async def delete_memory_by_user_id(user=Depends(get_verified_user)):
 
 
 @router.delete("/{memory_id}", response_model=bool)
-async def delete_memory_by_id(memory_id: str, user=Depends(get_verified_user)):
+async def delete_memory_by_id(
+    request: Request, memory_id: str, user=Depends(get_verified_user)
+):
     result = Memories.delete_memory_by_id_and_user_id(memory_id, user.id)
 
     if result:
-        collection = CHROMA_CLIENT.get_or_create_collection(
-            name=f"user-memory-{user.id}"
+        await run_in_threadpool(
+            request.app.state.MEMORY_INDEX.delete, user.id, [memory_id]
         )
-        collection.delete(ids=[memory_id])
         return True
 
     return False
@@ -20,7 +20,7 @@ router = APIRouter()
 
 @router.get("/", response_model=List[ModelResponse])
 async def get_models(user=Depends(get_verified_user)):
-    return Models.get_all_models()
+    return await Models.get_all_models_async()
 
 
 ############################
@@ -58,7 +58,7 @@ async def add_new_model(
 
 @router.get("/", response_model=Optional[ModelModel])
 async def get_model_by_id(id: str, user=Depends(get_verified_user)):
-    model = Models.get_model_by_id(id)
+    model = await Models.get_model_by_id_async(id)
 
     if model:
         return model
@@ -81,7 +81,7 @@ async def update_model_by_id(
     form_data: ModelForm,
     user=Depends(get_admin_user),
 ):
-    model = Models.get_model_by_id(id)
+    model = await Models.get_model_by_id_async(id)
     if model:
         model = Models.update_model_by_id(id, form_data)
         return model
@@ -0,0 +1,63 @@
+from fastapi import Depends, APIRouter
+
+from apps.webui.models.search import (
+    SearchIndex,
+    SearchEntityType,
+    SearchResultsResponse,
+)
+
+from utils.utils import get_verified_user
+
+router = APIRouter()
+
+SEARCH_MAX_LIMIT = 100
+
+
+# Full-text queries block, so the handlers are plain functions FastAPI runs
+# in its threadpool
+def search(
+    type: SearchEntityType, q: str, user_id=None, skip: int = 0, limit: int = 20
+) -> SearchResultsResponse:
+    return SearchIndex.search(
+        type,
+        q,
+        user_id=user_id,
+        skip=max(0, skip),
+        limit=max(1, min(limit, SEARCH_MAX_LIMIT)),
+    )
+
+
+############################
+# SearchChats
+############################
+
+
+@router.get("/chats", response_model=SearchResultsResponse)
+def search_session_user_chats(
+    q: str, skip: int = 0, limit: int = 20, user=Depends(get_verified_user)
+):
+    return search(SearchEntityType.CHAT, q, user.id, skip, limit)
+
+
+############################
+# SearchArticles
+############################
+
+
+@router.get("/articles", response_model=SearchResultsResponse)
+def search_articles(
+    q: str, skip: int = 0, limit: int = 20, user=Depends(get_verified_user)
+):
+    return search(SearchEntityType.ARTICLE, q, skip=skip, limit=limit)
+
+
+############################
+# SearchDocuments
+############################
+
+
+@router.get("/documents", response_model=SearchResultsResponse)
+def search_documents(
+    q: str, skip: int = 0, limit: int = 20, user=Depends(get_verified_user)
+):
+    return search(SearchEntityType.DOCUMENT, q, skip=skip, limit=limit)
@@ -49,6 +49,16 @@ async def get_toolkits(user=Depends(get_admin_user)):
     return toolkits
 
 
+############################
+# GetToolkitsRegistryStats
+############################
+
+
+@router.get("/registry", response_model=dict)
+async def get_toolkits_registry_stats(request: Request, user=Depends(get_admin_user)):
+    return request.app.state.TOOLS.get_stats()
+
+
 ############################
 # CreateNewToolKit
 ############################
@@ -78,10 +88,9 @@ async def create_new_toolkit(
             toolkit_module, frontmatter = load_toolkit_module_by_id(form_data.id)
             form_data.meta.manifest = frontmatter
 
-            TOOLS = request.app.state.TOOLS
-            TOOLS[form_data.id] = toolkit_module
+            request.app.state.TOOLS.set_module(form_data.id, toolkit_module)
 
-            specs = get_tools_specs(TOOLS[form_data.id])
+            specs = get_tools_specs(toolkit_module)
             toolkit = Tools.insert_new_tool(user.id, form_data, specs)
 
             tool_cache_dir = Path(CACHE_DIR) / "tools" / form_data.id
@@ -146,10 +155,9 @@ async def update_toolkit_by_id(
         toolkit_module, frontmatter = load_toolkit_module_by_id(id)
         form_data.meta.manifest = frontmatter
 
-        TOOLS = request.app.state.TOOLS
-        TOOLS[id] = toolkit_module
+        request.app.state.TOOLS.set_module(id, toolkit_module)
 
-        specs = get_tools_specs(TOOLS[id])
+        specs = get_tools_specs(toolkit_module)
 
         updated = {
             **form_data.model_dump(exclude={"id"}),
@@ -184,9 +192,7 @@ async def delete_toolkit_by_id(request: Request, id: str, user=Depends(get_admin
     result = Tools.delete_tool_by_id(id)
 
     if result:
-        TOOLS = request.app.state.TOOLS
-        if id in TOOLS:
-            del TOOLS[id]
+        request.app.state.TOOLS.remove(id)
 
         # delete the toolkit file
         toolkit_path = os.path.join(TOOLS_DIR, f"{id}.py")
@@ -230,11 +236,7 @@ async def get_toolkit_valves_spec_by_id(
 ):
     toolkit = Tools.get_tool_by_id(id)
     if toolkit:
-        if id in request.app.state.TOOLS:
-            toolkit_module = request.app.state.TOOLS[id]
-        else:
-            toolkit_module, frontmatter = load_toolkit_module_by_id(id)
-            request.app.state.TOOLS[id] = toolkit_module
+        toolkit_module = request.app.state.TOOLS.get_module(id)
 
         if hasattr(toolkit_module, "Valves"):
             Valves = toolkit_module.Valves
@@ -258,11 +260,7 @@ async def update_toolkit_valves_by_id(
 ):
     toolkit = Tools.get_tool_by_id(id)
     if toolkit:
-        if id in request.app.state.TOOLS:
-            toolkit_module = request.app.state.TOOLS[id]
-        else:
-            toolkit_module, frontmatter = load_toolkit_module_by_id(id)
-            request.app.state.TOOLS[id] = toolkit_module
+        toolkit_module = request.app.state.TOOLS.get_module(id)
 
         if hasattr(toolkit_module, "Valves"):
             Valves = toolkit_module.Valves
@@ -271,6 +269,7 @@ async def update_toolkit_valves_by_id(
                 form_data = {k: v for k, v in form_data.items() if v is not None}
                 valves = Valves(**form_data)
                 Tools.update_tool_valves_by_id(id, valves.model_dump())
+                request.app.state.TOOLS.invalidate_valves(id)
                 return valves.model_dump()
             except Exception as e:
                 print(e)
@@ -321,11 +320,7 @@ async def get_toolkit_user_valves_spec_by_id(
 ):
     toolkit = Tools.get_tool_by_id(id)
     if toolkit:
-        if id in request.app.state.TOOLS:
-            toolkit_module = request.app.state.TOOLS[id]
-        else:
-            toolkit_module, frontmatter = load_toolkit_module_by_id(id)
-            request.app.state.TOOLS[id] = toolkit_module
+        toolkit_module = request.app.state.TOOLS.get_module(id)
 
         if hasattr(toolkit_module, "UserValves"):
             UserValves = toolkit_module.UserValves
@@ -345,11 +340,7 @@ async def update_toolkit_user_valves_by_id(
     toolkit = Tools.get_tool_by_id(id)
 
     if toolkit:
-        if id in request.app.state.TOOLS:
-            toolkit_module = request.app.state.TOOLS[id]
-        else:
-            toolkit_module, frontmatter = load_toolkit_module_by_id(id)
-            request.app.state.TOOLS[id] = toolkit_module
+        toolkit_module = request.app.state.TOOLS.get_module(id)
 
         if hasattr(toolkit_module, "UserValves"):
             UserValves = toolkit_module.UserValves
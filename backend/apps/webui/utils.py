@@ -1,8 +1,20 @@
+from collections import OrderedDict
 from importlib import util
+import asyncio
+import logging
 import os
 import re
+import threading
+import time
+import uuid
+from typing import Optional
 
-from config import TOOLS_DIR, FUNCTIONS_DIR
+import numpy as np
+
+from config import SRC_LOG_LEVELS, TOOLS_DIR, FUNCTIONS_DIR
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
 
 def extract_frontmatter(file_path):
@@ -88,3 +100,467 @@ def load_function_module_by_id(function_id):
         # Move the file to the error folder
         os.rename(function_path, f"{function_path}.error")
         raise e
+
+
+class ModuleRegistry:
+    """
+    Process-wide cache of loaded function/tool modules and their valves.
+
+    Modules are compiled once and reused. Valves are cached for `valves_ttl`
+    seconds, or until `invalidate_valves` on an update, then read from the
+    database again in case another worker updated them; they are applied to
+    the module only when they changed. Module files are polled for changes by
+    `watch` and reloaded in place.
+    """
+
+    def __init__(self, directory, load_module, get_valves_by_id, valves_ttl=5):
+        self.directory = directory
+        self.load_module = load_module
+        self.get_valves_by_id = get_valves_by_id
+        self.valves_ttl = valves_ttl
+
+        self.modules = {}
+        self.mtimes = {}
+        self.load_times = {}
+        # id -> (valves, time.monotonic() they were read at)
+        self.valves = {}
+        # Valves last applied to each module
+        self.applied_valves = {}
+
+    def __contains__(self, id):
+        return id in self.modules
+
+    def get_mtime(self, id):
+        try:
+            return os.path.getmtime(os.path.join(self.directory, f"{id}.py"))
+        except OSError:
+            return None
+
+    def set_module(self, id, module, load_time=None):
+        self.modules[id] = module
+        self.mtimes[id] = self.get_mtime(id)
+        if load_time is not None:
+            self.load_times[id] = load_time
+        self.invalidate_valves(id)
+
+    def load(self, id):
+        start_time = time.perf_counter()
+        module = self.load_module(id)
+        load_time = time.perf_counter() - start_time
+
+        self.set_module(id, module, load_time)
+        log.info(f"Loaded module {id} in {load_time * 1000:.1f}ms")
+        return module
+
+    def preload(self, ids):
+        start_time = time.perf_counter()
+        for id in ids:
+            try:
+                self.get_module(id)
+            except Exception as e:
+                log.error(f"Error preloading module {id}: {e}")
+        log.info(
+            f"Preloaded {len(self.modules)} module(s) from {self.directory} "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+
+    def get_module(self, id):
+        if id not in self.modules:
+            self.load(id)
+
+        module = self.modules[id]
+        if hasattr(module, "valves") and hasattr(module, "Valves"):
+            valves = self.get_valves(id)
+            if self.applied_valves.get(id) != valves:
+                module.valves = module.Valves(**valves)
+                self.applied_valves[id] = valves
+
+        return module
+
+    def get_valves(self, id) -> dict:
+        cached = self.valves.get(id)
+        if cached is not None and time.monotonic() - cached[1] < self.valves_ttl:
+            return cached[0]
+
+        valves = self.get_valves_by_id(id)
+        valves = valves if valves else {}
+        self.valves[id] = (valves, time.monotonic())
+        return valves
+
+    def invalidate_valves(self, id):
+        self.valves.pop(id, None)
+        self.applied_valves.pop(id, None)
+
+    def remove(self, id):
+        self.modules.pop(id, None)
+        self.mtimes.pop(id, None)
+        self.load_times.pop(id, None)
+        self.invalidate_valves(id)
+
+    def check_for_changes(self):
+        for id in list(self.modules.keys()):
+            mtime = self.get_mtime(id)
+            if mtime is None:
+                log.info(f"Module file for {id} was removed, unloading")
+                self.remove(id)
+            elif mtime != self.mtimes.get(id):
+                log.info(f"Module file for {id} changed, reloading")
+                try:
+                    self.load(id)
+                except Exception as e:
+                    log.error(f"Error reloading module {id}: {e}")
+                    self.remove(id)
+
+    async def watch(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                log.error(f"Error checking {self.directory} for changes: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "modules": len(self.modules),
+            "load_times": {
+                id: round(load_time * 1000, 1)
+                for id, load_time in self.load_times.items()
+            },
+        }
+
+
+class MemoryIndex:
+    """
+    Vector index of user memories, one collection per user.
+
+    Collection handles are cached per user instead of being looked up on every
+    request. Memories are embedded and upserted `batch_size` at a time, and a
+    full rebuild of a user's collection runs as a background job whose progress
+    is kept in `jobs`.
+
+    Searches are answered from an in-process copy of the collection (a NumPy
+    matrix of its embeddings) for the `cache_max_users` most recently searched
+    users that have at most `cache_max_items` memories. Upserts and deletes
+    made through this index update the copy in place; `cache_ttl` bounds how
+    stale it can get from writes made by other processes.
+
+    A rebuild indexes the memories into a shadow collection while the current
+    one keeps serving searches. Writes made meanwhile are applied to both, and
+    the shadow is renamed over the current collection once complete.
+    """
+
+    def __init__(
+        self,
+        client,
+        get_embedding_function,
+        get_memories_by_user_id,
+        batch_size,
+        cache_max_users=256,
+        cache_max_items=1000,
+        cache_ttl=300,
+    ):
+        self.client = client
+        self.get_embedding_function = get_embedding_function
+        self.get_memories_by_user_id = get_memories_by_user_id
+        self.batch_size = batch_size
+        self.cache_max_users = cache_max_users
+        self.cache_max_items = cache_max_items
+        self.cache_ttl = cache_ttl
+
+        self.collections = {}
+        self.jobs = {}
+        # User id -> writes made during a rebuild, replayed on its shadow
+        self.rebuild_writes = {}
+        # Held by writes, so none is lost while a shadow is swapped in
+        self.write_lock = threading.Lock()
+
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    COLLECTION_PREFIX = "user-memory-"
+    SHADOW_PREFIX = f"{COLLECTION_PREFIX}rebuild-"
+
+    def get_collection_name(self, user_id):
+        return f"{self.COLLECTION_PREFIX}{user_id}"
+
+    def get_collection(self, user_id):
+        if user_id not in self.collections:
+            self.collections[user_id] = self.client.get_or_create_collection(
+                name=self.get_collection_name(user_id)
+            )
+        return self.collections[user_id]
+
+    def delete_collection(self, user_id):
+        with self.write_lock:
+            self.collections.pop(user_id, None)
+            self.evict(user_id)
+            writes = self.rebuild_writes.get(user_id)
+            if writes is not None:
+                writes.update(cleared=True, upserted={}, deleted=set())
+            try:
+                self.client.delete_collection(self.get_collection_name(user_id))
+            except Exception as e:
+                # Most likely the collection was never created
+                log.debug(f"Could not delete memory collection of user {user_id}: {e}")
+
+    def embed(self, contents):
+        return self.get_embedding_function()(contents)
+
+    def get_rows(self, memories) -> dict:
+        return {
+            "ids": [memory.id for memory in memories],
+            "documents": [memory.content for memory in memories],
+            "embeddings": self.embed([memory.content for memory in memories]),
+            "metadatas": [
+                {"created_at": memory.created_at, "updated_at": memory.updated_at}
+                for memory in memories
+            ],
+        }
+
+    def upsert(self, user_id, memories):
+        for i in range(0, len(memories), self.batch_size):
+            # Embedded before taking the lock, it only covers the write
+            rows = self.get_rows(memories[i : i + self.batch_size])
+            with self.write_lock:
+                self.get_collection(user_id).upsert(**rows)
+                self.update_cache(user_id, rows)
+                writes = self.rebuild_writes.get(user_id)
+                if writes is not None:
+                    for row in zip(*rows.values()):
+                        writes["upserted"][row[0]] = row
+                        writes["deleted"].discard(row[0])
+
+    def delete(self, user_id, ids):
+        with self.write_lock:
+            self.get_collection(user_id).delete(ids=ids)
+            self.update_cache(user_id, {"ids": ids})
+            writes = self.rebuild_writes.get(user_id)
+            if writes is not None:
+                for id in ids:
+                    writes["upserted"].pop(id, None)
+                    writes["deleted"].add(id)
+
+    def query(self, user_id, content, k):
+        return self.search(user_id, self.embed(content), k)
+
+    def search(self, user_id, embedding, k) -> dict:
+        """
+        Top `k` memories closest to `embedding`, in the shape of a Chroma query
+        result. Reads the in-process copy of the collection when there is one.
+        """
+        entry = self.get_cache_entry(user_id)
+        if entry is None:
+            return self.get_collection(user_id).query(
+                query_embeddings=[embedding], n_results=k
+            )
+
+        ids = entry["ids"]
+        k = min(k, len(ids))
+        if k == 0:
+            return {
+                "ids": [[]],
+                "documents": [[]],
+                "metadatas": [[]],
+                "distances": [[]],
+            }
+
+        # Squared L2, Chroma's default distance, so both paths rank the same
+        distances = ((entry["embeddings"] - np.asarray(embedding)) ** 2).sum(axis=1)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return {
+            "ids": [[ids[i] for i in top]],
+            "documents": [[entry["documents"][i] for i in top]],
+            "metadatas": [[entry["metadatas"][i] for i in top]],
+            "distances": [distances[top].tolist()],
+        }
+
+    def get_cache_entry(self, user_id) -> Optional[dict]:
+        with self.cache_lock:
+            entry = self.cache.get(user_id)
+            if entry is not None and time.time() - entry["loaded_at"] < self.cache_ttl:
+                self.cache.move_to_end(user_id)
+                return entry if "embeddings" in entry else None
+
+        collection = self.get_collection(user_id)
+        if collection.count() > self.cache_max_items:
+            # Too large to copy, remembered so the count isn't asked every time
+            entry = {"loaded_at": time.time()}
+        else:
+            rows = collection.get(include=["embeddings", "documents", "metadatas"])
+            entry = {
+                "ids": rows["ids"],
+                "documents": rows["documents"],
+                "metadatas": rows["metadatas"],
+                "embeddings": np.asarray(rows["embeddings"], dtype=np.float32),
+                "loaded_at": time.time(),
+            }
+
+        with self.cache_lock:
+            self.cache[user_id] = entry
+            self.cache.move_to_end(user_id)
+            while len(self.cache) > self.cache_max_users:
+                self.cache.popitem(last=False)
+        return entry if "embeddings" in entry else None
+
+    def update_cache(self, user_id, rows):
+        """
+        Apply upserted (ids, documents, embeddings, metadatas) or deleted (ids
+        only) rows to the cached copy of a user's collection, if any.
+        """
+        with self.cache_lock:
+            entry = self.cache.get(user_id)
+            if entry is None or "embeddings" not in entry:
+                return
+
+            # Entries are replaced rather than mutated, searches may be reading
+            # the current one
+            removed = set(rows["ids"])
+            keep = [i for i, id in enumerate(entry["ids"]) if id not in removed]
+            updated = {
+                "ids": [entry["ids"][i] for i in keep],
+                "documents": [entry["documents"][i] for i in keep],
+                "metadatas": [entry["metadatas"][i] for i in keep],
+                "embeddings": entry["embeddings"][keep],
+                "loaded_at": entry["loaded_at"],
+            }
+            if "embeddings" in rows:
+                embeddings = np.asarray(rows["embeddings"], dtype=np.float32)
+                if (
+                    len(keep) > 0
+                    and embeddings.shape[1] != updated["embeddings"].shape[1]
+                ):
+                    # The embedding model changed, reload on the next search
+                    self.cache.pop(user_id)
+                    return
+                updated["ids"] += rows["ids"]
+                updated["documents"] += rows["documents"]
+                updated["metadatas"] += rows["metadatas"]
+                updated["embeddings"] = (
+                    np.concatenate([updated["embeddings"], embeddings])
+                    if len(keep) > 0
+                    else embeddings
+                )
+
+            if len(updated["ids"]) > self.cache_max_items:
+                self.cache.pop(user_id)
+            else:
+                self.cache[user_id] = updated
+
+    def evict(self, user_id):
+        with self.cache_lock:
+            self.cache.pop(user_id, None)
+
+    def rebuild(self, user_id):
+        job = self.jobs[user_id]
+        shadow_name = f"{self.SHADOW_PREFIX}{uuid.uuid4().hex}"
+        with self.write_lock:
+            self.rebuild_writes[user_id] = {
+                "cleared": False,
+                "upserted": {},
+                "deleted": set(),
+            }
+        try:
+            start_time = time.perf_counter()
+            memories = self.get_memories_by_user_id(user_id)
+            job["total"] = len(memories)
+
+            shadow = self.client.create_collection(name=shadow_name)
+            for i in range(0, len(memories), self.batch_size):
+                batch = memories[i : i + self.batch_size]
+                shadow.upsert(**self.get_rows(batch))
+                job["indexed"] += len(batch)
+
+            with self.write_lock:
+                writes = self.rebuild_writes.pop(user_id)
+                # Made by their own requests since the memories were read
+                if writes["cleared"] and len(memories) > 0:
+                    shadow.delete(ids=[memory.id for memory in memories])
+                if len(writes["deleted"]) > 0:
+                    shadow.delete(ids=list(writes["deleted"]))
+                if len(writes["upserted"]) > 0:
+                    ids, documents, embeddings, metadatas = map(
+                        list, zip(*writes["upserted"].values())
+                    )
+                    shadow.upsert(
+                        ids=ids,
+                        documents=documents,
+                        embeddings=embeddings,
+                        metadatas=metadatas,
+                    )
+                self.swap(user_id, shadow)
+
+            job["status"] = "done"
+            log.info(
+                f"Rebuilt memory index of user {user_id}: {len(memories)} memories "
+                f"in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+            )
+        except Exception as e:
+            log.exception(f"Error rebuilding memory index of user {user_id}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            with self.write_lock:
+                self.rebuild_writes.pop(user_id, None)
+            try:
+                self.client.delete_collection(shadow_name)
+            except Exception as e:
+                log.debug(f"Could not delete memory collection {shadow_name}: {e}")
+        finally:
+            job["finished_at"] = int(time.time())
+
+    def swap(self, user_id, shadow):
+        """Rename a rebuilt shadow over the user's collection, under the lock."""
+        name = self.get_collection_name(user_id)
+        retired = self.get_collection(user_id)
+        # Renamed first, searches holding it keep working until it is deleted
+        retired.modify(name=f"{self.SHADOW_PREFIX}{uuid.uuid4().hex}")
+        try:
+            shadow.modify(name=name)
+        except Exception:
+            retired.modify(name=name)
+            raise
+
+        self.collections[user_id] = shadow
+        self.evict(user_id)
+        self.client.delete_collection(retired.name)
+
+    def new_job(self, user_id) -> Optional[dict]:
+        """A new rebuild job for the user, None if one is already running."""
+        job = self.jobs.get(user_id)
+        if job is not None and job["status"] == "running":
+            return None
+        job = {
+            "status": "running",
+            "total": None,
+            "indexed": 0,
+            "error": None,
+            "started_at": int(time.time()),
+            "finished_at": None,
+        }
+        self.jobs[user_id] = job
+        return job
+
+    def start_rebuild(self, user_id) -> dict:
+        """
+        Schedule a rebuild of the user's collection on a worker thread, unless
+        one is already running, and return its job status.
+        """
+        if self.new_job(user_id) is not None:
+            asyncio.get_running_loop().run_in_executor(None, self.rebuild, user_id)
+        return self.jobs[user_id]
+
+    def rebuild_all(self):
+        """
+        Rebuild the collections of every user in the calling thread, once the
+        embedding model changed.
+        """
+        for collection in self.client.list_collections():
+            if collection.name.startswith(
+                self.COLLECTION_PREFIX
+            ) and not collection.name.startswith(self.SHADOW_PREFIX):
+                user_id = collection.name[len(self.COLLECTION_PREFIX) :]
+                if self.new_job(user_id) is not None:
+                    self.rebuild(user_id)
+
+    def get_job(self, user_id) -> Optional[dict]:
+        return self.jobs.get(user_id)
@@ -542,6 +542,17 @@ if CUSTOM_NAME:
 UPLOAD_DIR = f"{DATA_DIR}/uploads"
 Path(UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
 
+# Largest accepted file, audio and document upload in MB, empty for no limit
+UPLOAD_MAX_FILE_SIZE = os.environ.get("UPLOAD_MAX_FILE_SIZE", "")
+
+if UPLOAD_MAX_FILE_SIZE == "":
+    UPLOAD_MAX_FILE_SIZE = None
+else:
+    try:
+        UPLOAD_MAX_FILE_SIZE = int(float(UPLOAD_MAX_FILE_SIZE) * 1024 * 1024)
+    except:
+        UPLOAD_MAX_FILE_SIZE = None
+
 
 ####################################
 # Cache DIR
@@ -574,6 +585,13 @@ Path(TOOLS_DIR).mkdir(parents=True, exist_ok=True)
 FUNCTIONS_DIR = os.getenv("FUNCTIONS_DIR", f"{DATA_DIR}/functions")
 Path(FUNCTIONS_DIR).mkdir(parents=True, exist_ok=True)
 
+# Seconds between checks of TOOLS_DIR/FUNCTIONS_DIR for changed module files, 0 disables
+MODULE_RELOAD_INTERVAL = int(os.getenv("MODULE_RELOAD_INTERVAL", "5"))
+
+# Seconds function/tool valves are cached per worker before being read again,
+# how long other workers may keep using valves updated on one of them
+MODULE_VALVES_CACHE_TTL = int(os.getenv("MODULE_VALVES_CACHE_TTL", "5"))
+
 
 ####################################
 # LITELLM_CONFIG
@@ -920,6 +938,16 @@ If a function tool doesn't match the query, return an empty string. Else, pick a
     ),
 )
 
+TOOLS_FUNCTION_CALLING_TIMEOUT = os.environ.get("TOOLS_FUNCTION_CALLING_TIMEOUT", "60")
+
+if TOOLS_FUNCTION_CALLING_TIMEOUT == "":
+    TOOLS_FUNCTION_CALLING_TIMEOUT = None
+else:
+    try:
+        TOOLS_FUNCTION_CALLING_TIMEOUT = float(TOOLS_FUNCTION_CALLING_TIMEOUT)
+    except:
+        TOOLS_FUNCTION_CALLING_TIMEOUT = 60.0
+
 
 ####################################
 # WEBUI_SECRET_KEY
@@ -1015,6 +1043,30 @@ PDF_EXTRACT_IMAGES = PersistentConfig(
     os.environ.get("PDF_EXTRACT_IMAGES", "False").lower() == "true",
 )
 
+# Processes parsing uploaded documents, 0 parses them in the server process
+DOCUMENT_PARSER_WORKERS = int(
+    os.environ.get("DOCUMENT_PARSER_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# Seconds one document may take to parse
+DOCUMENT_PARSER_TIMEOUT = int(os.environ.get("DOCUMENT_PARSER_TIMEOUT", "300"))
+# Address space of a parser process in MB, empty for no limit
+DOCUMENT_PARSER_MAX_MEMORY = os.environ.get("DOCUMENT_PARSER_MAX_MEMORY", "")
+
+if DOCUMENT_PARSER_MAX_MEMORY == "":
+    DOCUMENT_PARSER_MAX_MEMORY = None
+else:
+    try:
+        DOCUMENT_PARSER_MAX_MEMORY = int(
+            float(DOCUMENT_PARSER_MAX_MEMORY) * 1024 * 1024
+        )
+    except:
+        DOCUMENT_PARSER_MAX_MEMORY = None
+
+# Pages of a PDF parsed per process, 0 parses a PDF in a single process
+DOCUMENT_PARSER_PDF_PAGES_PER_JOB = int(
+    os.environ.get("DOCUMENT_PARSER_PDF_PAGES_PER_JOB", "20")
+)
+
 RAG_EMBEDDING_MODEL = PersistentConfig(
     "RAG_EMBEDDING_MODEL",
     "rag.embedding_model",
@@ -1036,6 +1088,26 @@ RAG_EMBEDDING_OPENAI_BATCH_SIZE = PersistentConfig(
     os.environ.get("RAG_EMBEDDING_OPENAI_BATCH_SIZE", 1),
 )
 
+# Embeddings of chunk texts shared by all collections, so identical chunks are
+# embedded once per model
+ENABLE_RAG_CHUNK_EMBEDDING_STORE = (
+    os.environ.get("ENABLE_RAG_CHUNK_EMBEDDING_STORE", "True").lower() == "true"
+)
+RAG_CHUNK_EMBEDDING_STORE_PATH = os.environ.get(
+    "RAG_CHUNK_EMBEDDING_STORE_PATH", f"{DATA_DIR}/chunk_embeddings.db"
+)
+
+# Chunks re-embedded per batch, and seconds paused between batches, when
+# collections are migrated to a new embedding model
+RAG_REEMBEDDING_BATCH_SIZE = int(os.environ.get("RAG_REEMBEDDING_BATCH_SIZE", "64"))
+RAG_REEMBEDDING_BATCH_DELAY = float(
+    os.environ.get("RAG_REEMBEDDING_BATCH_DELAY", "0.1")
+)
+
+# Server processes uvicorn starts. The migration holds and tracks writes in
+# its own process only, it is refused when there are several.
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
 RAG_RERANKING_MODEL = PersistentConfig(
     "RAG_RERANKING_MODEL",
     "rag.reranking_model",
@@ -1071,6 +1143,20 @@ else:
         database=CHROMA_DATABASE,
     )
 
+# Memories embedded and upserted per call when (re)indexing user memories
+MEMORY_INDEX_BATCH_SIZE = int(os.environ.get("MEMORY_INDEX_BATCH_SIZE", "64"))
+
+# In-process copies of user memory collections used for retrieval
+MEMORY_CACHE_MAX_USERS = int(os.environ.get("MEMORY_CACHE_MAX_USERS", "256"))
+MEMORY_CACHE_MAX_ITEMS = int(os.environ.get("MEMORY_CACHE_MAX_ITEMS", "1000"))
+MEMORY_CACHE_TTL = int(os.environ.get("MEMORY_CACHE_TTL", "300"))
+
+# Retrieve memories in the chat pipeline for users with memory enabled
+ENABLE_MEMORY_RETRIEVAL = (
+    os.environ.get("ENABLE_MEMORY_RETRIEVAL", "false").lower() == "true"
+)
+MEMORY_RETRIEVAL_TOP_K = int(os.environ.get("MEMORY_RETRIEVAL_TOP_K", "3"))
+
 
 # device type embedding models - "cpu" (default), "cuda" (nvidia gpu required) or "mps" (apple silicon) - choosing this right can lead to better performance
 USE_CUDA = os.environ.get("USE_CUDA_DOCKER", "false")
@@ -1221,6 +1307,29 @@ RAG_WEB_SEARCH_CONCURRENT_REQUESTS = PersistentConfig(
     int(os.getenv("RAG_WEB_SEARCH_CONCURRENT_REQUESTS", "10")),
 )
 
+# Seconds to fetch one page and largest page size in MB read by the web loader
+RAG_WEB_LOADER_TIMEOUT = int(os.environ.get("RAG_WEB_LOADER_TIMEOUT", "10"))
+RAG_WEB_LOADER_MAX_PAGE_SIZE = int(
+    float(os.environ.get("RAG_WEB_LOADER_MAX_PAGE_SIZE", "5")) * 1024 * 1024
+)
+# Seconds search engine results and fetched pages are reused for, 0 disables
+RAG_WEB_SEARCH_CACHE_TTL = int(os.environ.get("RAG_WEB_SEARCH_CACHE_TTL", "3600"))
+RAG_WEB_SEARCH_CACHE_MAX_ENTRIES = int(
+    os.environ.get("RAG_WEB_SEARCH_CACHE_MAX_ENTRIES", "1000")
+)
+RAG_WEB_PAGE_CACHE_TTL = int(os.environ.get("RAG_WEB_PAGE_CACHE_TTL", "3600"))
+RAG_WEB_PAGE_CACHE_MAX_ENTRIES = int(
+    os.environ.get("RAG_WEB_PAGE_CACHE_MAX_ENTRIES", "256")
+)
+# Largest size in MB of the chunks and embeddings of fetched pages kept per worker
+RAG_WEB_CHUNK_CACHE_MAX_SIZE = int(
+    float(os.environ.get("RAG_WEB_CHUNK_CACHE_MAX_SIZE", "64")) * 1024 * 1024
+)
+# Seconds a hostname resolution is reused by the web loader
+RAG_WEB_LOADER_DNS_CACHE_TTL = int(
+    os.environ.get("RAG_WEB_LOADER_DNS_CACHE_TTL", "300")
+)
+
 
 ####################################
 # Transcribe
@@ -1232,6 +1341,16 @@ WHISPER_MODEL_AUTO_UPDATE = (
     os.environ.get("WHISPER_MODEL_AUTO_UPDATE", "").lower() == "true"
 )
 
+# Concurrent transcriptions on the shared model, and how many more may wait
+WHISPER_WORKERS = int(os.environ.get("WHISPER_WORKERS", "1"))
+WHISPER_QUEUE_SIZE = int(os.environ.get("WHISPER_QUEUE_SIZE", "8"))
+# CPU threads per transcription, 0 splits the cores between the workers
+WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "0"))
+# Load the model at startup instead of on the first transcription
+WHISPER_MODEL_PRELOAD = (
+    os.environ.get("WHISPER_MODEL_PRELOAD", "false").lower() == "true"
+)
+
 
 ####################################
 # Images
@@ -1314,6 +1433,24 @@ IMAGE_GENERATION_MODEL = PersistentConfig(
     os.getenv("IMAGE_GENERATION_MODEL", ""),
 )
 
+# Parallel upstream requests of a multi-image OpenAI generation
+IMAGE_GENERATION_CONCURRENCY = int(os.environ.get("IMAGE_GENERATION_CONCURRENCY", "4"))
+
+# Size of the generated image store in MB, empty for no limit. Evicted images
+# are gone from the chats that show them.
+IMAGE_CACHE_MAX_SIZE = os.environ.get("IMAGE_CACHE_MAX_SIZE", "")
+
+if IMAGE_CACHE_MAX_SIZE == "":
+    IMAGE_CACHE_MAX_SIZE = None
+else:
+    try:
+        IMAGE_CACHE_MAX_SIZE = int(float(IMAGE_CACHE_MAX_SIZE) * 1024 * 1024)
+    except:
+        IMAGE_CACHE_MAX_SIZE = None
+
+# Longest side of generated image thumbnails, in pixels
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get("IMAGE_THUMBNAIL_SIZE", "256"))
+
 ####################################
 # Audio
 ####################################
@@ -1373,6 +1510,28 @@ AUDIO_TTS_VOICE = PersistentConfig(
     os.getenv("AUDIO_TTS_VOICE", "alloy"),
 )
 
+# Size of the synthesized speech cache in MB and age of its entries in seconds,
+# empty for no limit
+SPEECH_CACHE_MAX_SIZE = os.environ.get("SPEECH_CACHE_MAX_SIZE", "512")
+
+if SPEECH_CACHE_MAX_SIZE == "":
+    SPEECH_CACHE_MAX_SIZE = None
+else:
+    try:
+        SPEECH_CACHE_MAX_SIZE = int(float(SPEECH_CACHE_MAX_SIZE) * 1024 * 1024)
+    except:
+        SPEECH_CACHE_MAX_SIZE = 512 * 1024 * 1024
+
+SPEECH_CACHE_TTL = os.environ.get("SPEECH_CACHE_TTL", str(30 * 24 * 60 * 60))
+
+if SPEECH_CACHE_TTL == "":
+    SPEECH_CACHE_TTL = None
+else:
+    try:
+        SPEECH_CACHE_TTL = int(SPEECH_CACHE_TTL)
+    except:
+        SPEECH_CACHE_TTL = 30 * 24 * 60 * 60
+
 
 ####################################
 # Database
@@ -1384,12 +1543,42 @@ DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DATA_DIR}/webui.db")
 if "postgres://" in DATABASE_URL:
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://")
 
+# Connection pool of file-backed SQLite databases
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "10"))
+DATABASE_POOL_MAX_OVERFLOW = int(os.environ.get("DATABASE_POOL_MAX_OVERFLOW", "20"))
+DATABASE_POOL_TIMEOUT = int(os.environ.get("DATABASE_POOL_TIMEOUT", "30"))
+
+# SQLite pragmas applied to every new connection, empty values keep SQLite's defaults
+DATABASE_SQLITE_JOURNAL_MODE = os.environ.get("DATABASE_SQLITE_JOURNAL_MODE", "WAL")
+DATABASE_SQLITE_SYNCHRONOUS = os.environ.get("DATABASE_SQLITE_SYNCHRONOUS", "NORMAL")
+# Milliseconds a connection waits on a locked database before failing
+DATABASE_SQLITE_BUSY_TIMEOUT = os.environ.get("DATABASE_SQLITE_BUSY_TIMEOUT", "5000")
+# Bytes of the database file memory-mapped for reads (256 MiB)
+DATABASE_SQLITE_MMAP_SIZE = os.environ.get("DATABASE_SQLITE_MMAP_SIZE", "268435456")
+# Page cache per connection, negative values are KiB (8 MiB). Each worker has a
+# sync and an async engine of up to DATABASE_POOL_SIZE + DATABASE_POOL_MAX_OVERFLOW
+# connections, so at the defaults up to 2 * 30 * 8 MiB = 480 MiB per worker
+DATABASE_SQLITE_CACHE_SIZE = os.environ.get("DATABASE_SQLITE_CACHE_SIZE", "-8192")
+
+# Seconds between re-indexing runs of the chats updated meanwhile, a chat
+# saved many times in between is indexed once
+CHAT_SEARCH_INDEX_INTERVAL = int(os.environ.get("CHAT_SEARCH_INDEX_INTERVAL", "5"))
+
 
 MONGODB_URI = os.environ.get("MONGODB_URI", f"mongodb://localhost:27017/webui")
 MONGODB_USER = os.environ.get("MONGODB_APP_USER", "")
 MONGODB_PASS = os.environ.get("MONGODB_APP_PASS", "")
 
 
+####################################
+# WEBSOCKET
+####################################
+
+# "redis" shares socket.io rooms and presence pools across workers, "" keeps them in-process
+WEBSOCKET_MANAGER = os.environ.get("WEBSOCKET_MANAGER", "").lower()
+WEBSOCKET_REDIS_URL = os.environ.get("WEBSOCKET_REDIS_URL", "redis://localhost:6379/0")
+
+
 ####################################
 # COLLECTION NAMES
 
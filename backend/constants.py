@@ -51,6 +51,7 @@ class ERROR_MESSAGES(str, Enum):
     INVALID_PASSWORD = (
         "The password provided is incorrect. Please check for typos and try again."
     )
+    INVALID_CURSOR = "The pagination cursor provided is invalid. Please start again from the first page."
     INVALID_TRUSTED_HEADER = "Your provider has not provided a trusted header. Please contact your administrator for assistance."
 
     EXISTING_USERS = "You can't turn off authentication because there are existing users. If you want to disable WEBUI_AUTH, make sure your web interface doesn't have any existing users and is a fresh installation."
@@ -63,6 +64,9 @@ class ERROR_MESSAGES(str, Enum):
 
     FILE_NOT_SENT = "FILE_NOT_SENT"
     FILE_NOT_SUPPORTED = "Oops! It seems like the file format you're trying to upload is not supported. Please upload a file with a supported format (e.g., JPG, PNG, PDF, TXT) and try again."
+    FILE_TOO_LARGE = (
+        lambda max_size=0: f"Oops! The file you're trying to upload is too large. The maximum size is {max_size / (1024 * 1024):g} MB."
+    )
 
     NOT_FOUND = "We could not find what you're looking for :/"
     USER_NOT_FOUND = "We could not find what you're looking for :/"
@@ -75,6 +79,9 @@ class ERROR_MESSAGES(str, Enum):
         lambda err="": f"Invalid format. Please use the correct format{err}"
     )
     RATE_LIMIT_EXCEEDED = "API rate limit exceeded"
+    SERVER_BUSY = (
+        "The server is busy processing other requests. Please try again in a moment."
+    )
 
     MODEL_NOT_FOUND = lambda name="": f"Model '{name}' was not found"
     OPENAI_NOT_FOUND = lambda name="": "OpenAI API was not found"
@@ -97,6 +104,10 @@ class ERROR_MESSAGES(str, Enum):
         "The Ollama API is disabled. Please enable it to use this feature."
     )
 
+    EMBEDDING_MIGRATION_RUNNING = "The collections are being re-embedded with a new embedding model. Please wait for it to finish or cancel it first."
+
+    EMBEDDING_MIGRATION_MULTIPLE_WORKERS = "The collections can only be re-embedded with a new embedding model by a single server process. Please restart with WEB_CONCURRENCY=1 and WEBSOCKET_MANAGER unset to change the model, or reset the vector storage first."
+
 
 class TASKS(str, Enum):
     def __str__(self) -> str:
@@ -5,6 +5,7 @@ from contextlib import asynccontextmanager
 from authlib.integrations.starlette_client import OAuth
 from authlib.oidc.core import UserInfo
 import json
+import orjson
 import time
 import os
 import sys
@@ -16,6 +17,7 @@ import shutil
 import os
 import uuid
 import inspect
+import asyncio
 
 from fastapi import FastAPI, Request, Depends, status, UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
@@ -24,12 +26,21 @@ from fastapi import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import StreamingResponse, Response, RedirectResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from fastapi.concurrency import run_in_threadpool
 
 
-from apps.socket.main import sio, app as socket_app, get_event_emitter, get_event_call
+from apps.socket.main import (
+    sio,
+    app as socket_app,
+    get_event_emitter,
+    get_event_call,
+    periodic_pool_cleanup,
+    close_pools as close_socket_pools,
+)
 from apps.ollama.main import (
     app as ollama_app,
     get_all_models as get_ollama_models,
@@ -57,12 +68,12 @@ from pydantic import BaseModel
 from typing import List, Optional
 
 from apps.webui.models.auths import Auths
+from apps.webui.models.chats import Chats
 from apps.webui.models.models import Models
 from apps.webui.models.tools import Tools
 from apps.webui.models.functions import Functions
 from apps.webui.models.users import Users
 
-from apps.webui.utils import load_toolkit_module_by_id, load_function_module_by_id
 
 from utils.utils import (
     get_admin_user,
@@ -77,6 +88,12 @@ from utils.task import (
     search_query_generation_template,
     tools_function_calling_generation_template,
 )
+from utils.asgi import (
+    read_body,
+    replay_receive,
+    with_body_headers,
+    prepend_stream_chunks,
+)
 from utils.misc import (
     get_last_user_message,
     add_or_update_system_message,
@@ -111,6 +128,13 @@ from config import (
     SEARCH_QUERY_GENERATION_PROMPT_TEMPLATE,
     SEARCH_QUERY_PROMPT_LENGTH_THRESHOLD,
     TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
+    TOOLS_FUNCTION_CALLING_TIMEOUT,
+    MODULE_RELOAD_INTERVAL,
+    CHAT_SEARCH_INDEX_INTERVAL,
+    ENABLE_MEMORY_RETRIEVAL,
+    WHISPER_MODEL_PRELOAD,
+    UPLOAD_MAX_FILE_SIZE,
+    MEMORY_RETRIEVAL_TOP_K,
     SAFE_MODE,
     OAUTH_PROVIDERS,
     ENABLE_OAUTH_SIGNUP,
@@ -176,8 +200,53 @@ def run_migrations():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     run_migrations()
+
+    # Compile all active functions and tools once, then watch their files for changes
+    webui_app.state.FUNCTIONS.preload(
+        [function.id for function in Functions.get_functions(active_only=True)]
+    )
+    webui_app.state.TOOLS.preload([tool.id for tool in Tools.get_tools()])
+
+    # Load the whisper model in the background, transcriptions that arrive first
+    # wait for it
+    if WHISPER_MODEL_PRELOAD and audio_app.state.config.STT_ENGINE == "":
+        whisper_preload = asyncio.create_task(
+            run_in_threadpool(audio_app.state.WHISPER.preload)
+        )
+
+    watchers = []
+    if MODULE_RELOAD_INTERVAL > 0:
+        watchers = [
+            asyncio.create_task(registry.watch(MODULE_RELOAD_INTERVAL))
+            for registry in [webui_app.state.FUNCTIONS, webui_app.state.TOOLS]
+        ]
+
+    socket_pool_cleanup = asyncio.create_task(periodic_pool_cleanup())
+    chat_indexer = asyncio.create_task(
+        Chats.watch_index_queue(CHAT_SEARCH_INDEX_INTERVAL)
+    )
+
     yield
 
+    for watcher in watchers:
+        watcher.cancel()
+
+    socket_pool_cleanup.cancel()
+    await close_socket_pools()
+
+    # Index the chats updated since the last run
+    chat_indexer.cancel()
+    try:
+        await Chats.index_queued_chats_async()
+    except Exception as e:
+        log.error(f"Error re-indexing updated chats: {e}")
+
+    await images_app.state.CLIENT.close()
+    await rag_app.state.WEB_LOADER.close()
+    rag_app.state.DOCUMENT_PARSER.shutdown()
+    if rag_app.state.CHUNK_STORE is not None:
+        rag_app.state.CHUNK_STORE.close()
+
 
 app = FastAPI(
     docs_url="/docs" if ENV == "dev" else None, redoc_url=None, lifespan=lifespan
@@ -221,18 +290,20 @@ origins = ["*"]
 ##################################
 
 
+CHAT_METADATA_KEYS = ["valves", "session_id", "chat_id", "id"]
+
+
 async def get_body_and_model_and_user(request: Request):
     # Read the original request body
     body = await request.body()
-    body_str = body.decode("utf-8")
-    body = json.loads(body_str) if body_str else {}
+    body = orjson.loads(body) if body else {}
 
     model_id = body["model"]
     if model_id not in app.state.MODELS:
         raise Exception("Model not found")
     model = app.state.MODELS[model_id]
 
-    user = get_current_user(
+    user = await get_current_user(
         request,
         get_http_authorization_cred(request.headers.get("Authorization")),
     )
@@ -240,6 +311,28 @@ async def get_body_and_model_and_user(request: Request):
     return body, model, user
 
 
+def is_chat_completion_request(scope: Scope):
+    return (
+        scope["type"] == "http"
+        and scope["method"] == "POST"
+        and any(
+            endpoint in scope["path"]
+            for endpoint in ["/ollama/api/chat", "/chat/completions"]
+        )
+    )
+
+
+async def is_chat_completion_noop(body, model, user):
+    # Nothing for the chat middleware to do: no files or memories to retrieve, no
+    # tools to call, no inlet filters to run and no client metadata to move into
+    # body["metadata"]
+    if any(key in body for key in ["files", "tool_ids", *CHAT_METADATA_KEYS]):
+        return False
+    if is_memory_retrieval_enabled(user):
+        return False
+    return len(await get_filter_function_ids(model)) == 0
+
+
 def get_task_model_id(default_model_id):
     # Set the task model
     task_model_id = default_model_id
@@ -260,21 +353,22 @@ def get_task_model_id(default_model_id):
     return task_model_id
 
 
-def get_filter_function_ids(model):
+async def get_filter_function_ids(model):
     def get_priority(function_id):
-        function = Functions.get_function_by_id(function_id)
-        if function is not None and hasattr(function, "valves"):
-            return (function.valves if function.valves else {}).get("priority", 0)
-        return 0
+        return webui_app.state.FUNCTIONS.get_valves(function_id).get("priority", 0)
 
-    filter_ids = [function.id for function in Functions.get_global_filter_functions()]
+    filter_ids = [
+        function.id for function in await Functions.get_global_filter_functions_async()
+    ]
     if "info" in model and "meta" in model["info"]:
         filter_ids.extend(model["info"]["meta"].get("filterIds", []))
         filter_ids = list(set(filter_ids))
 
     enabled_filter_ids = [
         function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
+        for function in await Functions.get_functions_by_type_async(
+            "filter", active_only=True
+        )
     ]
 
     filter_ids = [
@@ -360,11 +454,7 @@ async def get_function_call_response(
             return None, None, False
 
         # Call the function
-        if tool_id in webui_app.state.TOOLS:
-            toolkit_module = webui_app.state.TOOLS[tool_id]
-        else:
-            toolkit_module, _ = load_toolkit_module_by_id(tool_id)
-            webui_app.state.TOOLS[tool_id] = toolkit_module
+        toolkit_module = webui_app.state.TOOLS.get_module(tool_id)
 
         file_handler = False
         # check if toolkit_module has file_handler self variable
@@ -372,10 +462,6 @@ async def get_function_call_response(
             file_handler = True
             print("file_handler: ", file_handler)
 
-        if hasattr(toolkit_module, "valves") and hasattr(toolkit_module, "Valves"):
-            valves = Tools.get_tool_valves_by_id(tool_id)
-            toolkit_module.valves = toolkit_module.Valves(**(valves if valves else {}))
-
         function = getattr(toolkit_module, result["name"])
         function_result = None
         try:
@@ -420,7 +506,9 @@ async def get_function_call_response(
             if inspect.iscoroutinefunction(function):
                 function_result = await function(**params)
             else:
-                function_result = function(**params)
+                # Off the event loop, so that the function calling timeout
+                # can interrupt the wait for it
+                function_result = await run_in_threadpool(function, **params)
 
             if hasattr(toolkit_module, "citation") and toolkit_module.citation:
                 citation = {
@@ -445,29 +533,15 @@ async def chat_completion_functions_handler(
 ):
     skip_files = None
 
-    filter_ids = get_filter_function_ids(model)
+    filter_ids = await get_filter_function_ids(model)
     log.debug(f"filter_ids: {filter_ids}")
     for filter_id in filter_ids:
-        filter = Functions.get_function_by_id(filter_id)
-        if not filter:
-            continue
-
-        if filter_id in webui_app.state.FUNCTIONS:
-            function_module = webui_app.state.FUNCTIONS[filter_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(filter_id)
-            webui_app.state.FUNCTIONS[filter_id] = function_module
+        function_module = webui_app.state.FUNCTIONS.get_module(filter_id)
 
         # Check if the function has a file_handler variable
         if hasattr(function_module, "file_handler"):
             skip_files = function_module.file_handler
 
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
-
         if not hasattr(function_module, "inlet"):
             continue
 
@@ -528,6 +602,16 @@ async def chat_completion_functions_handler(
     return body, {}
 
 
+async def get_function_call_response_with_timeout(tool_id, timeout=None, **kwargs):
+    try:
+        return await asyncio.wait_for(
+            get_function_call_response(tool_id=tool_id, **kwargs), timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        log.warning(f"Function calling for tool {tool_id} timed out after {timeout}s")
+        return None, None, False
+
+
 async def chat_completion_tools_handler(body, user, __event_emitter__, __event_call__):
     skip_files = None
 
@@ -538,36 +622,50 @@ async def chat_completion_tools_handler(body, user, __event_emitter__, __event_c
 
     # If tool_ids field is present, call the functions
     if "tool_ids" in body:
-        print(body["tool_ids"])
-        for tool_id in body["tool_ids"]:
-            print(tool_id)
-            try:
-                response, citation, file_handler = await get_function_call_response(
+        log.debug(f"tool_ids: {body['tool_ids']}")
+
+        # Run function calling for every tool concurrently, each bounded by its own timeout
+        results = await asyncio.gather(
+            *[
+                get_function_call_response_with_timeout(
+                    tool_id,
+                    timeout=TOOLS_FUNCTION_CALLING_TIMEOUT,
                     messages=body["messages"],
                     files=body.get("files", []),
-                    tool_id=tool_id,
                     template=app.state.config.TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
                     task_model_id=task_model_id,
                     user=user,
                     __event_emitter__=__event_emitter__,
                     __event_call__=__event_call__,
                 )
+                for tool_id in body["tool_ids"]
+            ],
+            return_exceptions=True,
+        )
 
-                print(file_handler)
-                if isinstance(response, str):
-                    contexts.append(response)
+        # Results are collected in tool_ids order so contexts and citations stay stable
+        for tool_id, result in zip(body["tool_ids"], results):
+            if isinstance(result, BaseException):
+                log.error(
+                    f"Error calling tool {tool_id}: {result}",
+                    exc_info=(type(result), result, result.__traceback__),
+                )
+                continue
 
-                if citation:
-                    if citations is None:
-                        citations = [citation]
-                    else:
-                        citations.append(citation)
+            response, citation, file_handler = result
 
-                if file_handler:
-                    skip_files = True
+            if isinstance(response, str):
+                contexts.append(response)
+
+            if citation:
+                if citations is None:
+                    citations = [citation]
+                else:
+                    citations.append(citation)
+
+            if file_handler:
+                skip_files = True
 
-            except Exception as e:
-                print(f"Error: {e}")
         del body["tool_ids"]
         print(f"tool_contexts: {contexts}")
 
@@ -582,7 +680,22 @@ async def chat_completion_tools_handler(body, user, __event_emitter__, __event_c
     }
 
 
-async def chat_completion_files_handler(body):
+def get_turn_embedding_function(embedding_function):
+    # Embeds every distinct query once per chat turn, so file retrieval (once per
+    # collection) and memory retrieval share the embedding of the user message
+    embeddings = {}
+
+    def turn_embedding_function(query):
+        if isinstance(query, list):
+            return embedding_function(query)
+        if query not in embeddings:
+            embeddings[query] = embedding_function(query)
+        return embeddings[query]
+
+    return turn_embedding_function
+
+
+async def chat_completion_files_handler(body, embedding_function):
     contexts = []
     citations = None
 
@@ -590,10 +703,11 @@ async def chat_completion_files_handler(body):
         files = body["files"]
         del body["files"]
 
-        contexts, citations = get_rag_context(
+        contexts, citations = await run_in_threadpool(
+            get_rag_context,
             files=files,
             messages=body["messages"],
-            embedding_function=rag_app.state.EMBEDDING_FUNCTION,
+            embedding_function=embedding_function,
             k=rag_app.state.config.TOP_K,
             reranking_function=rag_app.state.sentence_transformer_rf,
             r=rag_app.state.config.RELEVANCE_THRESHOLD,
@@ -610,22 +724,68 @@ async def chat_completion_files_handler(body):
     }
 
 
-class ChatCompletionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "POST" and any(
-            endpoint in request.url.path
-            for endpoint in ["/ollama/api/chat", "/chat/completions"]
-        ):
-            log.debug(f"[__Chat_Middleware__] request.url.path: {request.url.path}")
+def is_memory_retrieval_enabled(user) -> bool:
+    if not ENABLE_MEMORY_RETRIEVAL or user is None or user.settings is None:
+        return False
+    return (user.settings.ui or {}).get("memory", False)
+
+
+async def chat_completion_memories_handler(body, user, embedding_function):
+    user_context = None
+
+    if is_memory_retrieval_enabled(user):
+        query = get_last_user_message(body["messages"])
+        if query:
+            memory_index = webui_app.state.MEMORY_INDEX
+            results = await run_in_threadpool(
+                lambda: memory_index.search(
+                    user.id, embedding_function(query), MEMORY_RETRIEVAL_TOP_K
+                )
+            )
+
+            # Same format as the user context the chat UI builds from /memories/query
+            user_context = ""
+            for index, (document, metadata) in enumerate(
+                zip(results["documents"][0], results["metadatas"][0])
+            ):
+                created_at = (metadata or {}).get("created_at")
+                date = (
+                    time.strftime("%Y-%m-%d", time.gmtime(created_at))
+                    if created_at
+                    else None
+                )
+                user_context += f"{index + 1}. [{date}]. {document}\n"
+
+        log.debug(f"__chat_completion_memories_handler__::user_context: {user_context}")
+
+    return body, {**({"user_context": user_context} if user_context else {})}
+
+
+class ChatCompletionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if is_chat_completion_request(scope):
+            log.debug(f"[__Chat_Middleware__] request.url.path: {scope['path']}")
+
+            raw_body = await read_body(receive)
+            request = Request(scope, replay_receive(raw_body, receive))
 
             try:
                 body, model, user = await get_body_and_model_and_user(request)
 
             except Exception as e:
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     content={"detail": str(e)},
                 )
+                return await response(scope, receive, send)
+
+            # Forward the original bytes untouched if the request needs no processing
+            if await is_chat_completion_noop(body, model, user):
+                log.debug("[__Chat_Middleware__] no-op request, skipping")
+                return await self.app(scope, replay_receive(raw_body, receive), send)
 
             # Extract valves from the request body
             valves = None
@@ -670,10 +830,11 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
                     body, model, user, __event_emitter__, __event_call__
                 )
             except Exception as e:
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     content={"detail": str(e)},
                 )
+                return await response(scope, receive, send)
 
             try:
                 body, flags = await chat_completion_tools_handler(
@@ -686,14 +847,43 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
                 print(e)
                 pass
 
-            try:
-                body, flags = await chat_completion_files_handler(body)
+            # File retrieval and memory retrieval run concurrently and share the
+            # embedding of the user message
+            embedding_function = get_turn_embedding_function(
+                rag_app.state.EMBEDDING_FUNCTION
+            )
+            if "files" in body or is_memory_retrieval_enabled(user):
+                query = get_last_user_message(body["messages"])
+                if query:
+                    try:
+                        await run_in_threadpool(embedding_function, query)
+                    except Exception as e:
+                        log.exception(e)
+
+            files_result, memories_result = await asyncio.gather(
+                chat_completion_files_handler(body, embedding_function),
+                chat_completion_memories_handler(body, user, embedding_function),
+                return_exceptions=True,
+            )
 
+            if isinstance(files_result, Exception):
+                log.error(
+                    f"Error retrieving file contexts: {files_result}",
+                    exc_info=files_result,
+                )
+            else:
+                body, flags = files_result
                 contexts.extend(flags.get("contexts", []))
                 citations.extend(flags.get("citations", []))
-            except Exception as e:
-                print(e)
-                pass
+
+            user_context = None
+            if isinstance(memories_result, Exception):
+                log.error(
+                    f"Error retrieving memories: {memories_result}",
+                    exc_info=memories_result,
+                )
+            else:
+                user_context = memories_result[1].get("user_context")
             log.debug(f"__CHAT_COMPLETION_MIDDLEWARE__:context: {contexts}")
             log.debug(f"__CHAT_COMPLETION_MIDDLEWARE__:citations: {citations}")
             # If context is not empty, insert it into the messages
@@ -709,6 +899,11 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
                 # Delete me
                 log.debug(f"Messages after RAG: {body['messages']}")
 
+            if user_context:
+                body["messages"] = add_or_update_system_message(
+                    f"User Context:\n{user_context}", body["messages"]
+                )
+
             # If there are citations, add them to the data_items
             if len(citations) > 0:
                 data_items.append({"citations": citations})
@@ -720,56 +915,30 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
                 "valves": valves,
             }
 
-            modified_body_bytes = json.dumps(body).encode("utf-8")
-            # Replace the request body with the modified one
-            request._body = modified_body_bytes
-            # Set custom header to ensure content-length matches new body length
-            request.headers.__dict__["_list"] = [
-                (b"content-length", str(len(modified_body_bytes)).encode("utf-8")),
-                *[
-                    (k, v)
-                    for k, v in request.headers.raw
-                    if k.lower() != b"content-length"
-                ],
-            ]
+            body_bytes = orjson.dumps(body)
 
-            response = await call_next(request)
-            if isinstance(response, StreamingResponse):
-                # If it's a streaming response, inject it as SSE event or NDJSON line
-                content_type = response.headers.get("Content-Type")
-                if "text/event-stream" in content_type:
-                    return StreamingResponse(
-                        self.openai_stream_wrapper(response.body_iterator, data_items),
-                    )
-                if "application/x-ndjson" in content_type:
-                    return StreamingResponse(
-                        self.ollama_stream_wrapper(response.body_iterator, data_items),
-                    )
+            # If it's a streaming response, inject data_items as SSE events or NDJSON lines
+            # right after the response starts; token chunks are passed through as-is
+            send = prepend_stream_chunks(
+                send,
+                {
+                    "text/event-stream": [
+                        b"data: " + orjson.dumps(item) + b"\n\n" for item in data_items
+                    ],
+                    "application/x-ndjson": [
+                        orjson.dumps(item) + b"\n" for item in data_items
+                    ],
+                },
+            )
 
-                return response
-            else:
-                return response
+            return await self.app(
+                with_body_headers(scope, body_bytes),
+                replay_receive(body_bytes, receive),
+                send,
+            )
 
         # If it's not a chat completion request, just pass it through
-        response = await call_next(request)
-        return response
-
-    async def _receive(self, body: bytes):
-        return {"type": "http.request", "body": body, "more_body": False}
-
-    async def openai_stream_wrapper(self, original_generator, data_items):
-        for item in data_items:
-            yield f"data: {json.dumps(item)}\n\n"
-
-        async for data in original_generator:
-            yield data
-
-    async def ollama_stream_wrapper(self, original_generator, data_items):
-        for item in data_items:
-            yield f"{json.dumps(item)}\n"
-
-        async for data in original_generator:
-            yield data
+        await self.app(scope, receive, send)
 
 
 app.add_middleware(ChatCompletionMiddleware)
@@ -846,52 +1015,45 @@ def filter_pipeline(payload, user):
     return payload
 
 
-class PipelineMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "POST" and (
-            "/ollama/api/chat" in request.url.path
-            or "/chat/completions" in request.url.path
-        ):
-            log.debug(f"[__Pipeline Middleware__] request.url.path: {request.url.path}")
+class PipelineMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-            # Read the original request body
-            body = await request.body()
-            # Decode body to string
-            body_str = body.decode("utf-8")
-            # Parse string to JSON
-            data: dict = json.loads(body_str) if body_str else {}
-
-            user = get_current_user(
-                request,
-                get_http_authorization_cred(request.headers.get("Authorization")),
-            )
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if is_chat_completion_request(scope):
+            log.debug(f"[__Pipeline Middleware__] request.url.path: {scope['path']}")
 
-            try:
-                data = filter_pipeline(data, user)
-            except Exception as e:
-                return JSONResponse(
-                    status_code=e.args[0],
-                    content={"detail": e.args[1]},
+            # Read the original request body
+            body = await read_body(receive)
+            original_receive, receive = receive, replay_receive(body, receive)
+            # Parse bytes to JSON
+            data: dict = orjson.loads(body) if body else {}
+
+            model_id = data.get("model")
+            model = app.state.MODELS.get(model_id, {})
+
+            # Only re-serialize the body when a pipeline filter may rewrite it
+            if "pipeline" in model or len(get_sorted_filters(model_id)) > 0:
+                request = Request(scope, receive)
+                user = await get_current_user(
+                    request,
+                    get_http_authorization_cred(request.headers.get("Authorization")),
                 )
 
-            modified_body_bytes = json.dumps(data).encode("utf-8")
-            # Replace the request body with the modified one
-            request._body = modified_body_bytes
-            # Set custom header to ensure content-length matches new body length
-            request.headers.__dict__["_list"] = [
-                (b"content-length", str(len(modified_body_bytes)).encode("utf-8")),
-                *[
-                    (k, v)
-                    for k, v in request.headers.raw
-                    if k.lower() != b"content-length"
-                ],
-            ]
+                try:
+                    data = filter_pipeline(data, user)
+                except Exception as e:
+                    response = JSONResponse(
+                        status_code=e.args[0],
+                        content={"detail": e.args[1]},
+                    )
+                    return await response(scope, receive, send)
 
-        response = await call_next(request)
-        return response
+                body = orjson.dumps(data)
+                scope = with_body_headers(scope, body)
+                receive = replay_receive(body, original_receive)
 
-    async def _receive(self, body: bytes):
-        return {"type": "http.request", "body": body, "more_body": False}
+        await self.app(scope, receive, send)
 
 
 app.add_middleware(PipelineMiddleware)
@@ -906,35 +1068,111 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def commit_session_after_request(request: Request, call_next):
-    response = await call_next(request)
-    log.debug("Commit session after request")
-    Session.commit()
-    return response
+class CommitSessionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.app(scope, receive, send)
+        if scope["type"] == "http":
+            log.debug("Commit session after request")
+            Session.commit()
 
-@app.middleware("http")
-async def check_url(request: Request, call_next):
-    if len(app.state.MODELS) == 0:
-        await get_all_models()
-    else:
-        pass
 
-    start_time = int(time.time())
-    response = await call_next(request)
-    process_time = int(time.time()) - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+app.add_middleware(CommitSessionMiddleware)
+
+
+class CheckUrlMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if len(app.state.MODELS) == 0:
+            await get_all_models()
+
+        start_time = int(time.time())
+
+        async def send_with_process_time(message: Message):
+            if message["type"] == "http.response.start":
+                process_time = int(time.time()) - start_time
+                headers = MutableHeaders(raw=message["headers"])
+                headers["X-Process-Time"] = str(process_time)
+            await send(message)
+
+        await self.app(scope, receive, send_with_process_time)
+
+
+app.add_middleware(CheckUrlMiddleware)
+
+
+class UpdateEmbeddingFunctionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.app(scope, receive, send)
+        if scope["type"] == "http" and "/embedding/update" in scope["path"]:
+            webui_app.state.EMBEDDING_FUNCTION = rag_app.state.EMBEDDING_FUNCTION
 
-    return response
 
+app.add_middleware(UpdateEmbeddingFunctionMiddleware)
 
-@app.middleware("http")
-async def update_embedding_function(request: Request, call_next):
-    response = await call_next(request)
-    if "/embedding/update" in request.url.path:
-        webui_app.state.EMBEDDING_FUNCTION = rag_app.state.EMBEDDING_FUNCTION
-    return response
+
+def on_embedding_migrated():
+    # The embedding model changes once the collections are re-embedded
+    webui_app.state.EMBEDDING_FUNCTION = rag_app.state.EMBEDDING_FUNCTION
+    webui_app.state.MEMORY_INDEX.rebuild_all()
+
+
+rag_app.state.EMBEDDING_MIGRATION.listeners.append(on_embedding_migrated)
+
+
+# Routes whose uploads are bounded by UPLOAD_MAX_FILE_SIZE
+UPLOAD_PATHS = [
+    "/api/v1/files/",
+    "/rag/api/v1/doc",
+    "/audio/api/v1/transcriptions",
+]
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject uploads that declare a Content-Length over UPLOAD_MAX_FILE_SIZE before
+    their multipart body is read. Bodies without one are bounded while they are
+    copied to disk, see save_upload_file.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            UPLOAD_MAX_FILE_SIZE is not None
+            and scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] in UPLOAD_PATHS
+        ):
+            content_length = MutableHeaders(scope=scope).get("content-length")
+            if (
+                content_length
+                and content_length.isdigit()
+                and int(content_length) > UPLOAD_MAX_FILE_SIZE
+            ):
+                response = JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={
+                        "detail": ERROR_MESSAGES.FILE_TOO_LARGE(UPLOAD_MAX_FILE_SIZE)
+                    },
+                )
+                return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
 
 
 ##################################
@@ -989,14 +1227,16 @@ async def get_all_models():
     models = pipe_models + openai_models + ollama_models
     log.debug(f"MODELS = {models}")
     global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
+        function.id for function in await Functions.get_global_action_functions_async()
     ]
     enabled_action_ids = [
         function.id
-        for function in Functions.get_functions_by_type("action", active_only=True)
+        for function in await Functions.get_functions_by_type_async(
+            "action", active_only=True
+        )
     ]
 
-    custom_models = Models.get_all_models()
+    custom_models = await Models.get_all_models_async()
     for custom_model in custom_models:
         if custom_model.base_model_id == None:
             for model in models:
@@ -1019,7 +1259,7 @@ async def get_all_models():
 
                     model["actions"] = []
                     for action_id in action_ids:
-                        action = Functions.get_function_by_id(action_id)
+                        action = await Functions.get_function_by_id_async(action_id)
                         model["actions"].append(
                             {
                                 "id": action_id,
@@ -1053,16 +1293,16 @@ async def get_all_models():
                         if action_id in enabled_action_ids
                     ]
 
-                    actions = [
-                        {
-                            "id": action_id,
-                            "name": Functions.get_function_by_id(action_id).name,
-                            "description": Functions.get_function_by_id(
-                                action_id
-                            ).meta.description,
-                        }
-                        for action_id in action_ids
-                    ]
+                    actions = []
+                    for action_id in action_ids:
+                        action = await Functions.get_function_by_id_async(action_id)
+                        actions.append(
+                            {
+                                "id": action_id,
+                                "name": action.name,
+                                "description": action.meta.description,
+                            }
+                        )
                     break
 
             models.append(
@@ -1218,19 +1458,20 @@ async def chat_completed(form_data: dict, user=Depends(get_verified_user)):
     )
 
     def get_priority(function_id):
-        function = Functions.get_function_by_id(function_id)
-        if function is not None and hasattr(function, "valves"):
-            return (function.valves if function.valves else {}).get("priority", 0)
-        return 0
+        return webui_app.state.FUNCTIONS.get_valves(function_id).get("priority", 0)
 
-    filter_ids = [function.id for function in Functions.get_global_filter_functions()]
+    filter_ids = [
+        function.id for function in await Functions.get_global_filter_functions_async()
+    ]
     if "info" in model and "meta" in model["info"]:
         filter_ids.extend(model["info"]["meta"].get("filterIds", []))
         filter_ids = list(set(filter_ids))
 
     enabled_filter_ids = [
         function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
+        for function in await Functions.get_functions_by_type_async(
+            "filter", active_only=True
+        )
     ]
     filter_ids = [
         filter_id for filter_id in filter_ids if filter_id in enabled_filter_ids
@@ -1240,21 +1481,7 @@ async def chat_completed(form_data: dict, user=Depends(get_verified_user)):
     filter_ids.sort(key=get_priority)
 
     for filter_id in filter_ids:
-        filter = Functions.get_function_by_id(filter_id)
-        if not filter:
-            continue
-
-        if filter_id in webui_app.state.FUNCTIONS:
-            function_module = webui_app.state.FUNCTIONS[filter_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(filter_id)
-            webui_app.state.FUNCTIONS[filter_id] = function_module
-
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
+        function_module = webui_app.state.FUNCTIONS.get_module(filter_id)
 
         if not hasattr(function_module, "outlet"):
             continue
@@ -1317,7 +1544,7 @@ async def chat_completed(form_data: dict, user=Depends(get_verified_user)):
 async def chat_completed(
     action_id: str, form_data: dict, user=Depends(get_verified_user)
 ):
-    action = Functions.get_function_by_id(action_id)
+    action = await Functions.get_function_by_id_async(action_id)
     if not action:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1348,15 +1575,7 @@ async def chat_completed(
         }
     )
 
-    if action_id in webui_app.state.FUNCTIONS:
-        function_module = webui_app.state.FUNCTIONS[action_id]
-    else:
-        function_module, _, _ = load_function_module_by_id(action_id)
-        webui_app.state.FUNCTIONS[action_id] = function_module
-
-    if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-        valves = Functions.get_function_valves_by_id(action_id)
-        function_module.valves = function_module.Valves(**(valves if valves else {}))
+    function_module = webui_app.state.FUNCTIONS.get_module(action_id)
 
     if hasattr(function_module, "action"):
         try:
@@ -7,7 +7,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from apps.webui.models.auths import Auth
-from apps.webui.models.chats import Chat
+from apps.webui.models.chats import Chat, ChatMessage
 from apps.webui.models.documents import Document
 from apps.webui.models.memories import Memory
 from apps.webui.models.models import Model
@@ -7,3 +7,10 @@ def get_existing_tables():
     inspector = Inspector.from_engine(con)
     tables = set(inspector.get_table_names())
     return tables
+
+
+def get_existing_indexes(table_name: str):
+    con = op.get_bind()
+    inspector = Inspector.from_engine(con)
+    indexes = set(index["name"] for index in inspector.get_indexes(table_name))
+    return indexes
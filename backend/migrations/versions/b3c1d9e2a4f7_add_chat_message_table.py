@@ -0,0 +1,189 @@
+"""add chat message table
+
+Revision ID: b3c1d9e2a4f7
+Revises: faf78b4cb9e1
+Create Date: 2026-10-19 10:41:07.219842
+
+"""
+
+import hashlib
+import json
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.util import get_existing_tables
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3c1d9e2a4f7"
+down_revision: Union[str, None] = "faf78b4cb9e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+chat_table = sa.table(
+    "chat",
+    sa.column("id", sa.String()),
+    sa.column("chat", sa.Text()),
+)
+
+chat_message_table = sa.table(
+    "chat_message",
+    sa.column("chat_id", sa.String()),
+    sa.column("id", sa.String()),
+    sa.column("message", sa.Text()),
+    sa.column("content_hash", sa.String()),
+    sa.column("updated_at", sa.BigInteger()),
+)
+
+
+# Frozen copies of the apps.webui.models.chats helpers as of this revision, so
+# that later changes to them don't change what this migration does
+
+
+def split_chat_messages(chat: dict) -> tuple[dict, dict]:
+    history = chat.get("history")
+    if not isinstance(history, dict) or not isinstance(history.get("messages"), dict):
+        return chat, {}
+
+    messages = history["messages"]
+    skeleton_history = {k: v for k, v in history.items() if k != "messages"}
+    skeleton = {
+        **chat,
+        "history": {**skeleton_history, "message_ids": list(messages.keys())},
+    }
+
+    if isinstance(chat.get("messages"), list):
+        skeleton["messages"] = [
+            (
+                message["id"]
+                if isinstance(message, dict)
+                and messages.get(message.get("id")) == message
+                else message
+            )
+            for message in chat["messages"]
+        ]
+
+    return skeleton, messages
+
+
+def join_chat_messages(skeleton: dict, messages: dict) -> dict:
+    if not (
+        isinstance(skeleton.get("history"), dict)
+        and "message_ids" in skeleton["history"]
+    ):
+        return skeleton
+
+    history = {k: v for k, v in skeleton["history"].items() if k != "message_ids"}
+    chat = {
+        **skeleton,
+        "history": {
+            **history,
+            "messages": {
+                id: messages[id]
+                for id in skeleton["history"]["message_ids"]
+                if id in messages
+            },
+        },
+    }
+
+    if isinstance(skeleton.get("messages"), list):
+        chat["messages"] = [
+            messages.get(message) if isinstance(message, str) else message
+            for message in skeleton["messages"]
+        ]
+
+    return chat
+
+
+def get_message_hash(message: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(message, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def iter_chat_batches(con):
+    last_id = ""
+    while True:
+        rows = con.execute(
+            sa.select(chat_table.c.id, chat_table.c.chat)
+            .where(chat_table.c.id > last_id)
+            .order_by(chat_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if "chat_message" not in set(get_existing_tables()):
+        op.create_table(
+            "chat_message",
+            sa.Column("chat_id", sa.String(), nullable=False),
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("message", sa.Text(), nullable=True),
+            sa.Column("content_hash", sa.String(), nullable=True),
+            sa.Column("updated_at", sa.BigInteger(), nullable=True),
+            sa.PrimaryKeyConstraint("chat_id", "id"),
+        )
+
+    # Move the messages of existing chats into chat_message
+    con = op.get_bind()
+    for rows in iter_chat_batches(con):
+        message_rows = []
+        for row in rows:
+            skeleton, messages = split_chat_messages(json.loads(row.chat))
+            if not messages:
+                continue
+
+            con.execute(
+                chat_table.update()
+                .where(chat_table.c.id == row.id)
+                .values(chat=json.dumps(skeleton))
+            )
+            message_rows.extend(
+                {
+                    "chat_id": row.id,
+                    "id": id,
+                    "message": json.dumps(message),
+                    "content_hash": get_message_hash(message),
+                    "updated_at": int(time.time()),
+                }
+                for id, message in messages.items()
+            )
+
+        if message_rows:
+            con.execute(chat_message_table.insert(), message_rows)
+
+
+def downgrade() -> None:
+    # Fold the messages back into the chat JSON before dropping the table
+    con = op.get_bind()
+    for rows in iter_chat_batches(con):
+        chat_ids = [row.id for row in rows]
+        messages = {id: {} for id in chat_ids}
+        for chat_id, id, message in con.execute(
+            sa.select(
+                chat_message_table.c.chat_id,
+                chat_message_table.c.id,
+                chat_message_table.c.message,
+            ).where(chat_message_table.c.chat_id.in_(chat_ids))
+        ):
+            messages[chat_id][id] = json.loads(message)
+
+        for row in rows:
+            skeleton = json.loads(row.chat)
+            chat = join_chat_messages(skeleton, messages[row.id])
+            if chat is not skeleton:
+                con.execute(
+                    chat_table.update()
+                    .where(chat_table.c.id == row.id)
+                    .values(chat=json.dumps(chat))
+                )
+
+    op.drop_table("chat_message")
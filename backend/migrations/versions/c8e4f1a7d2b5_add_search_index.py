@@ -0,0 +1,278 @@
+"""add search index
+
+Revision ID: c8e4f1a7d2b5
+Revises: b3c1d9e2a4f7
+Create Date: 2026-10-19 11:58:23.604117
+
+"""
+
+import hashlib
+import json
+from typing import List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.util import get_existing_tables
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e4f1a7d2b5"
+down_revision: Union[str, None] = "b3c1d9e2a4f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+# The schema, indexed text and inserts below are frozen copies of
+# apps.webui.models.search as of this revision, so that later changes to
+# it don't change what this migration does
+
+SEARCH_INDEX_DDL = {
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            entity_type UNINDEXED,
+            entity_id UNINDEXED,
+            user_id UNINDEXED,
+            title,
+            body,
+            tokenize = 'porter unicode61'
+        )
+        """,
+    ],
+    "postgresql": [
+        """
+        CREATE TABLE IF NOT EXISTS search_index (
+            entity_type VARCHAR NOT NULL,
+            entity_id VARCHAR NOT NULL,
+            user_id VARCHAR,
+            title TEXT,
+            body TEXT,
+            tsv TSVECTOR,
+            PRIMARY KEY (entity_type, entity_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS search_index_tsv_idx
+        ON search_index USING GIN (tsv)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS search_index_user_id_idx
+        ON search_index (entity_type, user_id)
+        """,
+    ],
+}
+
+SEARCH_INDEX_INSERT = {
+    "sqlite": """
+        INSERT INTO search_index
+            (rowid, entity_type, entity_id, user_id, title, body)
+        VALUES (:rowid, :entity_type, :entity_id, :user_id, :title, :body)
+    """,
+    "postgresql": """
+        INSERT INTO search_index
+            (entity_type, entity_id, user_id, title, body, tsv)
+        VALUES (
+            :entity_type, :entity_id, :user_id, :title, :body,
+            setweight(to_tsvector('english', :title), 'A')
+            || setweight(to_tsvector('english', :body), 'B')
+        )
+        ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            title = EXCLUDED.title,
+            body = EXCLUDED.body,
+            tsv = EXCLUDED.tsv
+    """,
+}
+
+
+def collect_text(value) -> List[str]:
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in collect_text(item)]
+    if isinstance(value, list):
+        return [text for item in value for text in collect_text(item)]
+    return []
+
+
+def get_chat_search_text(chat: dict) -> Tuple[str, str]:
+    history = chat.get("history") if isinstance(chat.get("history"), dict) else {}
+    messages = history.get("messages")
+    if isinstance(messages, dict):
+        messages = list(messages.values())
+    elif not isinstance(messages, list):
+        messages = (
+            chat.get("messages") if isinstance(chat.get("messages"), list) else []
+        )
+
+    body = [
+        message["content"]
+        for message in messages
+        if isinstance(message, dict) and isinstance(message.get("content"), str)
+    ]
+    return chat.get("title", "New Chat"), "\n".join(body)
+
+
+def get_article_search_text(
+    title: str, objective: Optional[str], steps: Optional[list]
+) -> Tuple[str, str]:
+    return title, "\n".join([objective or "", *collect_text(steps or [])])
+
+
+def get_fts5_rowid(type: str, id: str) -> int:
+    digest = hashlib.sha256(f"{type}:{id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def index_many(con, type: str, entries: List[Tuple[str, str, str, Optional[str]]]):
+    """Insert (id, title, body, user_id) entries of an entity type."""
+    if len(entries) == 0:
+        return
+    con.execute(
+        sa.text(SEARCH_INDEX_INSERT[con.dialect.name]),
+        [
+            {
+                "rowid": get_fts5_rowid(type, id),
+                "entity_type": type,
+                "entity_id": id,
+                "user_id": user_id,
+                "title": title or "",
+                "body": body or "",
+            }
+            for id, title, body, user_id in entries
+        ],
+    )
+
+
+# Frozen copy of apps.webui.models.chats.join_chat_messages as of this
+# revision, so that later changes to it don't change what this migration does
+def join_chat_messages(skeleton: dict, messages: dict) -> dict:
+    if not (
+        isinstance(skeleton.get("history"), dict)
+        and "message_ids" in skeleton["history"]
+    ):
+        return skeleton
+
+    history = {k: v for k, v in skeleton["history"].items() if k != "message_ids"}
+    chat = {
+        **skeleton,
+        "history": {
+            **history,
+            "messages": {
+                id: messages[id]
+                for id in skeleton["history"]["message_ids"]
+                if id in messages
+            },
+        },
+    }
+
+    if isinstance(skeleton.get("messages"), list):
+        chat["messages"] = [
+            messages.get(message) if isinstance(message, str) else message
+            for message in skeleton["messages"]
+        ]
+
+    return chat
+
+
+def iter_batches(con, table: str, key: str, columns: list):
+    """Rows of a table in batches of BATCH_SIZE, ordered by its `key` column."""
+    last_key = ""
+    while True:
+        rows = con.execute(
+            sa.text(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {key} > :last_key "
+                f"ORDER BY {key} LIMIT :limit"
+            ),
+            {"last_key": last_key, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_key = getattr(rows[-1], key)
+
+
+def index_chats(con):
+    for rows in iter_batches(con, "chat", "id", ["id", "user_id", "chat"]):
+        rows = [row for row in rows if not row.user_id.startswith("shared-")]
+        chat_ids = [row.id for row in rows]
+        if not chat_ids:
+            continue
+
+        messages = {id: {} for id in chat_ids}
+        for chat_id, id, message in con.execute(
+            sa.text(
+                "SELECT chat_id, id, message FROM chat_message "
+                "WHERE chat_id IN :chat_ids"
+            ).bindparams(sa.bindparam("chat_ids", expanding=True)),
+            {"chat_ids": chat_ids},
+        ):
+            messages[chat_id][id] = json.loads(message)
+
+        index_many(
+            con,
+            "chat",
+            [
+                (
+                    row.id,
+                    *get_chat_search_text(
+                        join_chat_messages(json.loads(row.chat), messages[row.id])
+                    ),
+                    row.user_id,
+                )
+                for row in rows
+            ],
+        )
+
+
+def index_articles(con):
+    for rows in iter_batches(
+        con, "articles", "id", ["id", "title", "objective", "steps"]
+    ):
+        index_many(
+            con,
+            "article",
+            [
+                (
+                    row.id,
+                    *get_article_search_text(
+                        row.title,
+                        row.objective,
+                        json.loads(row.steps) if row.steps else [],
+                    ),
+                    None,
+                )
+                for row in rows
+            ],
+        )
+
+
+def index_documents(con):
+    for rows in iter_batches(con, "document", "name", ["name", "title"]):
+        index_many(
+            con, "document", [(row.name, row.title, row.name, None) for row in rows]
+        )
+
+
+def upgrade() -> None:
+    con = op.get_bind()
+    existing_tables = set(get_existing_tables())
+
+    for statement in SEARCH_INDEX_DDL.get(con.dialect.name, []):
+        op.execute(statement)
+
+    if con.dialect.name not in SEARCH_INDEX_DDL:
+        return
+
+    # Index the rows that already exist
+    if "chat" in existing_tables:
+        index_chats(con)
+    if "articles" in existing_tables:
+        index_articles(con)
+    if "document" in existing_tables:
+        index_documents(con)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS search_index")
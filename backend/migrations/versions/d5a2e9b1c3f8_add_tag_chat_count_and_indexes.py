@@ -0,0 +1,74 @@
+"""add tag chat count and indexes
+
+Revision ID: d5a2e9b1c3f8
+Revises: c8e4f1a7d2b5
+Create Date: 2026-10-19 14:06:51.881230
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.util import get_existing_indexes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a2e9b1c3f8"
+down_revision: Union[str, None] = "c8e4f1a7d2b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table name, columns, unique)
+INDEXES = [
+    # A user has one tag of each name, concurrent taggings don't duplicate it
+    ("tag_user_id_name_idx", "tag", ["user_id", "name"], True),
+    ("chatidtag_user_id_tag_name_idx", "chatidtag", ["user_id", "tag_name"], False),
+    ("chatidtag_user_id_chat_id_idx", "chatidtag", ["user_id", "chat_id"], False),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = [column["name"] for column in inspector.get_columns("tag")]
+    if "chat_count" not in columns:
+        op.add_column(
+            "tag",
+            sa.Column(
+                "chat_count", sa.BigInteger(), nullable=False, server_default="0"
+            ),
+        )
+
+    # Keep one of the tags created twice before the unique index existed, chat
+    # tags reference tags by name so none is lost. The derived table is
+    # materialized first, MySQL can't select from the table it deletes from.
+    op.execute(
+        """
+        DELETE FROM tag WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT MIN(id) AS id FROM tag GROUP BY user_id, name
+            ) AS kept_tags
+        )
+        """
+    )
+
+    for name, table_name, columns, unique in INDEXES:
+        if name not in get_existing_indexes(table_name):
+            op.create_index(name, table_name, columns, unique=unique)
+
+    # Count the chats already tagged with each tag
+    op.execute(
+        """
+        UPDATE tag SET chat_count = (
+            SELECT COUNT(*) FROM chatidtag
+            WHERE chatidtag.user_id = tag.user_id
+            AND chatidtag.tag_name = tag.name
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    for name, table_name, _, _ in INDEXES:
+        op.drop_index(name, table_name=table_name)
+    op.drop_column("tag", "chat_count")
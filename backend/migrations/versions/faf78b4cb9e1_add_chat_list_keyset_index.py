@@ -0,0 +1,33 @@
+"""add chat list keyset index
+
+Revision ID: faf78b4cb9e1
+Revises: ae27a221d59f
+Create Date: 2026-10-19 09:12:40.518334
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.util import get_existing_indexes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "faf78b4cb9e1"
+down_revision: Union[str, None] = "ae27a221d59f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "chat_user_id_updated_at_id_idx" not in get_existing_indexes("chat"):
+        op.create_index(
+            "chat_user_id_updated_at_id_idx",
+            "chat",
+            ["user_id", "updated_at", "id"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("chat_user_id_updated_at_id_idx", table_name="chat")
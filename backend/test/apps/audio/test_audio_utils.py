@@ -0,0 +1,179 @@
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from apps.audio.utils import SpeechCache, WhisperModelPool, get_speech_cache_key
+
+
+async def read(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+def put_file(cache: SpeechCache, key: str, data: bytes):
+    tmp_path = cache.cache_dir.joinpath(f"{key}.tmp")
+    tmp_path.write_bytes(data)
+    cache.put(key, tmp_path, {"input": key})
+
+
+class TestSpeechCache:
+    def test_concurrent_requests_share_upstream(self, tmp_path):
+        cache = SpeechCache(tmp_path)
+        body = {"input": "Hello  world", "voice": "alloy"}
+        key = get_speech_cache_key(body)
+        calls = []
+        release = threading.Event()
+
+        def open_stream():
+            calls.append(key)
+            # Held until every request is attached
+            release.wait(5)
+            return iter([b"abc", b"", b"def"])
+
+        async def run():
+            async def request():
+                return await read(await cache.fetch(key, body, open_stream))
+
+            requests = [asyncio.create_task(request()) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            assert cache.get_stats()["in_flight"] == 1
+            release.set()
+            return await asyncio.gather(*requests)
+
+        assert asyncio.run(run()) == [b"abcdef"] * 3
+        assert len(calls) == 1
+        assert cache.get(key).read_bytes() == b"abcdef"
+        assert cache.get_stats()["in_flight"] == 0
+        # The same text formatted differently is the same audio
+        assert get_speech_cache_key({**body, "input": "Hello world"}) == key
+
+    def test_error_mid_stream(self, tmp_path):
+        cache = SpeechCache(tmp_path)
+        body = {"input": "Hello"}
+        key = get_speech_cache_key(body)
+
+        def open_stream():
+            def chunks():
+                yield b"abc"
+                time.sleep(0.1)
+                raise ConnectionError("upstream went away")
+
+            return chunks()
+
+        async def run():
+            async def request():
+                stream = await cache.fetch(key, body, open_stream)
+                received = []
+                with pytest.raises(ConnectionError):
+                    async for chunk in stream:
+                        received.append(chunk)
+                return received
+
+            return await asyncio.gather(request(), request())
+
+        # Every request gets what arrived, then the error
+        assert asyncio.run(run()) == [[b"abc"], [b"abc"]]
+        assert cache.get(key) is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_error_opening_stream(self, tmp_path):
+        cache = SpeechCache(tmp_path)
+
+        def open_stream():
+            raise ValueError("invalid voice")
+
+        async def run():
+            with pytest.raises(ValueError):
+                await cache.fetch("key", {}, open_stream)
+
+        asyncio.run(run())
+        assert cache.get_stats()["in_flight"] == 0
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = SpeechCache(tmp_path, max_size=10)
+        put_file(cache, "a", b"1234")
+        put_file(cache, "b", b"1234")
+
+        # Reading a makes b the least recently used
+        assert cache.get("a") is not None
+        put_file(cache, "c", b"1234")
+
+        assert cache.get("b") is None
+        assert not tmp_path.joinpath("b.mp3").exists()
+        assert not tmp_path.joinpath("b.json").exists()
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.get_stats()["size"] == 8
+
+    def test_expires_entries(self, tmp_path):
+        cache = SpeechCache(tmp_path, ttl=60)
+        put_file(cache, "a", b"1234")
+        put_file(cache, "b", b"1234")
+
+        size, _ = cache.entries["a"]
+        cache.entries["a"] = (size, time.time() - 120)
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        assert cache.get_stats() == {
+            "files": 1,
+            "size": 4,
+            "max_size": None,
+            "ttl": 60,
+            "in_flight": 0,
+        }
+
+    def test_load_recovers_after_crash(self, tmp_path):
+        cache = SpeechCache(tmp_path, ttl=60)
+        put_file(cache, "old", b"1234")
+        put_file(cache, "new", b"5678")
+        old_time = time.time() - 120
+        os.utime(tmp_path.joinpath("old.mp3"), (old_time, old_time))
+        # Written by a request in progress when the server stopped
+        tmp_path.joinpath("partial.0123.tmp").write_bytes(b"12")
+
+        cache = SpeechCache(tmp_path, ttl=60)
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "new.json",
+            "new.mp3",
+        ]
+        assert cache.get("new").read_bytes() == b"5678"
+        assert cache.get_stats()["size"] == 4
+
+
+class FakeWhisperModel:
+    def transcribe(self, file_path, **kwargs):
+        info = SimpleNamespace(language="en", language_probability=1.0)
+        return iter([f"{file_path} {i}" for i in range(3)]), info
+
+
+class TestWhisperModelPool:
+    def test_queue_and_early_close(self):
+        pool = WhisperModelPool({}, workers=1, queue_size=1)
+        pool.model = FakeWhisperModel()
+
+        async def run():
+            first = pool.transcribe("first")
+            assert await first.__anext__() == "first 0"
+            assert pool.get_stats()["running"] == 1
+            assert not pool.is_full()
+
+            # Waits for the only worker, which fills the queue
+            second = pool.transcribe("second")
+            waiting = asyncio.create_task(second.__anext__())
+            await asyncio.sleep(0.05)
+            assert pool.get_stats()["waiting"] == 1
+            assert pool.is_full()
+
+            # Closing a transcription early frees its worker
+            await first.aclose()
+            assert await waiting == "second 0"
+            assert not pool.is_full()
+            assert [segment async for segment in second] == ["second 1", "second 2"]
+
+            assert pool.get_stats()["running"] == 0
+            assert not pool.semaphore.locked()
+
+        asyncio.run(run())
@@ -0,0 +1,63 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from apps.images.utils.store import ImageStore
+
+
+@pytest.fixture
+def client(tmp_path):
+    from apps.images.main import app
+
+    images = app.state.IMAGES
+    app.state.IMAGES = ImageStore(tmp_path)
+    yield TestClient(app)
+    app.state.IMAGES = images
+
+
+def make_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestGenerations:
+    def test_etag(self, client):
+        data = make_png()
+        filename = client.app.state.IMAGES.save(data, "image/png", {})
+
+        response = client.get(f"/generations/{filename}")
+        assert response.status_code == 200
+        assert response.content == data
+        assert "immutable" in response.headers["cache-control"]
+        etag = response.headers["etag"]
+
+        response = client.get(
+            f"/generations/{filename}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = client.get(f"/generations/{filename}/thumbnail")
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        response = client.get(
+            f"/generations/{filename}/thumbnail",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert response.status_code == 304
+
+    def test_thumbnail_fallback(self, client):
+        # Not an image Pillow can read, served as is
+        filename = client.app.state.IMAGES.save(b"not an image", "image/png", {})
+
+        response = client.get(f"/generations/{filename}/thumbnail")
+        assert response.status_code == 200
+        assert response.content == b"not an image"
+
+    def test_not_found(self, client):
+        assert client.get(f"/generations/{'0' * 64}.png").status_code == 404
+        assert client.get(f"/generations/{'0' * 64}.png/thumbnail").status_code == 404
+        assert client.get("/generations/notes.txt").status_code == 404
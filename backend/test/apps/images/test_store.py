@@ -0,0 +1,110 @@
+import hashlib
+import io
+import json
+
+from PIL import Image
+
+from apps.images.utils.store import ImageStore
+
+
+def make_png(color, size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestImageStore:
+    def test_deduplicates_images(self, tmp_path):
+        store = ImageStore(tmp_path)
+        data = make_png("red")
+
+        filename = store.save(data, "image/png", {"prompt": "a"})
+        size = store.get_stats()["size"]
+        assert filename == f"{hashlib.sha256(data).hexdigest()}.png"
+
+        # The same image is stored once, with the latest generation parameters
+        assert store.save(data, "image/png", {"prompt": "b"}) == filename
+        assert store.get_stats()["images"] == 1
+        assert store.get_stats()["size"] == size
+        assert json.loads(store.get_metadata_path(filename).read_text()) == {
+            "prompt": "b"
+        }
+        assert len([path for path in tmp_path.iterdir() if path.is_file()]) == 2
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        images = [make_png(color) for color in ["red", "green", "blue"]]
+        store = ImageStore(tmp_path)
+        first, second = [store.save(data, "image/png", {}) for data in images[:2]]
+
+        # Room for the first and third images, reading the first makes the
+        # second the oldest
+        scratch = ImageStore(tmp_path.joinpath("scratch"))
+        store.max_size = store.get_entry_size(first) + scratch.get_entry_size(
+            scratch.save(images[2], "image/png", {})
+        )
+        assert store.get(first) is not None
+        third = store.save(images[2], "image/png", {})
+
+        assert store.get(second) is None
+        assert not tmp_path.joinpath(second).exists()
+        assert not store.get_thumbnail_path(second).exists()
+        assert store.get(first) is not None
+        assert store.get(third) is not None
+        assert store.get_stats()["size"] <= store.max_size
+
+    def test_shared_between_workers(self, tmp_path):
+        worker_a = ImageStore(tmp_path)
+        worker_b = ImageStore(tmp_path)
+
+        filename = worker_a.save(make_png("red"), "image/png", {})
+        assert worker_b.get(filename) == tmp_path.joinpath(filename)
+        assert worker_b.get_stats()["images"] == 1
+
+        # Evicted by the other worker
+        with worker_a.lock:
+            worker_a.remove(filename)
+        assert worker_b.get(filename) is None
+        assert worker_b.get_stats() == {"images": 0, "size": 0, "max_size": None}
+
+    def test_rejects_other_filenames(self, tmp_path):
+        store = ImageStore(tmp_path)
+        filename = store.save(make_png("red"), "image/png", {})
+        tmp_path.joinpath("notes.txt").write_text("")
+
+        assert store.get("3fa85f64-5717-4562-b3fc-2c963f66afa6.png") is None
+        for name in [
+            "notes.txt",
+            f"{filename}.json",
+            f"../{tmp_path.name}/{filename}",
+            f"{filename}\n",
+        ]:
+            assert store.get(name) is None
+
+    def test_loads_legacy_images(self, tmp_path):
+        legacy = "3fa85f64-5717-4562-b3fc-2c963f66afa6.png"
+        tmp_path.joinpath(legacy).write_bytes(make_png("red"))
+        tmp_path.joinpath(f"{legacy}.1234.tmp").write_bytes(b"partial")
+
+        store = ImageStore(tmp_path)
+        assert store.get(legacy) == tmp_path.joinpath(legacy)
+        assert not tmp_path.joinpath(f"{legacy}.1234.tmp").exists()
+
+        # Thumbnails of images stored before thumbnails existed are created on
+        # first access
+        assert not store.get_thumbnail_path(legacy).exists()
+        thumbnail_path = store.get_thumbnail(legacy)
+        with Image.open(thumbnail_path) as thumbnail:
+            assert thumbnail.format == "WEBP"
+        assert store.get_stats()["size"] == store.get_entry_size(legacy)
+
+    def test_thumbnail(self, tmp_path):
+        store = ImageStore(tmp_path, thumbnail_size=16)
+
+        filename = store.save(make_png("red", (64, 32)), "image/png", {})
+        with Image.open(store.get_thumbnail(filename)) as thumbnail:
+            assert thumbnail.size == (16, 8)
+
+        # Not an image Pillow can read
+        filename = store.save(b"not an image", "image/png", {})
+        assert store.get_thumbnail(filename) is None
+        assert store.get(filename) is not None
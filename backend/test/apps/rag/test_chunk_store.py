@@ -0,0 +1,85 @@
+from apps.rag.chunk_store import ChunkEmbeddingStore, get_chunk_hash
+
+
+def get_hashes(*texts):
+    return [get_chunk_hash(text) for text in texts]
+
+
+class TestChunkEmbeddingStore:
+    def test_stores_embeddings_by_model(self, tmp_path):
+        store = ChunkEmbeddingStore(tmp_path / "chunks" / "chunks.db")
+        a, b = get_hashes("a", "b")
+
+        store.add("collection-1", "model-1", [a, b], [[1.0, 2.0], [3.0, 4.0]])
+
+        assert store.get_many("model-1", [a, b, a]) == {
+            a: [1.0, 2.0],
+            b: [3.0, 4.0],
+        }
+        assert store.get_many("model-2", [a, b]) == {}
+        # A chunk stored before keeps its embedding
+        store.add("collection-2", "model-1", [a], [[9.0, 9.0]])
+        assert store.get_many("model-1", [a]) == {a: [1.0, 2.0]}
+
+    def test_counts_repeated_chunks(self, tmp_path):
+        store = ChunkEmbeddingStore(tmp_path / "chunks.db")
+        a, b = get_hashes("a", "b")
+
+        # A chunk repeated within a document is held once per occurrence
+        store.add("collection-1", "model", [a, b, a], [[1.0], [2.0], [1.0]])
+        store.add("collection-2", "model", [a], [[1.0]])
+        assert store.get_stats() == {
+            "chunks": 2,
+            "referenced_chunks": 2,
+            "collections": 2,
+            "references": 4,
+        }
+
+        assert store.release("collection-1") == 3
+        assert store.collect_garbage() == 1
+        # Still held by the other collection
+        assert store.get_many("model", [a, b]) == {a: [1.0]}
+
+        assert store.release("collection-2") == 1
+        assert store.release("collection-2") == 0
+        assert store.collect_garbage() == 1
+        assert store.get_stats()["chunks"] == 0
+
+    def test_overwrite_keeps_shared_chunks(self, tmp_path):
+        store = ChunkEmbeddingStore(tmp_path / "chunks.db")
+        a, b, c = get_hashes("a", "b", "c")
+        store.add("collection", "model", [a, b], [[1.0], [2.0]])
+
+        # As an overwrite does it: the old references are released before the
+        # new ones are added, and garbage collected after
+        store.release("collection")
+        assert store.get_many("model", [a]) == {a: [1.0]}
+        store.add("collection", "model", [a, c], [[1.0], [3.0]])
+        assert store.collect_garbage() == 1
+
+        assert store.get_many("model", [a, b, c]) == {a: [1.0], c: [3.0]}
+        assert store.get_stats()["references"] == 2
+
+    def test_collect_garbage(self, tmp_path):
+        store = ChunkEmbeddingStore(tmp_path / "chunks.db")
+        a, b = get_hashes("a", "b")
+        store.add("collection-1", "model-1", [a], [[1.0]])
+        store.add("collection-2", "model-2", [a, b], [[2.0], [3.0]])
+
+        assert store.collect_garbage() == 0
+        store.release("collection-2")
+        assert store.collect_garbage() == 2
+        assert store.collect_garbage() == 0
+
+        assert store.get_many("model-1", [a]) == {a: [1.0]}
+        assert store.get_many("model-2", [a, b]) == {}
+
+    def test_rename(self, tmp_path):
+        store = ChunkEmbeddingStore(tmp_path / "chunks.db")
+        [a] = get_hashes("a")
+        store.add("shadow", "model", [a], [[1.0]])
+
+        store.rename("shadow", "collection")
+        assert store.release("shadow") == 0
+        assert store.release("collection") == 1
+        assert store.collect_garbage() == 1
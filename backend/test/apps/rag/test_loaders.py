@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from apps.rag.loaders import (
+    DocumentLoader,
+    DocumentParserPool,
+    DocumentParserTimeoutError,
+)
+
+
+def make_pdf(path, pages: int):
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for i in range(pages):
+        page = writer.add_blank_page(200, 200)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/Font"): DictionaryObject(
+                    {NameObject("/F1"): writer._add_object(font)}
+                )
+            }
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 100 Td (Page {i}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(path)
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    pool = DocumentParserPool(workers=2, timeout=2, pdf_pages_per_job=3)
+    yield pool
+    pool.shutdown()
+
+
+class TestDocumentParserPool:
+    def test_runs_jobs_in_processes(self, pool):
+        assert pool.run([(len, "a"), (len, "ab"), (len, "abc")]) == [1, 2, 3]
+
+    def test_pdf_pages_match_pypdf_loader(self, pool, tmp_path):
+        path = make_pdf(tmp_path / "document.pdf", 8)
+
+        documents = DocumentLoader(pool, "PyPDFLoader", path).load()
+        expected = PyPDFLoader(path).load()
+
+        assert [document.page_content for document in documents] == [
+            document.page_content for document in expected
+        ]
+        assert [document.metadata for document in documents] == [
+            document.metadata for document in expected
+        ]
+        assert documents[7].page_content == "Page 7"
+
+    def test_timeout_restarts_pool(self, pool):
+        start_time = time.monotonic()
+        with pytest.raises(DocumentParserTimeoutError):
+            pool.run([(time.sleep, 30)])
+        assert time.monotonic() - start_time < 10
+
+        # The stuck process is killed, the next document gets a new pool
+        assert pool.run([(len, "abc")]) == [3]
+
+    def test_timeout_counts_running_time_only(self):
+        pool = DocumentParserPool(workers=1, timeout=2)
+        try:
+            pool.run([(len, "")])
+            # The jobs wait for the only process, the last one longer than
+            # the timeout, but none runs longer than it
+            assert pool.run([(time.sleep, 1.5)] * 3) == [None] * 3
+        finally:
+            pool.shutdown()
+
+    def test_retries_documents_killed_by_another_timeout(self, pool, caplog):
+        results = {}
+
+        def parse():
+            # Running when the stuck process is killed, which breaks the pool
+            time.sleep(1)
+            results["other"] = pool.run([(time.sleep, 1.5)])
+
+        pool.run([(time.sleep, 0.1)] * 2)
+        thread = threading.Thread(target=parse)
+        thread.start()
+        with pytest.raises(DocumentParserTimeoutError):
+            pool.run([(time.sleep, 30)])
+        thread.join()
+
+        assert results["other"] == [None]
+        assert "retrying" in caplog.text
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+
+import chromadb
+import pytest
+from chromadb import Settings
+
+from apps.rag.chunk_store import ChunkEmbeddingStore
+from apps.rag.migration import EmbeddingMigration
+
+
+def old_embedding_function(texts):
+    return [[0.0] for _ in texts]
+
+
+def new_embedding_function(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+def get_embeddings(collection) -> dict:
+    rows = collection.get(include=["embeddings"])
+    return {
+        id: [float(value) for value in embedding]
+        for id, embedding in zip(rows["ids"], rows["embeddings"])
+    }
+
+
+@pytest.fixture
+def client():
+    client = chromadb.EphemeralClient(
+        Settings(allow_reset=True, anonymized_telemetry=False)
+    )
+    client.reset()
+    for name in ["collection-a", "collection-b", "user-memory-1"]:
+        collection = client.create_collection(name=name, metadata={"name": name})
+        collection.add(
+            ids=[f"{name}-{i}" for i in range(10)],
+            documents=[f"document {i}" for i in range(10)],
+            metadatas=[{"i": i} for i in range(10)],
+            embeddings=old_embedding_function(range(10)),
+        )
+    yield client
+    client.reset()
+
+
+@pytest.fixture
+def migration(client, tmp_path):
+    return EmbeddingMigration(
+        client,
+        chunk_store=ChunkEmbeddingStore(tmp_path / "chunks.db"),
+        batch_size=4,
+        batch_delay=0,
+        should_migrate=lambda name: not name.startswith("user-memory-"),
+    )
+
+
+def run_migration(migration, embedding_function, on_complete, during=None):
+    async def run():
+        job = migration.start(
+            embedding_function, "new", on_complete, asyncio.get_running_loop()
+        )
+        if during is not None:
+            await asyncio.get_running_loop().run_in_executor(None, during)
+        while migration.is_running():
+            await asyncio.sleep(0.01)
+        return job
+
+    return asyncio.run(run())
+
+
+class TestEmbeddingMigration:
+    def test_swaps_collections(self, client, migration):
+        switched, notified = [], []
+        migration.listeners.append(lambda: notified.append(True))
+
+        job = run_migration(
+            migration, new_embedding_function, lambda: switched.append(True)
+        )
+
+        assert job["status"] == "done"
+        assert (job["total"], job["migrated"], job["chunks"]) == (2, 2, 20)
+        assert switched == [True] and notified == [True]
+        assert sorted(collection.name for collection in client.list_collections()) == [
+            "collection-a",
+            "collection-b",
+            "user-memory-1",
+        ]
+
+        collection = client.get_collection("collection-a")
+        assert collection.metadata == {"name": "collection-a"}
+        assert get_embeddings(collection)["collection-a-3"] == [10.0, 1.0]
+        rows = collection.get(ids=["collection-a-3"])
+        assert rows["documents"] == ["document 3"]
+        assert rows["metadatas"] == [{"i": 3}]
+        # Collections not selected keep their vectors
+        memories = client.get_collection("user-memory-1")
+        assert get_embeddings(memories)["user-memory-1-3"] == [0.0]
+
+        # Both collections hold the same chunks, stored once
+        assert migration.chunk_store.get_stats() == {
+            "chunks": 10,
+            "referenced_chunks": 10,
+            "collections": 2,
+            "references": 20,
+        }
+
+    def test_rolls_back_when_switch_fails(self, client, migration):
+        notified = []
+        migration.listeners.append(lambda: notified.append(True))
+
+        def on_complete():
+            raise RuntimeError("Could not save the configuration")
+
+        job = run_migration(migration, new_embedding_function, on_complete)
+
+        assert job["status"] == "failed"
+        assert job["error"] == "Could not save the configuration"
+        assert notified == []
+        assert sorted(collection.name for collection in client.list_collections()) == [
+            "collection-a",
+            "collection-b",
+            "user-memory-1",
+        ]
+        for name in ["collection-a", "collection-b"]:
+            collection = client.get_collection(name)
+            assert collection.metadata == {"name": name}
+            assert set(map(tuple, get_embeddings(collection).values())) == {(0.0,)}
+        assert migration.chunk_store.get_stats()["chunks"] == 0
+
+    def test_copies_collections_written_to_again(self, client, migration):
+        copying = threading.Event()
+        written = []
+
+        def embedding_function(texts):
+            copying.set()
+            if len(written) == 0:
+                time.sleep(0.1)
+            return new_embedding_function(texts)
+
+        def write():
+            copying.wait(5)
+            # The collection being copied, from a batch already read
+            name = migration.job["collection"]
+            with migration.writing(name):
+                client.get_collection(name).add(
+                    ids=["written"],
+                    documents=["written during the migration"],
+                    embeddings=old_embedding_function([None]),
+                )
+            written.append(name)
+
+        job = run_migration(migration, embedding_function, lambda: None, write)
+
+        assert job["status"] == "done"
+        embeddings = get_embeddings(client.get_collection(written[0]))
+        assert len(embeddings) == 11
+        assert embeddings["written"] == [28.0, 1.0]
+        # Copied again after the write
+        assert job["chunks"] > 10 + 11
+
+    def test_cancel(self, client, migration):
+        switched = []
+        copying = threading.Event()
+        cancelled = threading.Event()
+
+        def embedding_function(texts):
+            copying.set()
+            cancelled.wait(5)
+            return new_embedding_function(texts)
+
+        def cancel():
+            copying.wait(5)
+            migration.cancel()
+            cancelled.set()
+
+        job = run_migration(
+            migration, embedding_function, lambda: switched.append(True), cancel
+        )
+
+        assert job["status"] == "cancelled"
+        assert switched == []
+        assert sorted(collection.name for collection in client.list_collections()) == [
+            "collection-a",
+            "collection-b",
+            "user-memory-1",
+        ]
+        collection = client.get_collection("collection-a")
+        assert set(map(tuple, get_embeddings(collection).values())) == {(0.0,)}
+        assert migration.chunk_store.get_stats()["chunks"] == 0
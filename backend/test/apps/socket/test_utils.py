@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+from apps.socket.utils import (
+    RELEASE_LOCK_SCRIPT,
+    RENEW_LOCK_SCRIPT,
+    RedisLock,
+    RedisSessionPool,
+    RedisUsagePool,
+)
+
+
+class LocalPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the asyncio Redis client API the
+    socket pools use. Lock scripts run as their Python equivalent.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+        self.strings = {}
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+    async def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key] = value
+
+    async def hget(self, name, key):
+        return self.hashes.get(name, {}).get(key)
+
+    async def hdel(self, name, *keys):
+        hash = self.hashes.get(name, {})
+        return sum(hash.pop(key, None) is not None for key in keys)
+
+    async def hexists(self, name, key):
+        return key in self.hashes.get(name, {})
+
+    async def hvals(self, name):
+        return list(self.hashes.get(name, {}).values())
+
+    async def zadd(self, name, mapping, xx=False):
+        zset = self.zsets.setdefault(name, {})
+        for member, score in mapping.items():
+            if not xx or member in zset:
+                zset[member] = score
+
+    async def zrem(self, name, *members):
+        zset = self.zsets.get(name, {})
+        return sum(zset.pop(member, None) is not None for member in members)
+
+    async def zrange(self, name, start, end):
+        zset = self.zsets.get(name, {})
+        return sorted(zset, key=zset.get)
+
+    async def zrangebyscore(self, name, min, max):
+        return [
+            member
+            for member in await self.zrange(name, 0, -1)
+            if self.zsets[name][member] <= max
+        ]
+
+    async def zremrangebyscore(self, name, min, max):
+        return await self.zrem(name, *await self.zrangebyscore(name, min, max))
+
+    async def get(self, name):
+        return self.strings.get(name)
+
+    async def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.strings:
+            return None
+        self.strings[name] = value
+        return True
+
+    async def delete(self, name):
+        return 1 if self.strings.pop(name, None) is not None else 0
+
+    def register_script(self, script):
+        async def renew(keys, args):
+            return 1 if await self.get(keys[0]) == args[0] else 0
+
+        async def release(keys, args):
+            if await self.get(keys[0]) == args[0]:
+                return await self.delete(keys[0])
+            return 0
+
+        return {RENEW_LOCK_SCRIPT: renew, RELEASE_LOCK_SCRIPT: release}[script]
+
+
+class TestRedisSessionPool:
+    def test_concurrent_sessions(self):
+        async def run():
+            redis = LocalRedis()
+            worker_a = RedisSessionPool("session_pool", redis, 30)
+            worker_b = RedisSessionPool("session_pool", redis, 30)
+
+            # The same user connecting on two workers at once keeps both sessions
+            await asyncio.gather(
+                worker_a.add("sid-1", "user-1"), worker_b.add("sid-2", "user-1")
+            )
+            await worker_b.add("sid-3", "user-2")
+            assert await worker_a.get_user_ids() == {"user-1", "user-2"}
+
+            assert await worker_a.remove("sid-1") == "user-1"
+            assert await worker_b.remove("sid-1") is None
+            assert not await worker_a.contains("sid-1")
+            assert await worker_a.get_user_ids() == {"user-1", "user-2"}
+
+            await worker_b.remove("sid-2")
+            assert await worker_a.get_user_ids() == {"user-2"}
+
+        asyncio.run(run())
+
+    def test_expire(self):
+        async def run():
+            redis = LocalRedis()
+            pool = RedisSessionPool("session_pool", redis, 30)
+
+            await pool.add("sid-1", "user-1")
+            await pool.add("sid-2", "user-2")
+            # Both sessions last refreshed a minute ago, sid-2 is refreshed now
+            for sid in ["sid-1", "sid-2"]:
+                redis.zsets["session_pool:heartbeats"][sid] = time.time() - 60
+            await pool.refresh(["sid-2", "sid-removed"])
+
+            assert await pool.expire() == 1
+            assert await pool.get_user_ids() == {"user-2"}
+            assert not await pool.contains("sid-1")
+            # A removed session is not brought back by a refresh
+            assert "sid-removed" not in redis.zsets["session_pool:heartbeats"]
+            assert await pool.expire() == 0
+
+        asyncio.run(run())
+
+
+class TestRedisUsagePool:
+    def test_models_in_use(self):
+        async def run():
+            redis = LocalRedis()
+            pool = RedisUsagePool("usage_pool", redis)
+
+            await pool.touch("model-1", "sid-1")
+            await pool.touch("model-1", "sid-2")
+            await pool.touch("model-2", "sid-1")
+            assert sorted(await pool.get_models()) == ["model-1", "model-2"]
+
+            assert not await pool.expire(3)
+            for member in redis.zsets["usage_pool"]:
+                if "model-2" in member or "sid-1" in member:
+                    redis.zsets["usage_pool"][member] = time.time() - 10
+
+            assert await pool.expire(3)
+            assert await pool.get_models() == ["model-1"]
+
+        asyncio.run(run())
+
+
+class TestRedisLock:
+    def test_single_holder(self):
+        async def run():
+            redis = LocalRedis()
+            lock_a = RedisLock("usage_pool_lock", redis, 6)
+            lock_b = RedisLock("usage_pool_lock", redis, 6)
+
+            assert await lock_a.acquire()
+            assert await lock_a.acquire()
+            assert not await lock_b.acquire()
+
+            # Releasing a lock held by another worker leaves it
+            await lock_b.release()
+            assert not await lock_b.acquire()
+
+            await lock_a.release()
+            assert await lock_b.acquire()
+            assert not await lock_a.acquire()
+
+        asyncio.run(run())
@@ -41,6 +41,44 @@ class TestChats(AbstractPostgresTest):
         assert first_chat["created_at"] is not None
         assert first_chat["updated_at"] is not None
 
+    def test_get_session_user_chat_list_page(self):
+        from apps.webui.models.chats import ChatForm
+
+        for i in range(2):
+            self.chats.insert_new_chat(
+                "2", ChatForm(**{"chat": {"title": f"chat{i}", "messages": []}})
+            )
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url("/list/page", {"limit": 2})
+            )
+        assert response.status_code == 200
+        first_page = response.json()
+        assert len(first_page["chats"]) == 2
+        assert first_page["next_cursor"] is not None
+        assert "chat" not in first_page["chats"][0]
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url(
+                    "/list/page", {"limit": 2, "cursor": first_page["next_cursor"]}
+                )
+            )
+        assert response.status_code == 200
+        second_page = response.json()
+        assert len(second_page["chats"]) == 1
+        assert second_page["next_cursor"] is None
+        assert second_page["chats"][0]["id"] not in [
+            chat["id"] for chat in first_page["chats"]
+        ]
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url("/list/page", {"cursor": "not-a-cursor"})
+            )
+        assert response.status_code == 400
+
     def test_delete_all_user_chats(self):
         with mock_webui_user(id="2"):
             response = self.fast_api_client.delete(self.create_url("/"))
@@ -180,6 +218,48 @@ class TestChats(AbstractPostgresTest):
         assert data["title"] == "Just another title"
         assert data["user_id"] == "2"
 
+    def test_update_chat_messages_by_id(self):
+        chat_id = self.chats.get_chats()[0].id
+        user_message = {"id": "1", "role": "user", "content": "Hello"}
+        assistant_message = {
+            "id": "2",
+            "parentId": "1",
+            "role": "assistant",
+            "content": "Hi",
+        }
+        for content in ["Hi", "Hi there"]:
+            assistant_message = {**assistant_message, "content": content}
+            with mock_webui_user(id="2"):
+                response = self.fast_api_client.post(
+                    self.create_url(f"/{chat_id}"),
+                    json={
+                        "chat": {
+                            "history": {
+                                "currentId": "2",
+                                "messages": {
+                                    "1": user_message,
+                                    "2": assistant_message,
+                                },
+                            },
+                            "messages": [user_message, assistant_message],
+                        }
+                    },
+                )
+            assert response.status_code == 200
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(self.create_url(f"/{chat_id}"))
+        assert response.status_code == 200
+        data = response.json()
+        assert data["chat"]["history"]["messages"] == {
+            "1": user_message,
+            "2": {**assistant_message, "content": "Hi there"},
+        }
+        assert data["chat"]["messages"] == [
+            user_message,
+            {**assistant_message, "content": "Hi there"},
+        ]
+
     def test_delete_chat_by_id(self):
         chat_id = self.chats.get_chats()[0].id
         with mock_webui_user(id="2"):
@@ -208,6 +288,36 @@ class TestChats(AbstractPostgresTest):
         assert data["title"] == "Clone of New Chat"
         assert data["user_id"] == "2"
 
+    def test_chat_tags(self):
+        chat_id = self.chats.get_chats()[0].id
+        for tag_name in ["tag1", "tag2", "tag1"]:
+            with mock_webui_user(id="2"):
+                response = self.fast_api_client.post(
+                    self.create_url(f"/{chat_id}/tags"),
+                    json={"tag_name": tag_name, "chat_id": chat_id},
+                )
+        assert response.status_code == 401
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(self.create_url(f"/{chat_id}/tags"))
+        assert response.status_code == 200
+        assert sorted(tag["name"] for tag in response.json()) == ["tag1", "tag2"]
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.request(
+                "DELETE",
+                self.create_url(f"/{chat_id}/tags"),
+                json={"tag_name": "tag2", "chat_id": chat_id},
+            )
+        assert response.status_code == 200
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(self.create_url("/tags/all"))
+        assert response.status_code == 200
+        assert [(tag["name"], tag["chat_count"]) for tag in response.json()] == [
+            ("tag1", 1)
+        ]
+
     def test_archive_chat_by_id(self):
         chat_id = self.chats.get_chats()[0].id
         with mock_webui_user(id="2"):
@@ -0,0 +1,85 @@
+from test.util.abstract_integration_test import AbstractPostgresTest
+from test.util.mock_user import mock_webui_user
+
+
+class TestSearch(AbstractPostgresTest):
+
+    BASE_PATH = "/api/v1/search"
+
+    def setup_class(cls):
+        super().setup_class()
+        from apps.webui.models.chats import Chats
+        from apps.webui.models.documents import Documents
+
+        cls.chats = Chats
+        cls.documents = Documents
+
+    def test_search_chats(self):
+        from apps.webui.models.chats import ChatForm
+
+        for user_id, title, content in [
+            ("2", "Router setup", "How do I configure a VLAN on my switch?"),
+            ("2", "Firmware", "Upgrade the firmware of the access point"),
+            ("3", "VLAN question", "Another user asking about VLANs"),
+        ]:
+            self.chats.insert_new_chat(
+                user_id,
+                ChatForm(
+                    **{
+                        "chat": {
+                            "title": title,
+                            "history": {
+                                "currentId": "1",
+                                "messages": {
+                                    "1": {"id": "1", "role": "user", "content": content}
+                                },
+                            },
+                        }
+                    }
+                ),
+            )
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url("/chats", {"q": "vlan"})
+            )
+        assert response.status_code == 200
+        data = response.json()
+        assert [result["title"] for result in data["results"]] == ["Router setup"]
+        assert data["has_more"] is False
+
+        chat_id = data["results"][0]["id"]
+        self.chats.update_chat_by_id(chat_id, {"title": "Renamed", "messages": []})
+        # Updates are re-indexed in batches
+        assert self.chats.index_queued_chats() == 1
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url("/chats", {"q": "vlan"})
+            )
+        assert response.status_code == 200
+        assert response.json()["results"] == []
+
+    def test_search_documents(self):
+        from apps.webui.models.documents import DocumentForm
+
+        for i in range(3):
+            self.documents.insert_new_doc(
+                "2",
+                DocumentForm(
+                    **{
+                        "name": f"doc_{i}",
+                        "title": f"Catalyst admin guide {i}",
+                        "collection_name": f"collection_{i}",
+                        "filename": f"doc_{i}.pdf",
+                    }
+                ),
+            )
+
+        with mock_webui_user(id="2"):
+            response = self.fast_api_client.get(
+                self.create_url("/documents", {"q": "catalyst", "limit": 2})
+            )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["results"]) == 2
+        assert data["has_more"] is True
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import chromadb
+import pytest
+from chromadb import Settings
+
+from apps.webui.utils import MemoryIndex
+
+
+def embedding_function(texts):
+    # Queries embed a single text
+    if isinstance(texts, str):
+        return [float(len(texts)), 1.0]
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+def make_memory(id, content):
+    return SimpleNamespace(id=id, content=content, created_at=0, updated_at=0)
+
+
+def get_ids(client, user_id):
+    return set(client.get_collection(f"user-memory-{user_id}").get()["ids"])
+
+
+@pytest.fixture
+def client():
+    client = chromadb.EphemeralClient(
+        Settings(allow_reset=True, anonymized_telemetry=False)
+    )
+    client.reset()
+    yield client
+    client.reset()
+
+
+class TestMemoryIndex:
+    def test_rebuild_keeps_serving_and_writes(self, client):
+        memories = {
+            "m1": make_memory("m1", "likes tea"),
+            "m2": make_memory("m2", "lives in Oslo"),
+        }
+        read = threading.Event()
+        release = threading.Event()
+
+        def get_memories_by_user_id(user_id):
+            rows = list(memories.values())
+            read.set()
+            release.wait(5)
+            return rows
+
+        index = MemoryIndex(
+            client, lambda: embedding_function, get_memories_by_user_id, 1
+        )
+        index.upsert("user", list(memories.values()))
+
+        async def run():
+            job = index.start_rebuild("user")
+            await asyncio.get_running_loop().run_in_executor(None, read.wait, 5)
+
+            # The current collection answers while the rebuild runs
+            result = index.query("user", "likes tea", 2)
+            assert set(result["ids"][0]) == {"m1", "m2"}
+
+            # Written after the rebuild read the memories
+            del memories["m1"]
+            index.delete("user", ["m1"])
+            memories["m3"] = make_memory("m3", "has a cat")
+            index.upsert("user", [memories["m3"]])
+            index.upsert("user", [make_memory("m2", "lives in Bergen")])
+            release.set()
+
+            while job["status"] == "running":
+                await asyncio.sleep(0.01)
+            return job
+
+        job = asyncio.run(run())
+
+        assert job["status"] == "done"
+        assert (job["total"], job["indexed"]) == (2, 2)
+        assert get_ids(client, "user") == {"m2", "m3"}
+        rows = client.get_collection("user-memory-user").get(ids=["m2"])
+        assert rows["documents"] == ["lives in Bergen"]
+        assert [collection.name for collection in client.list_collections()] == [
+            "user-memory-user"
+        ]
+        assert set(index.query("user", "has a cat", 5)["ids"][0]) == {"m2", "m3"}
+
+    def test_failed_rebuild_keeps_collection(self, client):
+        def get_memories_by_user_id(user_id):
+            return [make_memory("m1", "likes tea")]
+
+        def failing_embedding_function(texts):
+            raise RuntimeError("Embedding model unavailable")
+
+        embedding = {"function": embedding_function}
+        index = MemoryIndex(
+            client, lambda: embedding["function"], get_memories_by_user_id, 8
+        )
+        index.upsert("user", get_memories_by_user_id("user"))
+
+        embedding["function"] = failing_embedding_function
+        index.rebuild_all()
+
+        assert index.get_job("user")["status"] == "failed"
+        assert [collection.name for collection in client.list_collections()] == [
+            "user-memory-user"
+        ]
+        assert get_ids(client, "user") == {"m1"}
+
+    def test_clear_during_rebuild(self, client):
+        def get_memories_by_user_id(user_id):
+            rows = [make_memory("m1", "likes tea")]
+            # The user deletes every memory, then adds one
+            index.delete_collection(user_id)
+            index.upsert(user_id, [make_memory("m2", "has a cat")])
+            return rows
+
+        index = MemoryIndex(
+            client, lambda: embedding_function, get_memories_by_user_id, 8
+        )
+        index.upsert("user", [make_memory("m1", "likes tea")])
+        index.new_job("user")
+        index.rebuild("user")
+
+        assert index.get_job("user")["status"] == "done"
+        assert get_ids(client, "user") == {"m2"}
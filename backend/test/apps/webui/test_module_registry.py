@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from apps.webui.utils import ModuleRegistry
+
+
+class Valves:
+    def __init__(self, **valves):
+        self.__dict__.update(valves)
+
+
+def load_module(id):
+    return SimpleNamespace(Valves=Valves, valves=None)
+
+
+class TestModuleRegistry:
+    def test_caches_valves(self, tmp_path):
+        stored = {"priority": 1}
+        reads = []
+
+        def get_valves_by_id(id):
+            reads.append(id)
+            return dict(stored)
+
+        registry = ModuleRegistry(tmp_path, load_module, get_valves_by_id, 60)
+        module = registry.get_module("filter")
+        assert module.valves.priority == 1
+
+        # Dispatches within the TTL don't read the database
+        stored["priority"] = 2
+        assert registry.get_module("filter") is module
+        assert module.valves.priority == 1
+        assert reads == ["filter"]
+
+        # An update on this worker is seen at once
+        registry.invalidate_valves("filter")
+        assert registry.get_module("filter").valves.priority == 2
+        assert reads == ["filter", "filter"]
+
+    def test_rereads_expired_valves(self, tmp_path):
+        stored = {"priority": 1}
+        registry = ModuleRegistry(
+            tmp_path, load_module, lambda id: dict(stored), valves_ttl=0
+        )
+        module = registry.get_module("filter")
+        assert module.valves.priority == 1
+
+        # Updated by another worker
+        stored["priority"] = 2
+        assert registry.get_module("filter").valves.priority == 2
+        # Unchanged valves are not applied again
+        valves = module.valves
+        assert registry.get_module("filter").valves is valves
@@ -0,0 +1,170 @@
+"""
+Query count and latency of ArticlesTable list reads over a seeded catalog.
+
+Compares the previous per-row lazy loading of article.series with the shared
+ArticlesTable mapper, which loads the series ids of a whole page in one query.
+Runs against a throwaway SQLite database.
+
+Usage (from backend/):
+    python -m test.benchmarks.bench_article_queries [--articles 5000] [--series 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+# The database is configured at import time, point it at a scratch file first
+os.environ["DATABASE_URL"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='bench-articles-')}/webui.db"
+)
+
+from sqlalchemy import event, insert
+
+from apps.webui.internal.db import Base, engine, get_db
+from apps.webui.models.articles import (
+    ARTICLE_ON_SERIES,
+    Article,
+    ArticleCategory,
+    ArticleModel,
+    Article_Table,
+)
+from apps.webui.models.series import Series
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def seed(articles: int, series: int):
+    Base.metadata.create_all(engine)
+    now = int(time.time())
+    series_ids = [str(uuid.uuid4()) for _ in range(series)]
+    article_ids = [str(uuid.uuid4()) for _ in range(articles)]
+    categories = list(ArticleCategory)
+
+    with get_db() as db:
+        db.execute(
+            insert(Series),
+            [
+                {
+                    "id": id,
+                    "name": f"Series {i}",
+                    "admin_guide_urls": [],
+                    "datasheet_urls": [],
+                    "cli_guide_urls": [],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i, id in enumerate(series_ids)
+            ],
+        )
+        db.execute(
+            insert(Article),
+            [
+                {
+                    "id": id,
+                    "title": f"Article {i}",
+                    "document_id": f"doc-{i}",
+                    "objective": f"The objective of this article is to configure {i}.",
+                    "category": categories[i % len(categories)],
+                    "url": f"https://example.com/articles/{i}",
+                    "applicable_devices": [],
+                    "steps": [{"section": "Setup", "step_number": 1, "text": "Go"}],
+                    "revision_history": [],
+                    "published": True,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i, id in enumerate(article_ids)
+            ],
+        )
+        db.execute(
+            insert(ARTICLE_ON_SERIES),
+            [
+                {"article_id": article_id, "series_id": series_id}
+                for article_id in article_ids
+                for series_id in random.sample(series_ids, k=random.randint(1, 3))
+            ],
+        )
+        db.commit()
+
+    return series_ids
+
+
+def get_articles_lazy(skip: int, limit: int):
+    # Mirrors the previous ArticlesTable.get_articles
+    with get_db() as db:
+        articles = db.query(Article).offset(skip).limit(limit).all()
+        article_models = []
+        for article in articles:
+            series_ids = [series.id for series in article.series]
+            article_data = {
+                column.name: getattr(article, column.name)
+                for column in article.__table__.columns
+            }
+            article_data["series_ids"] = series_ids
+            article_models.append(ArticleModel.model_validate(article_data))
+        return article_models
+
+
+def measure(fn, pages: int, limit: int):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        timings = []
+        queries = []
+        for page in range(pages):
+            counter.count = 0
+            start = time.perf_counter()
+            result = fn(page * limit, limit)
+            timings.append(time.perf_counter() - start)
+            queries.append(counter.count)
+            assert len(result) == limit
+        return queries, timings
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--series", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20)
+    args = parser.parse_args()
+
+    series_ids = seed(args.articles, args.series)
+    print(f"Seeded {args.articles} articles across {args.series} series")
+
+    for name, fn in [
+        ("lazy series (previous)", get_articles_lazy),
+        (
+            "shared mapper",
+            lambda skip, limit: Article_Table.get_articles(skip=skip, limit=limit),
+        ),
+    ]:
+        queries, timings = measure(fn, args.pages, args.limit)
+        print(
+            f"{name:24s} queries/page: min {min(queries)} max {max(queries)}  "
+            f"median {statistics.median(timings) * 1000:.2f} ms/page"
+        )
+
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    articles = Article_Table.get_articles_by_series_id(series_ids[0])
+    event.remove(engine, "before_cursor_execute", counter)
+    print(
+        f"get_articles_by_series_id: {len(articles)} articles in {counter.count} queries"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Event loop stalls caused by chat reads from async request handlers.
+
+Runs a ticker coroutine that wakes up every millisecond, the way a streaming
+response writes its chunks, while concurrent "requests" load full chats either
+through the synchronous ChatTable methods (as the routers used to) or through
+their *_async variants. Reports the request throughput and how late the ticker
+woke up: with the sync path every query blocks the loop, with the async path
+the ticker keeps running while queries are in flight.
+
+Usage (from backend/):
+    python -m test.benchmarks.bench_async_db [--chats 200] [--messages 50] [--requests 16]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# The database is configured at import time, point it at a scratch file first
+os.environ["DATABASE_URL"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='bench-async-db-')}/webui.db"
+)
+
+from sqlalchemy import text
+
+from apps.webui.internal.db import Base, engine
+from apps.webui.models.chats import ChatForm, Chats
+from apps.webui.models.search import SEARCH_INDEX_DDL
+
+
+def seed(chats: int, messages: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for statement in SEARCH_INDEX_DDL["sqlite"]:
+            connection.execute(text(statement))
+
+    chat_ids = []
+    for i in range(chats):
+        history = {
+            str(j): {
+                "id": str(j),
+                "parentId": str(j - 1) if j > 0 else None,
+                "role": "user" if j % 2 == 0 else "assistant",
+                "content": f"message {j} " + "lorem ipsum " * 40,
+            }
+            for j in range(messages)
+        }
+        chat = Chats.insert_new_chat(
+            "user",
+            ChatForm(
+                chat={
+                    "title": f"Chat {i}",
+                    "history": {"currentId": str(messages - 1), "messages": history},
+                    "messages": list(history.values()),
+                }
+            ),
+        )
+        chat_ids.append(chat.id)
+    return chat_ids
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    interval = 0.001
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def sync_request(chat_ids):
+    Chats.get_chat_by_id_and_user_id(random.choice(chat_ids), "user")
+
+
+async def async_request(chat_ids):
+    await Chats.get_chat_by_id_and_user_id_async(random.choice(chat_ids), "user")
+
+
+async def run(request, chat_ids, requests: int, seconds: float):
+    stop = asyncio.Event()
+    lags = []
+    completed = 0
+
+    async def client():
+        nonlocal completed
+        while not stop.is_set():
+            await request(chat_ids)
+            completed += 1
+            # Yield between requests like a handler awaiting its response write
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(ticker(stop, lags))] + [
+        asyncio.create_task(client()) for _ in range(requests)
+    ]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return completed / seconds, lags
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    chat_ids = seed(args.chats, args.messages)
+    print(
+        f"Seeded {args.chats} chats of {args.messages} messages, "
+        f"{args.requests} concurrent requests for {args.seconds}s each"
+    )
+
+    for name, request in [("sync", sync_request), ("async", async_request)]:
+        throughput, lags = asyncio.run(
+            run(request, chat_ids, args.requests, args.seconds)
+        )
+        lags_ms = sorted(lag * 1000 for lag in lags)
+        print(
+            f"{name:6s} requests/s {throughput:7.0f}  ticks {len(lags):6d}  "
+            f"loop lag p50 {statistics.median(lags_ms):6.2f} ms  "
+            f"p99 {lags_ms[int(len(lags_ms) * 0.99)]:6.2f} ms  "
+            f"max {lags_ms[-1]:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Concurrent chat saves and chat list reads against a file-backed SQLite database.
+
+Compares a plain SQLite engine (check_same_thread=False only, as db.py used
+to create it) with the tuned engine from create_sqlite_engine: WAL, NORMAL
+synchronous, busy_timeout, mmap/cache sizing and a sized connection pool.
+N writer threads save chats (chat row update + new message row) while M
+reader threads list chats, the way the sidebar does.
+
+Usage (from backend/):
+    python -m test.benchmarks.bench_sqlite_concurrency [--writers 8] [--readers 8] [--seconds 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+
+# The database is configured at import time, point it at a scratch file first
+os.environ["DATABASE_URL"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='bench-sqlite-')}/webui.db"
+)
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from apps.webui.internal.db import create_sqlite_engine
+from apps.webui.models.chats import Chat, ChatMessage
+
+
+def create_default_engine(url: str):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def seed(engine, users: int, chats_per_user: int):
+    Chat.__table__.create(engine)
+    ChatMessage.__table__.create(engine)
+    now = int(time.time())
+    chat_ids = {}
+    with engine.begin() as connection:
+        for user in range(users):
+            user_id = f"user-{user}"
+            chat_ids[user_id] = [str(uuid.uuid4()) for _ in range(chats_per_user)]
+            connection.execute(
+                insert(Chat),
+                [
+                    {
+                        "id": id,
+                        "user_id": user_id,
+                        "title": f"Chat {i}",
+                        "chat": json.dumps({"title": f"Chat {i}", "history": {}}),
+                        "created_at": now,
+                        "updated_at": now,
+                        "archived": False,
+                    }
+                    for i, id in enumerate(chat_ids[user_id])
+                ],
+            )
+    return chat_ids
+
+
+def writer(engine, user_id, chat_ids, stop, stats):
+    i = 0
+    while not stop.is_set():
+        chat_id = chat_ids[i % len(chat_ids)]
+        message = {"id": str(uuid.uuid4()), "role": "user", "content": "x" * 512}
+        start = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    insert(ChatMessage).values(
+                        chat_id=chat_id,
+                        id=message["id"],
+                        message=json.dumps(message),
+                        updated_at=int(time.time()),
+                    )
+                )
+                connection.execute(
+                    update(Chat)
+                    .where(Chat.id == chat_id)
+                    .values(updated_at=int(time.time()), title=f"Chat {i}")
+                )
+            stats["write_latencies"].append(time.perf_counter() - start)
+        except OperationalError:
+            stats["write_errors"] += 1
+        i += 1
+
+
+def reader(engine, user_id, stop, stats):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(
+                    select(Chat.id, Chat.title, Chat.updated_at)
+                    .where(Chat.user_id == user_id, Chat.archived == False)
+                    .order_by(Chat.updated_at.desc())
+                    .limit(50)
+                ).all()
+            stats["read_latencies"].append(time.perf_counter() - start)
+        except OperationalError:
+            stats["read_errors"] += 1
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+
+def run(name, create, writers, readers, seconds):
+    url = f"sqlite:///{tempfile.mkdtemp(prefix=f'bench-sqlite-{name}-')}/webui.db"
+    engine = create(url)
+    chat_ids = seed(engine, max(writers, readers), 200)
+    user_ids = list(chat_ids.keys())
+
+    stats = {
+        "write_latencies": [],
+        "read_latencies": [],
+        "write_errors": 0,
+        "read_errors": 0,
+    }
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=writer,
+            args=(engine, user_ids[i], chat_ids[user_ids[i]], stop, stats),
+        )
+        for i in range(writers)
+    ] + [
+        threading.Thread(target=reader, args=(engine, user_ids[i], stop, stats))
+        for i in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    print(
+        f"{name:8s} writes/s {len(stats['write_latencies']) / seconds:8.0f}  "
+        f"p99 {percentile(stats['write_latencies'], 99):7.2f} ms  "
+        f"errors {stats['write_errors']:4d} | "
+        f"reads/s {len(stats['read_latencies']) / seconds:8.0f}  "
+        f"p99 {percentile(stats['read_latencies'], 99):7.2f} ms  "
+        f"errors {stats['read_errors']:4d}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds}s each")
+    for name, create in [
+        ("default", create_default_engine),
+        ("tuned", create_sqlite_engine),
+    ]:
+        run(name, create, args.writers, args.readers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Streaming throughput of the main app middleware stack.
+
+Compares the previous BaseHTTPMiddleware-based stack with the pure ASGI
+middleware now used in main.py, driving an SSE token stream through each.
+
+Usage (from backend/):
+    python -m test.benchmarks.bench_streaming_middleware [--tokens 5000] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.asgi import prepend_stream_chunks, read_body, replay_receive
+
+
+def create_app(tokens: int) -> Starlette:
+    async def stream(request):
+        async def generator():
+            for i in range(tokens):
+                yield f'data: {{"choices": [{{"delta": {{"content": "tok{i}"}}}}]}}\n\n'
+
+        return StreamingResponse(generator(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/chat/completions", stream, methods=["POST"])])
+
+
+class BaseHTTPChatMiddleware(BaseHTTPMiddleware):
+    # Mirrors the previous ChatCompletionMiddleware: re-wraps the body iterator
+    async def dispatch(self, request, call_next):
+        await request.body()
+        response = await call_next(request)
+
+        async def wrapper(original_generator):
+            yield 'data: {"citations": []}\n\n'
+            async for data in original_generator:
+                yield data
+
+        return StreamingResponse(
+            wrapper(response.body_iterator), media_type="text/event-stream"
+        )
+
+
+class BaseHTTPPassthroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+class ASGIChatMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        body = await read_body(receive)
+        send = prepend_stream_chunks(
+            send, {"text/event-stream": [b'data: {"citations": []}\n\n']}
+        )
+        await self.app(scope, replay_receive(body, receive), send)
+
+
+class ASGIPassthroughMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.app(scope, receive, send)
+
+
+def create_stack(tokens: int, chat_middleware, passthrough_middleware) -> Starlette:
+    app = create_app(tokens)
+    # Same shape as main.py: chat + pipeline middleware, then three http middlewares
+    app.add_middleware(chat_middleware)
+    for _ in range(4):
+        app.add_middleware(passthrough_middleware)
+    return app
+
+
+async def run_once(app: ASGIApp) -> list:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/chat/completions",
+        "raw_path": b"/chat/completions",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8080),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {
+                "type": "http.request",
+                "body": b'{"model": "m"}',
+                "more_body": False,
+            }
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    timestamps = []
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            timestamps.append(time.perf_counter())
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    disconnected.set()
+    return [start] + timestamps
+
+
+def summarize(name: str, runs: list):
+    throughputs = []
+    latencies = []
+    for timestamps in runs:
+        chunks = len(timestamps) - 1
+        throughputs.append(chunks / (timestamps[-1] - timestamps[0]))
+        latencies.extend((b - a) * 1e6 for a, b in zip(timestamps[1:], timestamps[2:]))
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:<20} {statistics.mean(throughputs):>12,.0f} tok/s"
+        f"   mean {statistics.mean(latencies):>7.1f} us/chunk"
+        f"   p99 {p99:>7.1f} us/chunk"
+    )
+
+
+async def main(tokens: int, runs: int):
+    stacks = {
+        "BaseHTTPMiddleware": create_stack(
+            tokens, BaseHTTPChatMiddleware, BaseHTTPPassthroughMiddleware
+        ),
+        "pure ASGI": create_stack(
+            tokens, ASGIChatMiddleware, ASGIPassthroughMiddleware
+        ),
+    }
+
+    for name, app in stacks.items():
+        await run_once(app)  # warm up
+        summarize(name, [await run_once(app) for _ in range(runs)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.tokens, args.runs))
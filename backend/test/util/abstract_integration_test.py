@@ -148,11 +148,13 @@ class AbstractPostgresTest(AbstractIntegrationTest):
         tables = [
             "auth",
             "chat",
+            "chat_message",
             "chatidtag",
             "document",
             "memory",
             "model",
             "prompt",
+            "search_index",
             "tag",
             '"user"',
         ]
@@ -0,0 +1,80 @@
+from typing import List
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import Message, Receive, Scope, Send
+
+
+async def read_body(receive: Receive) -> bytes:
+    """
+    Drain the request body from an ASGI receive channel.
+    """
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+def replay_receive(body: bytes, receive: Receive) -> Receive:
+    """
+    Return a receive channel that yields `body` once, then defers to the original
+    channel so downstream apps still see `http.disconnect`.
+    """
+    sent = False
+
+    async def wrapped_receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return wrapped_receive
+
+
+def with_body_headers(scope: Scope, body: bytes) -> Scope:
+    """
+    Copy `scope` with its content-length header matching `body`.
+    """
+    headers = [(k, v) for k, v in scope["headers"] if k.lower() != b"content-length"]
+    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    return {**scope, "headers": headers}
+
+
+def prepend_stream_chunks(send: Send, chunks: dict) -> Send:
+    """
+    Wrap `send` so the chunks registered for the response content type are sent
+    right after `http.response.start`. `chunks` maps a content type substring
+    (e.g. "text/event-stream") to a list of byte chunks. Body messages are passed
+    through as-is, without buffering or extra task hops.
+    """
+
+    async def wrapped_send(message: Message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+
+            prefix: List[bytes] = []
+            for media_type, items in chunks.items():
+                if media_type in content_type:
+                    prefix = items
+                    break
+
+            if prefix and "content-length" in headers:
+                del headers["content-length"]
+                message["headers"] = headers.raw
+
+            await send(message)
+            for chunk in prefix:
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+            return
+
+        await send(message)
+
+    return wrapped_send
@@ -7,6 +7,8 @@ from typing import Optional, List, Tuple
 import uuid
 import time
 
+from fastapi.concurrency import run_in_threadpool
+
 
 def use_pysqlite3():
     """
@@ -158,6 +160,48 @@ def calculate_sha256(file):
     return sha256.hexdigest()
 
 
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLargeError(ValueError):
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds the maximum size of {max_size} bytes")
+        self.max_size = max_size
+
+
+def write_upload_chunk(f, sha256, chunk: bytes):
+    sha256.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload_file(
+    file, file_path: str, max_size: Optional[int] = None
+) -> Tuple[int, str]:
+    """
+    Copy an UploadFile to `file_path` in UPLOAD_CHUNK_SIZE chunks, hashing it on
+    the way, and return its (size, sha256 hexdigest). Raises FileTooLargeError
+    as soon as more than `max_size` bytes were read; the partial file is removed
+    on any error. Disk writes and hashing run in the threadpool.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        f = await run_in_threadpool(open, file_path, "wb")
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(max_size)
+                await run_in_threadpool(write_upload_chunk, f, sha256, chunk)
+        finally:
+            await run_in_threadpool(f.close)
+    except BaseException:
+        await run_in_threadpool(Path(file_path).unlink, missing_ok=True)
+        raise
+    return size, sha256.hexdigest()
+
+
 def calculate_sha256_string(string):
     # Create a new SHA-256 hash object
     sha256_hash = hashlib.sha256()
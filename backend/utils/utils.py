@@ -87,7 +87,7 @@ def get_http_authorization_cred(auth_header: str):
         raise ValueError(ERROR_MESSAGES.INVALID_TOKEN)
 
 
-def get_current_user(
+async def get_current_user(
     request: Request,
     auth_token: HTTPAuthorizationCredentials = Depends(bearer_security),
 ):
@@ -104,19 +104,19 @@ def get_current_user(
 
     # auth by api key
     if token.startswith("sk-"):
-        return get_current_user_by_api_key(token)
+        return await get_current_user_by_api_key(token)
 
     # auth by jwt token
     data = decode_token(token)
     if data != None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = await Users.get_user_by_id_async(data["id"])
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=ERROR_MESSAGES.INVALID_TOKEN,
             )
         else:
-            Users.update_user_last_active_by_id(user.id)
+            await Users.update_user_last_active_by_id_async(user.id)
         return user
     else:
         raise HTTPException(
@@ -125,8 +125,8 @@ def get_current_user(
         )
 
 
-def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+async def get_current_user_by_api_key(api_key: str):
+    user = await Users.get_user_by_api_key_async(api_key)
 
     if user is None:
         raise HTTPException(
@@ -134,7 +134,7 @@ def get_current_user_by_api_key(api_key: str):
             detail=ERROR_MESSAGES.INVALID_TOKEN,
         )
     else:
-        Users.update_user_last_active_by_id(user.id)
+        await Users.update_user_last_active_by_id_async(user.id)
 
     return user
 